@@ -1,14 +1,40 @@
 import os
+import sys
 import subprocess
 import threading
 import json
 import time
 from datetime import timedelta
-from flask import Flask, render_template, request, jsonify, Response, redirect, url_for, session
+from flask import Flask, render_template, request, jsonify, Response, redirect, url_for, session, g
 from functools import wraps
 import zipfile
 import shutil
 import re
+import weakref
+import zlib
+import gzip
+import codecs
+import selectors
+import signal
+import heapq
+import copy
+import bisect
+import atexit
+import base64
+import http.client
+import queue
+import sqlite3
+import hashlib
+import mmap
+import struct
+import tempfile
+import secrets
+from urllib.parse import urlsplit
+import uuid
+from collections import OrderedDict, deque, Counter
+from contextlib import contextmanager
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 
 app = Flask(__name__)
 
@@ -20,21 +46,607 @@ app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(minutes=360) # Remember use
 BASE_CONFIG_DIR = '/app/.config/rclone'
 RCLONE_CONFIG_PATH = os.path.join(BASE_CONFIG_DIR, 'rclone.conf')
 SERVICE_ACCOUNT_DIR = BASE_CONFIG_DIR # Service accounts are now extracted into BASE_CONFIG_DIR
-LOG_FILE = os.path.join('/tmp', 'rcloneLog.txt') # Use /tmp for ephemeral Rclone logs on Render
+JOBS_LOG_DIR = os.path.join('/tmp', 'rclone_jobs') # Per-job Rclone logs, ephemeral on Render
 TERMINAL_LOG_FILE = os.path.join('/tmp', 'terminalLog.txt') # Use /tmp for ephemeral Terminal logs on Render
+TERMINAL_OUTPUT_CHUNK_BYTES = 256 * 1024 # Max bytes of terminal output returned per poll
+LOG_FLUSH_BYTES = 64 * 1024 # Buffered log output is written once it reaches this size...
+LOG_FLUSH_INTERVAL = 0.25 # ...or when it is older than this many seconds
+PIPE_READ_BYTES = 64 * 1024 # Subprocess output is read in chunks of up to this size
+PARTIAL_LINE_SECONDS = 0.5 # An unfinished line (progress bar, prompt) is shown after this long
+PIPE_STOP_POLL_SECONDS = 0.5 # A pipe reader given a stop flag checks it at least this often
+MAX_LINE_CHARS = 64 * 1024 # Longer lines are split so one line cannot grow without bound
+LOG_SEGMENT_BYTES = int(os.environ.get('RCLONE_LOG_SEGMENT_MB', '64')) * 1024 * 1024 # Job logs rotate at this size
+LOG_RETENTION_BYTES = int(os.environ.get('RCLONE_LOG_RETENTION_MB', '1024')) * 1024 * 1024 # Max disk used by job logs
+LOG_MIN_FREE_BYTES = int(os.environ.get('RCLONE_LOG_MIN_FREE_MB', '256')) * 1024 * 1024 # Old logs go before /tmp fills up
+LOG_DOWNLOAD_CHUNK_BYTES = 256 * 1024 # Log downloads are streamed in chunks of this size
+LOG_INDEX_STRIDE = 256 # The job log index records the byte offset of every Nth line
+LOG_INDEX_MAX_PATHS = 10000 # Distinct failing paths remembered per job
+LOG_QUERY_MAX_LINES = 5000 # Max lines returned by one log query
+LOG_SEARCH_MAX_BYTES = 256 * 1024 * 1024 # Filtered log queries scan at most this much per request
+LOG_SCAN_MAX_BYTES = 256 * 1024 * 1024 # Logs of jobs no longer in memory are indexed up to this size
+
+# Rclone job execution
+RCLONE_BINARY = os.environ.get('RCLONE_BINARY', 'rclone')
+MAX_CONCURRENT_JOBS = int(os.environ.get('RCLONE_MAX_CONCURRENT_JOBS', '2')) # Jobs beyond this wait in the queue
+MAX_FINISHED_JOBS = int(os.environ.get('RCLONE_MAX_FINISHED_JOBS', '50')) # Finished jobs kept for inspection
+JOB_OUTPUT_RING_LINES = int(os.environ.get('RCLONE_OUTPUT_RING_LINES', '10000')) # Live output lines kept in memory per job
+SSE_KEEPALIVE_SECONDS = 15 # Comment frames sent on idle event streams to keep proxies from closing them
+OUTPUT_FRAME_INTERVAL = 0.1 # Live output lines are coalesced into one frame for up to this many seconds...
+OUTPUT_FRAME_BYTES = 64 * 1024 # ...or until this many bytes are pending
+STREAM_GZIP = os.environ.get('RCLONE_STREAM_GZIP', 'true').lower() == 'true' # Gzip live streams for clients that accept it
+JOB_METRICS_POINTS = int(os.environ.get('RCLONE_METRICS_POINTS', '1200')) # Stats samples kept per job (1h at --stats=3s)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') # Optional bearer token for scraping /metrics without a session
+
+# Rclone remote control (rcd) backend
+RCLONE_BACKEND = os.environ.get('RCLONE_BACKEND', 'subprocess') # 'subprocess' or 'rcd'
+RCD_ADDR = os.environ.get('RCLONE_RCD_ADDR', '127.0.0.1:5572') # Where the managed `rclone rcd` listens
+RCD_URL = os.environ.get('RCLONE_RCD_URL') # Use an already running rc server instead of starting one
+RCD_USER = os.environ.get('RCLONE_RCD_USER', 'webgui')
+RCD_PASS = os.environ.get('RCLONE_RCD_PASS') or secrets.token_urlsafe(16)
+RC_POOL_SIZE = 4 # Kept-alive HTTP connections to the rc server
+RC_POLL_INTERVAL = 0.5 # Seconds between job/status polls of async rc jobs
+RC_STATS_INTERVAL = 3 # Seconds between stats lines written for async rc jobs (matches --stats=3s)
+RCD_LOG_FILE = os.path.join('/tmp', 'rclone_rcd.log') # Output of the managed `rclone rcd`
+
+# Remote listing cache
+LISTING_CACHE_TTL = int(os.environ.get('RCLONE_LISTING_CACHE_TTL', '300')) # Seconds a cached listing stays valid
+LISTING_CACHE_SIZE = int(os.environ.get('RCLONE_LISTING_CACHE_SIZE', '256')) # Max cached listings (LRU beyond that)
+LISTING_CACHE_MAX_LINES = 200000 # Larger listings are not cached
+
+# Adaptive auto-tuning of copy/sync/move jobs
+AUTOTUNE_FILE = os.path.join(BASE_CONFIG_DIR, 'autotune.json') # Best settings found per remote pair
+AUTOTUNE_EPOCH_SECONDS = int(os.environ.get('RCLONE_AUTOTUNE_EPOCH', '60')) # Each trial runs this long before it is measured
+AUTOTUNE_WARMUP_SECONDS = 10 # Throughput in the first seconds of a trial is ignored (listing, ramp-up)
+AUTOTUNE_MAX_TRIALS = 8 # Trials before settling on the best settings seen
+AUTOTUNE_MAX_TRANSFERS = 32
+AUTOTUNE_MEMORY_BUDGET = int(os.environ.get('RCLONE_AUTOTUNE_MEMORY_MB', '1024')) * 1024 * 1024 # transfers x buffer limit
+AUTOTUNE_BUFFER_SIZES = ('8M', '16M', '32M', '64M', '128M')
+
+# Incremental copy/sync from listing snapshots
+SNAPSHOT_DIR = os.path.join(BASE_CONFIG_DIR, 'snapshots') # Source listings of the last successful incremental runs
+
+# Persistent job history
+JOB_HISTORY_DB = os.path.join(BASE_CONFIG_DIR, 'jobs.db') # SQLite history of Rclone jobs and terminal commands
+JOB_HISTORY_DAYS = int(os.environ.get('RCLONE_HISTORY_DAYS', '365')) # Older entries are deleted on startup
+HISTORY_PAGE_SIZE = 50 # Default entries per /history page
+HISTORY_MAX_PAGE_SIZE = 500
+
+# Debug timings and profiler
+DEBUG_TIMINGS = os.environ.get('RCLONE_DEBUG_TIMINGS', 'true').lower() == 'true' # Record latency histograms for /debug/timings
+PROFILE_MAX_SECONDS = 60 # Longest sampling run /debug/profile accepts
+PROFILE_INTERVAL = 0.01 # Default seconds between stack samples
 
 # Login Credentials
 LOGIN_USERNAME = os.environ.get('LOGIN_USERNAME', 'admin')
 LOGIN_PASSWORD = os.environ.get('LOGIN_PASSWORD', 'password') # IMPORTANT: Change in production!
 
+# --- Debug Timings ---
+SECONDS_BUCKETS = tuple(1e-6 * 2 ** i for i in range(28)) # 1 µs .. 134 s
+BYTES_BUCKETS = tuple(2 ** i for i in range(41)) # 1 B .. 1 TiB
+
+class Histogram:
+    """Counts observations in fixed exponential buckets, so recording is O(log buckets) and memory is constant."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1) # Last bucket holds values above the largest bound
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the given quantile (the maximum for the top bucket)."""
+        rank = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return 0.0
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "count": self.count,
+                "sum": self.sum,
+                "mean": self.sum / self.count if self.count else 0.0,
+                "p50": self.quantile(0.5),
+                "p95": self.quantile(0.95),
+                "p99": self.quantile(0.99),
+                "max": self.max,
+                "buckets": {f"{bound:g}": count for bound, count in zip(self.bounds + (float('inf'),), self.counts) if count},
+            }
+
+class Timings:
+    """Named histograms of request latency, pipeline stage durations, lock waits and sizes.
+
+    Names ending in '_bytes' count bytes, all others seconds.
+    """
+
+    def __init__(self, enabled=DEBUG_TIMINGS):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self._histograms = {}
+        self._locks = weakref.WeakSet() # Live TimedLocks
+        self._retired_lock_counts = {} # name -> [acquisitions, contended] of TimedLocks that were collected
+        self._lock = threading.Lock()
+
+    def observe(self, name, value):
+        if not self.enabled:
+            return
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(
+                    name, Histogram(BYTES_BUCKETS if name.endswith('_bytes') else SECONDS_BUCKETS))
+        histogram.observe(value)
+
+    @contextmanager
+    def time(self, name):
+        """Records the duration of the with block under name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+        return {name: dict(histogram.to_dict(), unit='bytes' if name.endswith('_bytes') else 'seconds')
+                for name, histogram in histograms}
+
+    def register_lock(self, lock):
+        with self._lock:
+            self._locks.add(lock)
+        weakref.finalize(lock, self._retire_lock, lock.name, lock.counts) # Keeps the counts of per-job locks
+
+    def _retire_lock(self, name, counts):
+        with self._lock:
+            totals = self._retired_lock_counts.setdefault(name, [0, 0])
+            totals[0] += counts[0]
+            totals[1] += counts[1]
+
+    def lock_counts(self):
+        """Returns {lock name: {acquisitions, contended}} summed over all TimedLocks of that name."""
+        with self._lock:
+            totals = {name: list(counts) for name, counts in self._retired_lock_counts.items()}
+            live = list(self._locks)
+        for lock in live:
+            counts = totals.setdefault(lock.name, [0, 0])
+            counts[0] += lock.counts[0]
+            counts[1] += lock.counts[1]
+        return {name: {"acquisitions": acquisitions, "contended": contended}
+                for name, (acquisitions, contended) in sorted(totals.items())}
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self._retired_lock_counts = {}
+            live = list(self._locks)
+            self.started_at = time.time()
+        for lock in live:
+            lock.counts[:] = [0, 0]
+
+timings = Timings()
+
+class TimedLock:
+    """threading.Lock that counts its acquisitions and records contended waits as lock_wait.<name>.
+
+    An uncontended acquisition only bumps a counter, done while holding the
+    lock, so the common path adds no second lock or histogram update.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = [0, 0] # Acquisitions, of which contended
+        self._histogram_name = f"lock_wait.{name}"
+        self._lock = threading.Lock()
+        timings.register_lock(self)
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self._lock.acquire(False):
+            self.counts[0] += 1
+            return True
+        if not blocking:
+            return False
+        start = time.perf_counter()
+        acquired = self._lock.acquire(True, timeout)
+        timings.observe(self._histogram_name, time.perf_counter() - start)
+        if acquired:
+            self.counts[0] += 1
+            self.counts[1] += 1
+        return acquired
+
+    def release(self):
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
 # --- Utility Functions for Logging ---
-def write_to_log(filename, content):
-    """Appends content to a specified log file."""
+class LogSink:
+    """Long-lived, buffered, thread-safe writer for one log file.
+
+    Keeps the file open for the lifetime of a job and batches lines in memory,
+    writing them out when LOG_FLUSH_BYTES are buffered, when LOG_FLUSH_INTERVAL
+    has elapsed (via a shared background flusher) or when the sink is closed.
+    With segment_bytes, the file is rotated to '<filename>.<n>' once it grows
+    past that size and the rotated segment is gzip-compressed in the background
+    (see log_segments for reading it back).
+    """
+
+    _open_sinks = weakref.WeakSet()
+    _registry_lock = threading.Lock()
+    _flusher_thread = None
+
+    def __init__(self, filename, flush_bytes=LOG_FLUSH_BYTES, flush_interval=LOG_FLUSH_INTERVAL, segment_bytes=None):
+        self.filename = filename
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self._segment_index = len(log_segments(filename)) if segment_bytes else 0 # Continue after existing segments
+        self._rotate_at = segment_bytes # File size that triggers the next rotation
+        self._file = open(filename, 'a', encoding='utf-8')
+        self._buffer = []
+        self._buffered_size = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._register(self)
+
+    def write_line(self, content):
+        """Buffers a single line, flushing if the size threshold is reached. Returns its size in bytes."""
+        size = (len(content) if content.isascii() else len(content.encode('utf-8'))) + 1
+        with self._lock:
+            if self._file is None:
+                return size
+            self._buffer.append(content + '\n')
+            self._buffered_size += size
+            if self._buffered_size >= self.flush_bytes:
+                self._flush_locked()
+        return size
+
+    def flush(self):
+        """Writes any buffered lines to disk."""
+        with self._lock:
+            self._flush_locked()
+
+    def flush_if_stale(self):
+        """Flushes only if the oldest buffered line has waited flush_interval."""
+        with self._lock:
+            if self._buffer and time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def close(self):
+        """Flushes remaining lines and closes the file."""
+        with self._lock:
+            self._flush_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        with LogSink._registry_lock:
+            LogSink._open_sinks.discard(self)
+
+    def discard(self):
+        """Drops buffered lines and closes the file; later writes are ignored.
+
+        Waits for a flush in progress, so nothing of this sink reaches the file
+        once it returns.
+        """
+        with self._lock:
+            self._buffer = []
+            self._buffered_size = 0
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        with LogSink._registry_lock:
+            LogSink._open_sinks.discard(self)
+
+    def _flush_locked(self):
+        if self._file is None:
+            return
+        if self._buffer:
+            start = time.perf_counter()
+            try:
+                self._file.write(''.join(self._buffer))
+                self._file.flush()
+            except Exception as e:
+                print(f"Error writing to log {self.filename}: {e}")
+            timings.observe('log.flush', time.perf_counter() - start)
+            timings.observe('log.flush_bytes', self._buffered_size)
+            self._buffer = []
+            self._buffered_size = 0
+            if self.segment_bytes and self._file.tell() >= self._rotate_at:
+                self._rotate_locked()
+        self._last_flush = time.monotonic()
+
+    def _rotate_locked(self):
+        """Moves the full file aside as the next segment and queues it for compression.
+
+        If the filesystem refuses, the current file is kept and written to as
+        before; rotation is tried again after another segment_bytes.
+        """
+        segment = f"{self.filename}.{self._segment_index + 1:06d}"
+        self._rotate_at = self._file.tell() + self.segment_bytes
+        try:
+            os.rename(self.filename, segment)
+        except OSError as e:
+            print(f"Error rotating log {self.filename}: {e}")
+            return
+        try:
+            new_file = open(self.filename, 'a', encoding='utf-8')
+        except OSError as e:
+            print(f"Error rotating log {self.filename}: {e}")
+            try:
+                os.rename(segment, self.filename) # Our handle still points at the file, put it back
+            except OSError:
+                pass
+            return
+        self._file.close()
+        self._file = new_file
+        self._rotate_at = self.segment_bytes
+        self._segment_index += 1
+        log_compressor.submit(compress_log_segment, segment)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @classmethod
+    def _register(cls, sink):
+        with cls._registry_lock:
+            cls._open_sinks.add(sink)
+            if cls._flusher_thread is None or not cls._flusher_thread.is_alive():
+                cls._flusher_thread = threading.Thread(target=cls._flush_loop, daemon=True)
+                cls._flusher_thread.start()
+
+    @classmethod
+    def _flush_loop(cls):
+        """Periodically flushes stale buffers so readers see output promptly."""
+        while True:
+            time.sleep(LOG_FLUSH_INTERVAL)
+            with cls._registry_lock:
+                sinks = list(cls._open_sinks)
+            for sink in sinks:
+                sink.flush_if_stale()
+
+def compress_log_segment(path):
+    """Gzips a rotated log segment to path + '.gz', then enforces log retention."""
+    temp_path = path + '.gz.tmp'
     try:
-        with open(filename, 'a', encoding='utf-8') as f:
-            f.write(content + '\n')
-    except Exception as e:
-        print(f"Error writing to log {filename}: {e}")
+        with open(path, 'rb') as src, gzip.open(temp_path, 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.replace(temp_path, path + '.gz') # Readers never see a half-written archive
+        os.remove(path)
+    except OSError as e:
+        print(f"Error compressing log segment {path}: {e}")
+    enforce_log_retention()
+
+log_compressor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='log-gzip')
+
+def log_segments(filename):
+    """Returns the paths of a log's rotated segments, oldest first.
+
+    A segment is '<filename>.<n>' while it waits for compression and
+    '<filename>.<n>.gz' afterwards; the live file itself is not included.
+    """
+    directory, base = os.path.split(filename)
+    segments = {}
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    for name in names:
+        if not name.startswith(base + '.'):
+            continue
+        index, _, extension = name[len(base) + 1:].partition('.')
+        if not index.isdigit() or extension not in ('', 'gz'):
+            continue
+        if extension == '' or int(index) not in segments: # Prefer the raw file while both exist
+            segments[int(index)] = os.path.join(directory, name)
+    return [segments[index] for index in sorted(segments)]
+
+def _open_log_part(path, segment=True):
+    """Opens one log file or segment for reading. Returns (file object, uncompressed size) or None."""
+    try:
+        raw = open(path, 'rb')
+    except FileNotFoundError:
+        if not segment or path.endswith('.gz') or not os.path.exists(path + '.gz'):
+            return None
+        path += '.gz' # Compressed between listing and opening
+        raw = open(path, 'rb')
+    if path.endswith('.gz'):
+        raw.seek(-4, os.SEEK_END)
+        size = int.from_bytes(raw.read(4), 'little')
+        raw.seek(0)
+        return gzip.GzipFile(fileobj=raw, mode='rb'), size
+    return raw, os.fstat(raw.fileno()).st_size
+
+def open_log(filename, attempts=5):
+    """Opens every part of a log for reading. Returns [(file object, uncompressed size)].
+
+    Files are opened up front, so a rotation or compression while the caller
+    reads does not change what it sees. The live file is opened before the
+    segments are listed, and if it was rotated away meanwhile (its inode no
+    longer matches the path) everything is opened again, so the segment just
+    renamed is neither skipped nor read twice. Gzip sizes come from the ISIZE
+    trailer, which is exact because segments are far below 4 GiB.
+    """
+    for attempt in range(attempts):
+        live = _open_log_part(filename, segment=False)
+        parts = [part for part in map(_open_log_part, log_segments(filename)) if part is not None]
+        try:
+            current = os.stat(filename).st_ino
+        except FileNotFoundError:
+            current = None # Between a rotation's rename and its new file
+        if live is not None:
+            parts.append(live)
+        if (live is not None and current == os.fstat(live[0].fileno()).st_ino) or (live is None and current is None):
+            return parts
+        if attempt == attempts - 1:
+            return parts # Rotating faster than we can open, give the caller the last attempt
+        for f, _ in parts:
+            f.close()
+
+def iter_log_bytes(parts, start=0, end=None, chunk_size=LOG_DOWNLOAD_CHUNK_BYTES):
+    """Yields the bytes start..end (exclusive) of a log opened with open_log, then closes it."""
+    try:
+        position = 0
+        for f, size in parts:
+            part_end = position + size
+            if end is not None and position >= end:
+                break
+            if part_end > start:
+                f.seek(max(0, start - position)) # Gzip files seek forward by decompressing
+                remaining = min(part_end, end if end is not None else part_end) - max(start, position)
+                while remaining > 0:
+                    data = f.read(min(chunk_size, remaining))
+                    if not data:
+                        break
+                    remaining -= len(data)
+                    yield data
+            position = part_end
+    finally:
+        for f, _ in parts:
+            f.close()
+
+class LogCursor:
+    """Line reader over a log opened with open_log that can jump to byte offsets.
+
+    Reading forward continues from the data already buffered, so a series of
+    jumps to increasing offsets never re-reads or re-decompresses a segment.
+    """
+
+    def __init__(self, filename, chunk_size=LOG_DOWNLOAD_CHUNK_BYTES):
+        self.parts = open_log(filename)
+        self.chunk_size = chunk_size
+        self._part = 0 # Index of the part being read
+        self._part_start = 0 # Log offset where that part begins
+        self._position = 0 # Log offset of the end of _buffer
+        self._buffer = b''
+        self._cursor = 0 # Read position inside _buffer
+
+    def close(self):
+        for f, _ in self.parts:
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def seek(self, offset):
+        buffer_start = self._position - len(self._buffer)
+        if buffer_start <= offset <= self._position:
+            self._cursor = offset - buffer_start
+            return
+        if offset < self._part_start:
+            self._part, self._part_start = 0, 0
+        while self._part < len(self.parts) and self._part_start + self.parts[self._part][1] <= offset:
+            self._part_start += self.parts[self._part][1]
+            self._part += 1
+        if self._part < len(self.parts):
+            self.parts[self._part][0].seek(offset - self._part_start) # Gzip parts seek by decompressing
+        self._position = offset
+        self._buffer, self._cursor = b'', 0
+
+    def _read_chunk(self):
+        while self._part < len(self.parts):
+            f, size = self.parts[self._part]
+            remaining = self._part_start + size - self._position
+            data = f.read(min(self.chunk_size, remaining)) if remaining > 0 else b''
+            if data:
+                self._position += len(data)
+                return data
+            self._part_start += size
+            self._part += 1
+            self._position = self._part_start
+            if self._part < len(self.parts):
+                self.parts[self._part][0].seek(0)
+        return b''
+
+    def lines(self):
+        """Yields decoded lines from the current position onwards."""
+        while True:
+            newline = self._buffer.find(b'\n', self._cursor)
+            if newline == -1:
+                chunk = self._read_chunk()
+                if not chunk:
+                    if self._cursor < len(self._buffer):
+                        line = self._buffer[self._cursor:]
+                        self._cursor = len(self._buffer)
+                        yield line.decode('utf-8', errors='replace')
+                    return
+                self._buffer = self._buffer[self._cursor:] + chunk
+                self._cursor = 0
+                continue
+            line = self._buffer[self._cursor:newline]
+            self._cursor = newline + 1
+            yield line.decode('utf-8', errors='replace')
+
+def enforce_log_retention(log_dir=JOBS_LOG_DIR, max_bytes=LOG_RETENTION_BYTES, min_free_bytes=LOG_MIN_FREE_BYTES):
+    """Deletes old job logs while they use more than max_bytes or /tmp has less than min_free_bytes free.
+
+    Whole logs of finished jobs are removed, oldest first. Logs still being
+    written are never touched: live downloads and the job's LogIndex byte
+    offsets rely on all of their segments.
+    """
+    with LogSink._registry_lock:
+        active = {os.path.basename(sink.filename) for sink in LogSink._open_sinks}
+    groups = {}
+    try:
+        entries = list(os.scandir(log_dir))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        groups.setdefault(entry.name.split('.', 1)[0], []).append((stat.st_mtime, entry.path, stat.st_size))
+    total = sum(size for files in groups.values() for _, _, size in files)
+    try:
+        free = shutil.disk_usage(log_dir).free
+    except OSError:
+        free = min_free_bytes
+    excess = max(total - max_bytes, min_free_bytes - free)
+    if excess <= 0:
+        return
+
+    candidates = [] # (mtime, paths, size) of finished logs
+    for name, files in groups.items():
+        if f"{name}.log" not in active:
+            candidates.append((max(mtime for mtime, _, _ in files), [path for _, path, _ in files],
+                               sum(size for _, _, size in files)))
+    for _, paths, size in sorted(candidates):
+        if excess <= 0:
+            break
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        excess -= size
+        print(f"Log retention: removed {len(paths)} file(s) of {os.path.basename(paths[0]).split('.', 1)[0]}")
 
 def clear_log(filename):
     """Clears the content of a specified log file."""
@@ -45,44 +657,2061 @@ def clear_log(filename):
     except Exception as e:
         print(f"Error clearing log {filename}: {e}")
 
-def read_full_log(filename):
-    """Reads the entire content of a specified log file."""
+def read_log_chunk(filename, offset=0, max_bytes=TERMINAL_OUTPUT_CHUNK_BYTES):
+    """Reads up to max_bytes of a log file starting at a byte offset.
+
+    Returns a tuple (text, next_offset, file_size). If the offset is past the end
+    of the file (e.g. the log was cleared), reading restarts from the beginning.
+    The chunk never ends in the middle of a UTF-8 sequence, so next_offset can be
+    passed back verbatim on the following call.
+    """
     try:
         if not os.path.exists(filename):
-            return ""
-        with open(filename, 'r', encoding='utf-8') as f:
-            return f.read()
+            return "", 0, 0
+        with open(filename, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            file_size = f.tell()
+            if offset < 0 or offset > file_size:
+                offset = 0
+            f.seek(offset)
+            data = f.read(max_bytes)
     except Exception as e:
-        print(f"Error reading full log from {filename}: {e}")
-        return ""
+        print(f"Error reading log chunk from {filename}: {e}")
+        return "", offset, offset
+
+    if offset + len(data) < file_size:
+        # Truncated by max_bytes: prefer cutting at a line boundary, otherwise
+        # drop a trailing incomplete multi-byte character.
+        newline_index = data.rfind(b'\n')
+        if newline_index != -1:
+            data = data[:newline_index + 1]
+        else:
+            cut = len(data)
+            while cut > 0 and len(data) - cut < 4 and (data[cut - 1] & 0xC0) == 0x80:
+                cut -= 1
+            if cut > 0 and data[cut - 1] >= 0xC0:
+                data = data[:cut - 1]
+    return data.decode('utf-8', errors='replace'), offset + len(data), file_size
+
+# --- Job Log Index and Search ---
+LOG_LEVEL_RE = re.compile(r'\b(DEBUG|INFO|NOTICE|WARNING|ERROR|CRITICAL|ALERT|EMERGENCY)\s*:')
+LOG_ERROR_LEVELS = {'ERROR', 'CRITICAL', 'ALERT', 'EMERGENCY'}
+LOG_ERROR_PATH_RE = re.compile(r'(?:ERROR|CRITICAL|ALERT|EMERGENCY)\s*:\s*(.+?): ')
+
+class LogIndex:
+    """Line-offset table and level/error summaries of one job log.
+
+    Built while lines are written (or by scanning a log from disk). Every
+    LOG_INDEX_STRIDE-th line start is recorded as a byte offset into the
+    uncompressed log, so any line can be reached by reading at most one stride.
+    Line numbers start at 1, like the job's output sequence numbers. Searches
+    run on a snapshot(), so lines added meanwhile do not change what they see.
+    """
+
+    def __init__(self, stride=LOG_INDEX_STRIDE):
+        self.stride = stride
+        self.complete = True # False if scan() stopped at max_bytes
+        self.line_count = 0
+        self.byte_count = 0
+        self.level_counts = {}
+        self.error_lines = array('L') # Line numbers of error-level lines
+        self.error_paths = {} # Path -> number of error lines naming it
+        self._offsets = array('Q') # Byte offset of line 1, 1 + stride, 1 + 2 * stride, ...
+
+    def add(self, line, size=None):
+        """Indexes the next line; size is its length in bytes including the newline, if known."""
+        if self.line_count % self.stride == 0:
+            self._offsets.append(self.byte_count)
+        self.line_count += 1
+        self.byte_count += size if size is not None else len(line.encode('utf-8')) + 1
+        match = LOG_LEVEL_RE.search(line, 0, 64) # The level is near the start, after the date
+        if not match:
+            return
+        level = match.group(1)
+        self.level_counts[level] = self.level_counts.get(level, 0) + 1
+        if level in LOG_ERROR_LEVELS:
+            self.error_lines.append(self.line_count)
+            path = LOG_ERROR_PATH_RE.search(line, match.start())
+            if path and not path.group(1).startswith('Attempt ') and (
+                    path.group(1) in self.error_paths or len(self.error_paths) < LOG_INDEX_MAX_PATHS):
+                self.error_paths[path.group(1)] = self.error_paths.get(path.group(1), 0) + 1
+
+    @classmethod
+    def scan(cls, filename, max_bytes=LOG_SCAN_MAX_BYTES):
+        """Builds an index by reading a log from disk, stopping after max_bytes (complete is then False)."""
+        index = cls()
+        with LogCursor(filename) as cursor:
+            for line in cursor.lines():
+                if index.byte_count >= max_bytes:
+                    index.complete = False
+                    break
+                index.add(line)
+        return index
+
+    def snapshot(self):
+        """Returns a copy that later add() calls do not change.
+
+        Recorded offsets never change, so the offset table is shared; the caller
+        must hold the writer's lock.
+        """
+        view = copy.copy(self)
+        view.level_counts = dict(self.level_counts)
+        view.error_lines = self.error_lines[:]
+        view.error_paths = dict(self.error_paths)
+        return view
+
+    def summary(self, top_paths=50):
+        paths = sorted(self.error_paths.items(), key=lambda item: -item[1])[:top_paths]
+        return {
+            "line_count": self.line_count,
+            "byte_count": self.byte_count,
+            "complete": self.complete,
+            "level_counts": dict(self.level_counts),
+            "error_count": len(self.error_lines),
+            "error_paths": [{"path": path, "count": count} for path, count in paths],
+            "error_paths_total": len(self.error_paths),
+        }
+
+    def iter_lines(self, cursor, first, last):
+        """Yields (line number, text) for lines first..last, read through a LogCursor."""
+        first = max(1, first)
+        last = min(last, self.line_count)
+        if first > last:
+            return
+        block = (first - 1) // self.stride
+        cursor.seek(self._offsets[block])
+        number = block * self.stride + 1
+        for text in cursor.lines():
+            if number >= first:
+                yield number, text
+            if number >= last:
+                return
+            number += 1
+
+def search_log(index, filename, first=1, last=None, tail=None, level=None, pattern=None, limit=LOG_QUERY_MAX_LINES):
+    """Returns (lines, scanned_from, scanned_to) for a log query.
+
+    lines are (number, text) pairs in order. Without filters the lines
+    first..last are returned (the last `tail` lines of that range if tail is
+    set). With a level and/or compiled regex pattern, matching lines are
+    returned: the first `limit` matches, or the last `tail` ones. Error levels
+    are answered from the index; other filters read at most
+    LOG_SEARCH_MAX_BYTES, and scanned_from..scanned_to tells the caller which
+    lines were covered so it can continue from there.
+    """
+    last = index.line_count if last is None else min(last, index.line_count)
+    first = max(1, first)
+    limit = min(limit, tail or limit)
+
+    def matches(text):
+        if level is not None:
+            found = LOG_LEVEL_RE.search(text, 0, 64)
+            if not found or found.group(1) != level:
+                return False
+        return pattern is None or pattern.search(text) is not None
+
+    with LogCursor(filename) as cursor:
+        if level is None and pattern is None:
+            if tail:
+                first = max(first, last - limit + 1)
+            last = min(last, first + limit - 1)
+            return list(index.iter_lines(cursor, first, last)), first, last
+
+        if level in LOG_ERROR_LEVELS:
+            # Only the indexed error lines are read, in increasing order
+            candidates = [n for n in index.error_lines if first <= n <= last]
+            if tail:
+                candidates.reverse()
+            found = []
+            for offset in range(0, len(candidates), limit):
+                batch = sorted(candidates[offset:offset + limit])
+                matched = [(number, text) for n in batch for number, text in index.iter_lines(cursor, n, n) if matches(text)]
+                found = matched + found if tail else found + matched
+                if len(found) >= limit:
+                    break
+            if len(found) < limit:
+                return found, first, last
+            return (found[-limit:], found[-limit][0], last) if tail else (found[:limit], first, found[limit - 1][0])
+
+        budget = max(index.stride, LOG_SEARCH_MAX_BYTES // max(1, index.byte_count // max(1, index.line_count)))
+        if not tail:
+            found = []
+            scanned_to = min(last, first + budget - 1)
+            for number, text in index.iter_lines(cursor, first, scanned_to):
+                if matches(text):
+                    found.append((number, text))
+                    if len(found) >= limit:
+                        return found, first, number
+            return found, first, scanned_to
+
+        # Tail: scan windows backwards from the end, doubling in size, until there are enough matches
+        found = []
+        window_end, window = last, index.stride * 16
+        while window_end >= first and len(found) < limit and last - window_end < budget:
+            window_start = max(first, window_end - window + 1)
+            found = [(n, text) for n, text in index.iter_lines(cursor, window_start, window_end) if matches(text)] + found
+            window_end, window = window_start - 1, window * 2
+        if len(found) >= limit:
+            return found[-limit:], found[-limit][0], last
+        return found, window_end + 1, last
 
 # --- Ensure Directories Exist on Startup ---
 def create_initial_dirs():
     """Creates necessary directories for the application."""
     os.makedirs(BASE_CONFIG_DIR, exist_ok=True)
-    # Ensure logs are cleared on startup for a fresh start each deployment/restart
-    clear_log(LOG_FILE)
+    # Job logs of earlier runs are kept (within the retention limits) so they stay downloadable
+    os.makedirs(JOBS_LOG_DIR, exist_ok=True)
+    enforce_log_retention()
     clear_log(TERMINAL_LOG_FILE)
-    print(f"Directories created: {BASE_CONFIG_DIR}")
-    print(f"Logs cleared: {LOG_FILE}, {TERMINAL_LOG_FILE}")
+    print(f"Directories created: {BASE_CONFIG_DIR}, {JOBS_LOG_DIR}")
+    print(f"Logs cleared: {TERMINAL_LOG_FILE}")
 
 # Call directory creation on app startup
 with app.app_context():
     create_initial_dirs()
 
-# --- Global Variables for Rclone and Terminal Processes ---
-# Rclone process management
-rclone_process = None
-rclone_output_buffer = [] # Not directly used for streaming to client, but can be for internal state
-rclone_lock = threading.Lock() # Protects rclone_process and rclone_output_buffer
-stop_rclone_flag = threading.Event() # Flag to signal rclone process to stop
+# --- Process Helpers ---
+def signal_process_group(process, sig):
+    """Sends sig to the process group led by process (started with start_new_session=True)."""
+    try:
+        os.killpg(process.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass # Everything in the group has already exited
+
+def terminate_process(process, grace=5, group=False):
+    """Sends SIGTERM and kills the process if it is still alive after `grace` seconds.
+
+    With group=True the whole process group is signalled, so children of a shell
+    (which would otherwise keep its output pipe open) are stopped as well; the
+    process must have been started with start_new_session=True. Returns
+    immediately; the wait happens on a background thread so request handlers
+    (stop buttons) never block on a slow-exiting process.
+    """
+    if process is None or process.poll() is not None:
+        return
+    if group:
+        signal_process_group(process, signal.SIGTERM)
+    else:
+        process.terminate() # Send SIGTERM
+
+    def reap():
+        try:
+            process.wait(timeout=grace) # Wait for process to terminate
+        except subprocess.TimeoutExpired:
+            if not group:
+                process.kill() # If still running after timeout, kill it
+        if group:
+            signal_process_group(process, signal.SIGKILL) # Children that ignored SIGTERM
+        process.wait()
+    threading.Thread(target=reap, daemon=True).start()
+
+# --- Subprocess Output Reading ---
+class PipeLineReader:
+    """Reads a subprocess pipe in byte chunks and yields (text, complete) tuples.
+
+    The pipe is read without blocking and decoded incrementally as UTF-8, so a
+    character split across reads is never mangled. Carriage-return redraws
+    (progress bars) are collapsed to their latest state instead of accumulating.
+    complete is True for lines ended by a newline (or cut at max_line_chars). A
+    line still being written is yielded with complete=False after partial_after
+    seconds, and again whenever it changes, at most once per partial_after.
+    Bytes read are added to job.pipe_bytes when a job is given. Iteration ends
+    within PIPE_STOP_POLL_SECONDS of stop_flag being set, even if the pipe is
+    held open by a process that outlived the one it was started for.
+    """
+
+    def __init__(self, pipe, partial_after=PARTIAL_LINE_SECONDS, max_line_chars=MAX_LINE_CHARS, job=None,
+                 stop_flag=None):
+        self.pipe = pipe
+        self.job = job
+        self.stop_flag = stop_flag
+        self.partial_after = partial_after
+        self.max_line_chars = max_line_chars
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._current = '' # Unfinished line, at most one trailing '\r' is kept
+        self._current_since = None # When the unfinished line started
+        self._partial_at = 0 # When a partial line was last yielded
+        self._partial_sent = '' # Last partial text yielded
+
+    @staticmethod
+    def _collapse(text):
+        """Returns what a terminal would show for text: the part after the last carriage return."""
+        text = text.rstrip('\r')
+        cut = text.rfind('\r')
+        return text[cut + 1:] if cut >= 0 else text
+
+    def _feed(self, data):
+        """Splits decoded text into complete lines and updates the unfinished one."""
+        lines = []
+        *complete, rest = (self._current + data).split('\n')
+        for line in complete:
+            lines.append((self._collapse(line), True))
+        if complete:
+            self._current_since = None
+            self._partial_sent = ''
+        if '\r' in rest[:-1]:
+            rest = rest[rest.rfind('\r', 0, len(rest) - 1) + 1:] # Keep only the latest redraw
+        while len(rest) > self.max_line_chars:
+            lines.append((rest[:self.max_line_chars], True))
+            rest = rest[self.max_line_chars:]
+        if rest and self._current_since is None:
+            self._current_since = time.monotonic()
+        self._current = rest
+        return lines
+
+    def _partial(self):
+        """Returns the unfinished line if it is due to be shown, else None."""
+        if self._current_since is None:
+            return None
+        now = time.monotonic()
+        if now - self._current_since < self.partial_after or now - self._partial_at < self.partial_after:
+            return None
+        text = self._collapse(self._current)
+        if text == self._partial_sent:
+            return None
+        self._partial_at = now
+        self._partial_sent = text
+        return text
+
+    def __iter__(self):
+        fd = self.pipe.fileno()
+        os.set_blocking(fd, False)
+        with selectors.DefaultSelector() as selector:
+            selector.register(fd, selectors.EVENT_READ)
+            while self.stop_flag is None or not self.stop_flag.is_set():
+                timeout = self.partial_after if self._current else None # Wake up to show a stalled line
+                if self.stop_flag is not None:
+                    timeout = min(timeout or PIPE_STOP_POLL_SECONDS, PIPE_STOP_POLL_SECONDS)
+                if selector.select(timeout):
+                    try:
+                        chunk = os.read(fd, PIPE_READ_BYTES)
+                    except BlockingIOError:
+                        continue
+                    if not chunk:
+                        break # EOF
+                    start = time.perf_counter()
+                    lines = self._feed(self._decoder.decode(chunk))
+                    timings.observe('pipe.decode', time.perf_counter() - start)
+                    timings.observe('pipe.read_bytes', len(chunk))
+                    if self.job is not None:
+                        self.job.count_pipe_bytes(len(chunk))
+                    yield from lines
+                partial = self._partial()
+                if partial is not None:
+                    yield partial, False
+        rest = self._current + self._decoder.decode(b'', final=True)
+        self._current = ''
+        if self._collapse(rest):
+            yield self._collapse(rest), True
+
+# --- Rclone Stats Parsing ---
+ANSI_ESCAPE_RE = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]')
+SIZE_PATTERN = r'([\d.]+)\s*([kKMGTPE]?i?)(?:B|Bytes|Byte)?'
+STATS_BYTES_RE = re.compile(
+    SIZE_PATTERN + r'\s*/\s*' + SIZE_PATTERN + r',\s*(?:(\d+)%|-),\s*' + SIZE_PATTERN + r'/s,\s*ETA\s*(\S+)'
+)
+STATS_XFR_RE = re.compile(r'\(xfr#(\d+)/(\d+)\)')
+STATS_FILES_RE = re.compile(r'^Transferred:\s+(\d+)\s*/\s*(\d+),')
+STATS_CHECKS_RE = re.compile(r'^Checks:\s+(\d+)\s*/\s*(\d+),')
+STATS_ERRORS_RE = re.compile(r'^Errors:\s+(\d+)')
+STATS_ELAPSED_RE = re.compile(r'^Elapsed time:\s+(\S+)')
+DURATION_PART_RE = re.compile(r'([\d.]+)(ms|d|h|m|s)')
+DURATION_UNITS = {'d': 86400, 'h': 3600, 'm': 60, 's': 1, 'ms': 0.001}
+SIZE_MULTIPLIERS = {
+    '': 1, 'k': 1000, 'K': 1000, 'M': 1000 ** 2, 'G': 1000 ** 3, 'T': 1000 ** 4, 'P': 1000 ** 5, 'E': 1000 ** 6,
+    'Ki': 1024, 'Mi': 1024 ** 2, 'Gi': 1024 ** 3, 'Ti': 1024 ** 4, 'Pi': 1024 ** 5, 'Ei': 1024 ** 6,
+}
+
+def parse_size(value, unit, binary=False):
+    """Converts an Rclone size like ('1.5', 'Gi') to bytes. Legacy 'MBytes' units are binary."""
+    if binary and unit and not unit.endswith('i'):
+        unit = unit.upper() + 'i'
+    return int(float(value) * SIZE_MULTIPLIERS.get(unit, 1))
+
+def parse_duration(text):
+    """Converts an Rclone duration like '1h2m3.5s' to seconds, or None for '-'."""
+    parts = DURATION_PART_RE.findall(text)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+class StatsParser:
+    """Extracts numeric stats from Rclone's --stats output, one line at a time.
+
+    Understands both the one-line format (--stats-one-line[-date]) and the
+    multi-line block printed by --progress. feed() returns a sample dict when a
+    complete set of stats was seen, otherwise None.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self.last_sample = None
+
+    def feed(self, line):
+        line = ANSI_ESCAPE_RE.sub('', line).strip()
+        if not line:
+            return None
+        in_block = line.startswith(('Transferred:', 'Errors:', 'Checks:', 'Elapsed time:'))
+
+        match = STATS_BYTES_RE.search(line)
+        if match:
+            binary = 'Bytes' in line
+            self._pending.update({
+                'bytes': parse_size(match.group(1), match.group(2), binary),
+                'total_bytes': parse_size(match.group(3), match.group(4), binary),
+                'speed': parse_size(match.group(6), match.group(7), binary),
+                'eta': parse_duration(match.group(8)),
+            })
+            xfr = STATS_XFR_RE.search(line)
+            if xfr:
+                self._pending['transfers'] = int(xfr.group(1))
+                self._pending['total_transfers'] = int(xfr.group(2))
+            if not in_block:
+                return self._emit() # One-line stats are complete on their own
+            return None
+        if not in_block:
+            return None
+
+        match = STATS_FILES_RE.match(line)
+        if match:
+            self._pending['transfers'] = int(match.group(1))
+            self._pending['total_transfers'] = int(match.group(2))
+            return None
+        match = STATS_CHECKS_RE.match(line)
+        if match:
+            self._pending['checks'] = int(match.group(1))
+            self._pending['total_checks'] = int(match.group(2))
+            return None
+        match = STATS_ERRORS_RE.match(line)
+        if match:
+            self._pending['errors'] = int(match.group(1))
+            return None
+        match = STATS_ELAPSED_RE.match(line)
+        if match:
+            self._pending['elapsed'] = parse_duration(match.group(1))
+            return self._emit() # Elapsed time closes a --progress block
+        return None
+
+    def _emit(self):
+        sample = dict(self.last_sample or {}, **self._pending)
+        sample.setdefault('errors', 0)
+        sample['time'] = time.time()
+        self._pending = {}
+        self.last_sample = sample
+        return sample
+
+class MetricsSeries:
+    """Fixed-size time series of stats samples for one job, stored as tuples."""
+
+    FIELDS = ('time', 'bytes', 'total_bytes', 'speed', 'eta', 'errors', 'checks', 'total_checks',
+              'transfers', 'total_transfers', 'elapsed')
+
+    def __init__(self, max_points=JOB_METRICS_POINTS):
+        self._points = deque(maxlen=max_points)
+        self._lock = threading.Lock()
+
+    def append(self, sample):
+        point = tuple(sample.get(field) for field in self.FIELDS)
+        with self._lock:
+            self._points.append(point)
+
+    def points(self, since=None):
+        with self._lock:
+            points = list(self._points)
+        if since is not None:
+            points = [point for point in points if point[0] > since]
+        return points
+
+    def latest(self):
+        """Returns the newest sample as a dict, or None if nothing was recorded."""
+        with self._lock:
+            point = self._points[-1] if self._points else None
+        return dict(zip(self.FIELDS, point)) if point else None
+
+# --- Rclone Remote Control (rcd) Backend ---
+class RcloneRcError(Exception):
+    """Raised when the rc server cannot be reached or a call fails."""
+
+class RcloneRcClient:
+    """Client for Rclone's remote control API over a small pool of keep-alive connections."""
+
+    def __init__(self, base_url, user=None, password=None, pool_size=RC_POOL_SIZE, timeout=60):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._headers = {"Content-Type": "application/json"}
+        if user:
+            token = base64.b64encode(f"{user}:{password or ''}".encode('utf-8')).decode('ascii')
+            self._headers["Authorization"] = f"Basic {token}"
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def call(self, method, params=None):
+        """POSTs params to /<method> and returns the decoded JSON result.
+
+        Calls that start work (sync/*, _async) are never retried, since the
+        server may have received the first attempt; they use a fresh connection
+        instead of one that may have gone stale.
+        """
+        body = json.dumps(params or {}).encode('utf-8') # bytes are sent in the same packet as the headers
+        retry = not (method.startswith('sync/') or (params or {}).get('_async'))
+        for attempt in range(2 if retry else 1): # Retry once on a kept-alive connection the server has closed
+            connection = self._acquire() if retry else self._connect()
+            try:
+                connection.request('POST', f"/{method}", body=body, headers=self._headers)
+                response = connection.getresponse()
+                payload = response.read()
+            except (http.client.HTTPException, OSError) as e:
+                connection.close()
+                if attempt or not retry:
+                    raise RcloneRcError(f"{method}: {e}") from e
+                continue
+            self._release(connection)
+            try:
+                result = json.loads(payload or b'{}')
+            except ValueError:
+                raise RcloneRcError(f"{method}: invalid response from rc server")
+            if response.status != 200:
+                raise RcloneRcError(f"{method}: {result.get('error', f'HTTP {response.status}')}")
+            return result
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _connect(self):
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _release(self, connection):
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+class RcdManager:
+    """Starts and supervises one long-lived `rclone rcd` shared by all rc jobs.
+
+    When RCLONE_RCD_URL is set, that server is used as-is and nothing is started;
+    it should be started with --drive-skip-gdocs=true like the managed one.
+    """
+
+    def __init__(self, addr=RCD_ADDR, url=RCD_URL, user=RCD_USER, password=RCD_PASS):
+        self.addr = addr
+        self.url = url
+        self.user = user
+        self.password = password
+        self.process = None
+        self._client = None
+        self._lock = threading.Lock() # Protects process and _client
+
+    def client(self):
+        """Returns a client for a healthy rc server, (re)starting rclone rcd if needed."""
+        with self._lock:
+            if self._client and (self.url or (self.process and self.process.poll() is None)):
+                return self._client
+            if self._client:
+                self._client.close()
+            if self.url:
+                self._client = RcloneRcClient(self.url, self.user, self.password)
+            else:
+                self._client = self._start()
+            return self._client
+
+    def shutdown(self):
+        with self._lock:
+            if self._client:
+                self._client.close()
+                self._client = None
+            if self.process and self.process.poll() is None:
+                self.process.terminate()
+            self.process = None
+
+    def _start(self):
+        cmd = [
+            RCLONE_BINARY, "rcd",
+            f"--config={RCLONE_CONFIG_PATH}",
+            f"--rc-addr={self.addr}",
+            f"--rc-user={self.user}",
+            f"--rc-pass={self.password}",
+            "--drive-skip-gdocs=true", # Same default the subprocess path uses
+        ]
+        print(f"Starting Rclone rc server on {self.addr}, logging to {RCD_LOG_FILE}")
+        with open(RCD_LOG_FILE, 'ab') as log_file:
+            self.process = subprocess.Popen(cmd, stdout=log_file, stderr=subprocess.STDOUT, env=rclone_environment())
+        client = RcloneRcClient(f"http://{self.addr}", self.user, self.password)
+        deadline = time.monotonic() + 15
+        while True:
+            try:
+                client.call('rc/noop')
+                return client
+            except RcloneRcError:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.process.terminate()
+                    raise RcloneRcError("rclone rcd did not start.")
+                time.sleep(0.1)
+
+rcd_manager = RcdManager()
+atexit.register(rcd_manager.shutdown)
+
+RC_LIST_OPTIONS = {'lsd': {'dirsOnly': True}, 'ls': {'recurse': True, 'filesOnly': True}}
+RC_SIMPLE_METHODS = {'mkdir': 'operations/mkdir', 'purge': 'operations/purge', 'cleanup': 'operations/cleanup'}
+RC_ASYNC_METHODS = {'sync/sync', 'sync/copy', 'sync/move', 'operations/check'}
+
+def build_rc_call(data):
+    """Translates a request payload into an rc (method, params) pair.
+
+    Returns None when the request needs features only the command line offers
+    (additional flags, service accounts, Drive trash, dry runs, --order-by,
+    --drive-chunk-size, a log level other than INFO, other modes); such jobs
+    fall back to the subprocess backend. Dry runs in particular must never reach
+    rc methods that ignore _config.
+    """
+    mode = data.get('mode')
+    source = data.get('source', '').strip()
+    destination = data.get('destination', '').strip()
+    if data.get('additional_flags', '').strip() or data.get('service_account') or data.get('use_drive_trash'):
+        return None
+    if data.get('shards') or data.get('auto_tune') or data.get('incremental'):
+        return None
+    if data.get('dry_run') or data.get('order') or data.get('buffer_size') or data.get('loglevel') not in (None, '', 'Info'):
+        return None
+
+    config = {}
+    if data.get('transfers'):
+        config['Transfers'] = int(data['transfers'])
+    if data.get('checkers'):
+        config['Checkers'] = int(data['checkers'])
+
+    if mode == 'listremotes':
+        return 'config/listremotes', {}
+    if mode == 'version':
+        return 'core/version', {}
+    if mode in RC_LIST_OPTIONS:
+        return 'operations/list', {'fs': source, 'remote': '', 'opt': RC_LIST_OPTIONS[mode], '_config': config}
+    if mode == 'size':
+        return 'operations/size', {'fs': source, '_config': config}
+    if mode in RC_SIMPLE_METHODS:
+        return RC_SIMPLE_METHODS[mode], {'fs': source, 'remote': '', '_config': config}
+    if mode in ('sync', 'copy', 'move'):
+        return f"sync/{mode}", {'srcFs': source, 'dstFs': destination, '_config': config}
+    if mode == 'check':
+        return 'operations/check', {'srcFs': source, 'dstFs': destination, '_config': config}
+    return None
+
+def format_size(num_bytes):
+    """Formats a byte count the way Rclone's stats do (e.g. '1.500 GiB')."""
+    value = float(num_bytes or 0)
+    for unit in ('B', 'KiB', 'MiB', 'GiB', 'TiB'):
+        if value < 1024 or unit == 'TiB':
+            return f"{value:.0f} {unit}" if unit == 'B' else f"{value:.3f} {unit}"
+        value /= 1024
+
+def format_duration(seconds):
+    """Formats seconds the way Rclone does (e.g. '1h2m3s'), '-' when unknown."""
+    if seconds is None:
+        return '-'
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}h{minutes}m{secs}s"
+    return f"{minutes}m{secs}s" if minutes else f"{secs}s"
+
+def percent(done, total):
+    return f"{int(done * 100 / total)}%" if total else '-'
+
+def format_rc_stats(stats):
+    """Renders a core/stats result as the multi-line block --progress prints."""
+    transferred, total = stats.get('bytes', 0), stats.get('totalBytes', 0)
+    return [
+        f"Transferred:   {format_size(transferred)} / {format_size(total)}, {percent(transferred, total)}, "
+        f"{format_size(stats.get('speed', 0))}/s, ETA {format_duration(stats.get('eta'))}",
+        f"Errors:        {stats.get('errors', 0)}",
+        f"Checks:        {stats.get('checks', 0)} / {stats.get('totalChecks', 0)}, {percent(stats.get('checks', 0), stats.get('totalChecks', 0))}",
+        f"Transferred:   {stats.get('transfers', 0)} / {stats.get('totalTransfers', 0)}, {percent(stats.get('transfers', 0), stats.get('totalTransfers', 0))}",
+        f"Elapsed time:  {stats.get('elapsedTime', 0):.1f}s",
+    ]
+
+def format_rc_result(mode, result):
+    """Renders a synchronous rc result like the equivalent Rclone command's output."""
+    if mode == 'listremotes':
+        return [f"{remote}:" for remote in result.get('remotes', [])]
+    if mode == 'version':
+        return [f"rclone {result.get('version', '')}", f"- os/arch: {result.get('os', '')}/{result.get('arch', '')}",
+                f"- go/version: {result.get('goVersion', '')}"]
+    if mode == 'lsd':
+        return [f"{-1:>12} {item.get('ModTime', '')[:19].replace('T', ' ')} {-1:>9} {item.get('Path', '')}"
+                for item in result.get('list', [])]
+    if mode == 'ls':
+        return [f"{item.get('Size', 0):>9} {item.get('Path', '')}" for item in result.get('list', [])]
+    if mode == 'size':
+        return [f"Total objects: {result.get('count', 0)}",
+                f"Total size: {format_size(result.get('bytes', 0))} ({result.get('bytes', 0)} Byte)"]
+    return [json.dumps(result)] if result else []
+
+# --- Remote Listing Cache ---
+CACHEABLE_MODES = {"lsd", "ls", "tree", "size", "listremotes"}
+MUTATING_MODES = {"sync", "copy", "move", "copyurl", "mkdir", "dedupe", "cleanup", "delete", "deletefile", "purge"}
+
+def normalize_remote_path(path):
+    """Normalizes 'remote:dir/sub/' to 'remote:dir/sub' so equal paths share cache entries."""
+    path = (path or '').strip()
+    if path.endswith('/') and not path.endswith(':/'):
+        path = path.rstrip('/')
+    return path
+
+def remote_paths_overlap(a, b):
+    """True if one path equals or contains the other (a change in one can affect a listing of the other)."""
+    if a == b:
+        return True
+    shorter, longer = sorted((a, b), key=len)
+    if not shorter or not longer.startswith(shorter):
+        return False
+    return shorter.endswith((':', '/')) or longer[len(shorter)] == '/'
+
+def listing_cache_key(data, cmd, rc_call=None):
+    """Cache key for a listing request: (mode, path, backend, Rclone arguments).
+
+    The arguments are the final command line, so every option that changes the
+    output (log level, service accounts, Drive flags, additional flags) is part
+    of the key. Only the progress and stats flags, which every job gets, are left out.
+    """
+    source = data.get('source', '').strip()
+    args = tuple(arg for arg in cmd[2:] if arg != source and not arg.startswith(LISTING_UNSAFE_FLAGS))
+    return (data.get('mode'), normalize_remote_path(source), 'rcd' if rc_call else 'subprocess', args)
+
+def mutated_paths(data):
+    """Remote paths whose listings a mutating request can change."""
+    mode = data.get('mode')
+    if mode in ('sync', 'copy', 'copyurl'):
+        return [normalize_remote_path(data.get('destination'))]
+    if mode == 'move':
+        return [normalize_remote_path(data.get('source')), normalize_remote_path(data.get('destination'))]
+    if mode in MUTATING_MODES:
+        return [normalize_remote_path(data.get('source'))]
+    return []
+
+class ListingCache:
+    """TTL + LRU cache of listing output (lsd/ls/tree/size/listremotes).
+
+    Entries are invalidated when a mutating job targets an overlapping path,
+    both when the job is submitted and when it finishes. Every invalidation
+    bumps generation; a listing stores its output only if no invalidation
+    happened since it was submitted, since it may have listed a path mid-change.
+    """
+
+    def __init__(self, ttl=LISTING_CACHE_TTL, max_entries=LISTING_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # key -> (expires_at, lines), least recently used first
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, key):
+        """Returns the cached lines for key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                self.counters["expirations"] += 1
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry[1]
+
+    def put(self, key, lines, generation=None):
+        """Stores lines, unless the cache was invalidated after `generation` was read."""
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, tuple(lines))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def invalidate(self, paths):
+        """Drops every entry whose path overlaps one of the given paths."""
+        with self._lock:
+            self.generation += 1
+            stale = [key for key in self._entries if any(remote_paths_overlap(key[1], path) for path in paths if path)]
+            for key in stale:
+                del self._entries[key]
+            self.counters["invalidations"] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self.counters["invalidations"] += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, entries=len(self._entries), max_entries=self.max_entries, ttl=self.ttl)
+
+listing_cache = ListingCache()
+
+# --- Sharded Transfers Across Service Accounts ---
+SHARDABLE_MODES = {"copy", "sync"}
+# Only exhaustion of an account's quota; rate-limit retries are paced by rclone itself
+QUOTA_ERROR_RE = re.compile(r'\b(?:uploadLimitExceeded|dailyLimitExceeded|storageQuotaExceeded|quotaExceeded)\b')
+
+def is_quota_error(line):
+    """True for an ERROR-level rclone line reporting that the account's quota is used up."""
+    match = LOG_LEVEL_RE.search(line, 0, 64) # The level is near the start, after the date
+    return bool(match and match.group(1) in LOG_ERROR_LEVELS and QUOTA_ERROR_RE.search(line))
+
+def list_service_accounts():
+    """Returns the paths of uploaded service account JSON files."""
+    if not os.path.exists(SERVICE_ACCOUNT_DIR):
+        return []
+    return sorted(os.path.join(SERVICE_ACCOUNT_DIR, f) for f in os.listdir(SERVICE_ACCOUNT_DIR) if f.endswith('.json'))
+
+def plan_shards(files, shard_count):
+    """Splits (path, size) file entries into up to shard_count size-balanced buckets.
+
+    Files under the same top-level directory stay together unless that
+    directory alone is larger than a fair share, in which case it is split.
+    Buckets are filled largest-first into the currently lightest bucket.
+    Returns a list of (total_size, [paths]).
+    """
+    groups = {}
+    for path, size in files:
+        top = path.split('/', 1)[0] if '/' in path else '' # Root-level files form one group
+        groups.setdefault(top, []).append((path, size))
+    fair_share = max(1, sum(size for _, size in files) / shard_count)
+
+    units = []
+    for group in groups.values():
+        group_size = sum(size for _, size in group)
+        if group_size <= fair_share or len(group) == 1:
+            units.append((group_size, [path for path, _ in group]))
+            continue
+        chunk, chunk_size = [], 0
+        for path, size in group:
+            if chunk and chunk_size + size > fair_share:
+                units.append((chunk_size, chunk))
+                chunk, chunk_size = [], 0
+            chunk.append(path)
+            chunk_size += size
+        units.append((chunk_size, chunk))
+
+    buckets = [(0, index, []) for index in range(shard_count)]
+    for unit_size, paths in sorted(units, key=lambda unit: -unit[0]):
+        load, index, bucket_paths = heapq.heappop(buckets)
+        bucket_paths.extend(paths)
+        heapq.heappush(buckets, (load + unit_size, index, bucket_paths))
+    return [(load, paths) for load, _, paths in sorted(buckets, key=lambda bucket: bucket[1]) if paths]
+
+class ShardedTransfer:
+    """Runs a copy/sync as parallel Rclone workers, each pinned to its own service account.
+
+    The source is listed once, split into size-balanced shards and every shard
+    is copied with --files-from-raw. A worker that hits a Drive quota error is
+    restarted on the next unused service account; the exhausted account is
+    retired. For sync, a final single-worker sync pass removes extraneous files
+    at the destination. Aggregated stats are written to the job every
+    RC_STATS_INTERVAL seconds.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.source = job.params['source'].strip()
+        self.destination = job.params['destination'].strip()
+        self.shard_count = int(job.params['shards'])
+        self.accounts = queue.Queue()
+        for account in list_service_accounts():
+            self.accounts.put(account)
+        # Flags shared by every worker: the request's flags without the service account directory
+        copy_cmd, _ = build_rclone_command(dict(job.params, mode='copy', service_account=False))
+        self.common_flags = copy_cmd[5:] # Drop binary, mode, --config, source and destination
+        self.samples = {}
+        self.totals = {}
+        self.started = time.monotonic()
+        self.last_stats_at = 0
+        self._lock = threading.Lock() # Protects samples and last_stats_at
+
+    def run(self):
+        account = self.accounts.get_nowait() if not self.accounts.empty() else None
+        if account is None:
+            self.job.write_output("ERROR : No service accounts available for a sharded transfer.")
+            return 1
+        files = self._list_source(account)
+        self.accounts.put(account)
+        if files is None:
+            return 1
+        shards = plan_shards(files, self.shard_count)
+        self.job.write_output(f"Sharded transfer: {len(files)} files split into {len(shards)} shards.")
+
+        threads = []
+        for index, (size, paths) in enumerate(shards, start=1):
+            files_from = os.path.join(JOBS_LOG_DIR, f"{self.job.id}.shard{index}.files")
+            with open(files_from, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(paths) + '\n')
+            self.totals[index] = size
+            self.job.shards.append({"shard": index, "files": len(paths), "bytes": size, "status": 'queued',
+                                    "service_account": None, "rotations": 0})
+            thread = threading.Thread(target=self._run_shard, args=(index, files_from), daemon=True)
+            threads.append(thread)
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for index in self.totals:
+            os.remove(os.path.join(JOBS_LOG_DIR, f"{self.job.id}.shard{index}.files"))
+        self._write_stats(force=True)
+
+        if any(shard['status'] != 'completed' for shard in self.job.shards):
+            return 1
+        if self.job.params.get('mode') == 'sync' and not self.job.stop_event.is_set():
+            self.job.write_output("All shards copied, running final sync pass to remove extraneous files.")
+            return 0 if self._run_worker('final', 'sync', None, None) == 'completed' else 1
+        return 0
+
+    def _list_source(self, account):
+        """Lists all files of the source as (path, size). Returns None on failure.
+
+        The workers' flags (filters in particular) apply to the listing too, so
+        the plan only holds files the workers will transfer.
+        """
+        flags = [arg for arg in self.common_flags if not arg.startswith(LISTING_UNSAFE_FLAGS)]
+        cmd = [RCLONE_BINARY, "lsjson", f"--config={RCLONE_CONFIG_PATH}", "-R", "--files-only",
+               f"--drive-service-account-file={account}", self.source] + flags
+        self.job.write_output(f"Listing {self.source} to plan shards...")
+        files = []
+        with tempfile.TemporaryFile() as errors: # Not a pipe, lsjson must never block on its log output
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errors,
+                                       universal_newlines=True, env=self.job.env)
+            self.job.child_processes.append(process)
+            for line in process.stdout: # lsjson prints one entry per line
+                line = line.strip().rstrip(',')
+                if line.startswith('{'):
+                    entry = json.loads(line)
+                    files.append((entry['Path'], max(0, entry.get('Size', 0))))
+            process.wait()
+            self.job.child_processes.remove(process)
+            errors.seek(0)
+            error_lines = errors.read().decode('utf-8', 'replace').splitlines()
+        if process.returncode != 0:
+            for line in error_lines:
+                if line.strip():
+                    self.job.write_output(line.strip())
+            self.job.write_output(f"ERROR : Listing the source failed with exit code {process.returncode}.")
+            return None
+        return files
+
+    def _run_shard(self, index, files_from):
+        shard = self.job.shards[index - 1]
+        shard['status'] = self._run_worker(index, 'copy', files_from, shard)
+
+    def _run_worker(self, label, mode, files_from, shard):
+        """Runs one Rclone worker, rotating service accounts on quota errors. Returns its final status."""
+        while not self.job.stop_event.is_set():
+            try:
+                account = self.accounts.get_nowait()
+            except queue.Empty:
+                self.job.write_output(f"[shard {label}] ERROR : All service accounts are exhausted.", parse_stats=False)
+                return 'error'
+            if shard is not None:
+                shard['status'] = 'running'
+                shard['service_account'] = os.path.basename(account)
+            cmd = [RCLONE_BINARY, mode, f"--config={RCLONE_CONFIG_PATH}", self.source, self.destination,
+                   f"--drive-service-account-file={account}", "--drive-stop-on-upload-limit"] + self.common_flags
+            if files_from:
+                cmd.append(f"--files-from-raw={files_from}")
+            return_code, quota_hit = self._run_process(label, cmd)
+            if self.job.stop_event.is_set():
+                return 'stopped'
+            if quota_hit:
+                self.job.write_output(f"[shard {label}] Quota reached for {os.path.basename(account)}, rotating to the next service account.", parse_stats=False)
+                if shard is not None:
+                    shard['rotations'] += 1
+                continue # The exhausted account is not returned to the pool
+            self.accounts.put(account)
+            return 'completed' if return_code == 0 else 'error'
+        return 'stopped'
+
+    def _run_process(self, label, cmd):
+        """Runs a worker process, prefixing its output. Returns (exit code, quota error seen)."""
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=0, env=self.job.env)
+        self.job.child_processes.append(process)
+        parser = StatsParser()
+        quota_hit = False
+        for line, complete in PipeLineReader(process.stdout, job=self.job):
+            line = line.strip()
+            if not line or not complete: # Progress redraws of single workers are not shown
+                continue
+            self.job.write_output(f"[shard {label}] {line}", parse_stats=False)
+            if not quota_hit and is_quota_error(line):
+                quota_hit = True
+                process.terminate()
+            sample = parser.feed(line)
+            if sample:
+                with self._lock:
+                    self.samples[label] = sample
+                self._write_stats()
+            if self.job.stop_event.is_set() and process.poll() is None:
+                process.terminate()
+        return_code = process.wait()
+        self.job.child_processes.remove(process)
+        return return_code, quota_hit
+
+    def _write_stats(self, force=False):
+        """Writes aggregated stats of all workers as one --progress block."""
+        with self._lock:
+            if not force and time.monotonic() - self.last_stats_at < RC_STATS_INTERVAL:
+                return
+            self.last_stats_at = time.monotonic()
+            samples = list(self.samples.values())
+        transferred = sum(sample.get('bytes') or 0 for sample in samples)
+        total = sum(self.totals.values())
+        speed = sum(sample.get('speed') or 0 for sample in samples)
+        stats = {
+            'bytes': transferred, 'totalBytes': total, 'speed': speed,
+            'eta': (total - transferred) / speed if speed else None,
+            'errors': sum(sample.get('errors') or 0 for sample in samples),
+            'checks': sum(sample.get('checks') or 0 for sample in samples),
+            'totalChecks': sum(sample.get('total_checks') or 0 for sample in samples),
+            'transfers': sum(sample.get('transfers') or 0 for sample in samples),
+            'totalTransfers': sum(shard['files'] for shard in self.job.shards),
+            'elapsedTime': time.monotonic() - self.started,
+        }
+        for line in format_rc_stats(stats):
+            self.job.write_output(line)
+
+# --- Adaptive Auto-Tuning ---
+TUNABLE_MODES = {"copy", "sync", "move"}
+# Drive's rate-limit reasons and HTTP 429 as Rclone reports them; other 403s (permissions) and
+# file names containing 429 are not rate limits
+RATE_LIMIT_RE = re.compile(r'\b(?:userRateLimitExceeded|rateLimitExceeded)\b|googleapi: Error 429\b|HTTP error 429\b')
+TUNED_FLAGS = ('--transfers', '--checkers', '--buffer-size', '--drive-chunk-size')
+
+def remote_name(path):
+    """Returns the remote part of 'remote:path', or 'local' for local paths."""
+    path = (path or '').strip()
+    if ':' in path and not path.startswith('/'):
+        return path.split(':', 1)[0] or 'local'
+    return 'local'
+
+def remote_pair(data):
+    return f"{remote_name(data.get('source'))} -> {remote_name(data.get('destination'))}"
+
+def tuned_command(cmd, settings):
+    """Returns cmd with its transfers/checkers/buffer flags replaced by settings.
+
+    Both '--flag=value' and '--flag value' forms are removed.
+    """
+    kept = []
+    skip_value = False
+    for arg in cmd:
+        if skip_value:
+            skip_value = False
+        elif arg in TUNED_FLAGS:
+            skip_value = True
+        elif not arg.startswith(tuple(f"{flag}=" for flag in TUNED_FLAGS)):
+            kept.append(arg)
+    return kept + [
+        f"--transfers={settings['transfers']}",
+        f"--checkers={settings['checkers']}",
+        f"--buffer-size={settings['buffer_size']}",
+        f"--drive-chunk-size={settings['buffer_size']}", # Same pairing build_rclone_command uses
+    ]
+
+def buffer_bytes(value):
+    """Converts a --buffer-size value like '16M' to bytes (Rclone sizes are binary)."""
+    match = re.fullmatch(r'([\d.]+)\s*([kKMGTPE]?)i?B?', str(value).strip())
+    if not match:
+        return 0
+    return parse_size(match.group(1), match.group(2).upper() + 'i' if match.group(2) else '')
+
+class TuningStore:
+    """Best auto-tuned settings per remote pair, persisted as JSON next to rclone.conf."""
+
+    def __init__(self, path=AUTOTUNE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def all(self):
+        with self._lock:
+            return self._load()
+
+    def get(self, pair):
+        """Returns the recorded settings dict for a remote pair, or None."""
+        entry = self.all().get(pair)
+        return entry and entry.get('settings')
+
+    def record(self, pair, settings, throughput):
+        with self._lock:
+            entries = self._load()
+            entries[pair] = {"settings": settings, "throughput": round(throughput), "updated_at": time.time()}
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, indent=2)
+            os.replace(temp_path, self.path) # Readers never see a half-written file
+
+    def clear(self):
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+tuning_store = TuningStore()
+
+class AutoTuner:
+    """Runs a copy/sync/move in timed trials, hill-climbing towards the best throughput.
+
+    Rclone cannot resize a running transfer pool, so every trial is a fresh
+    Rclone process with different --transfers/--checkers/--buffer-size; files
+    finished by earlier trials are skipped by the next one. Transfers are raised
+    by half until throughput stops improving by at least 5% or Drive starts
+    rate limiting, then the buffer size is tried one step up. The best settings
+    run the rest of the job and are recorded for the remote pair, where the
+    next auto-tuned job between the same remotes starts from.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.pair = remote_pair(job.params)
+        recorded = tuning_store.get(self.pair)
+        transfers = int(job.params.get('transfers') or 4)
+        self.settings = recorded or {
+            "transfers": transfers,
+            "checkers": max(int(job.params.get('checkers') or 8), transfers),
+            "buffer_size": job.params.get('buffer_size') or '16M',
+        }
+        self.phase = 'transfers' # transfers -> buffer_size -> settled
+        self.best = None # (throughput, settings)
+        self.ceiling = AUTOTUNE_MAX_TRANSFERS + 1 # Lowest transfer count that was rate limited
+        self.trials = []
+        job.tuning = {"pair": self.pair, "from_history": recorded is not None, "settings": self.settings,
+                      "phase": self.phase, "trials": self.trials}
+
+    def run(self):
+        while not self.job.stop_event.is_set():
+            settled = self.phase == 'settled'
+            label = "final settings" if settled else f"trial {len(self.trials) + 1}"
+            self.job.write_output(f"Auto-tune {label}: transfers={self.settings['transfers']} "
+                                  f"checkers={self.settings['checkers']} buffer={self.settings['buffer_size']}")
+            return_code, throughput, rate_limited = self._run_trial(None if settled else AUTOTUNE_EPOCH_SECONDS)
+            if return_code is not None: # Rclone finished on its own
+                if return_code == 0 and not self.job.stop_event.is_set():
+                    if throughput is not None and not rate_limited and (self.best is None or throughput > self.best[0]):
+                        self.best = (throughput, dict(self.settings))
+                    if self.best:
+                        tuning_store.record(self.pair, self.best[1], self.best[0])
+                return return_code
+            self.trials.append({"settings": dict(self.settings), "throughput": throughput, "rate_limited": rate_limited})
+            self._next_settings(throughput, rate_limited)
+            self.job.tuning.update(settings=self.settings, phase=self.phase)
+            if self.phase == 'settled' and self.best:
+                tuning_store.record(self.pair, self.best[1], self.best[0])
+        return 1
+
+    def _run_trial(self, duration):
+        """Runs Rclone with the current settings for up to duration seconds.
+
+        Returns (exit code or None if the trial was cut short, bytes/s measured
+        after the warm-up or None, whether rate limiting was seen).
+        """
+        cmd = tuned_command(self.job.cmd, self.settings)
+        self.job.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                            bufsize=0, env=self.job.env)
+        started = time.monotonic()
+        first = last = None # (monotonic time, bytes) of the first and last sample after warm-up
+        rate_limit_lines = 0
+        cut_short = False
+        for line, complete in PipeLineReader(self.job.process.stdout, job=self.job):
+            line = line.strip()
+            if not complete:
+                self.job.output.set_partial(line)
+            elif line:
+                sample = self.job.write_output(line)
+                if RATE_LIMIT_RE.search(line):
+                    rate_limit_lines += 1
+                if sample and time.monotonic() - started >= AUTOTUNE_WARMUP_SECONDS:
+                    last = (time.monotonic(), sample.get('bytes') or 0)
+                    if first is None:
+                        first = last
+            if self.job.stop_event.is_set() or (duration and time.monotonic() - started >= duration):
+                cut_short = not self.job.stop_event.is_set()
+                self.job.process.terminate()
+                break
+        return_code = self.job.process.wait()
+        throughput = None
+        if first and last and last[0] > first[0]:
+            throughput = (last[1] - first[1]) / (last[0] - first[0])
+        return (None if cut_short else return_code), throughput, rate_limit_lines > 0
+
+    def _next_settings(self, throughput, rate_limited):
+        """Picks the settings of the next trial from the outcome of the last one."""
+        improved = throughput is not None and not rate_limited and (
+            self.best is None or throughput > self.best[0] * 1.05)
+        if improved:
+            self.best = (throughput, dict(self.settings))
+        if rate_limited:
+            self.ceiling = min(self.ceiling, self.settings['transfers'])
+        if len(self.trials) >= AUTOTUNE_MAX_TRIALS:
+            self.phase = 'settled'
+        elif throughput is None and not rate_limited:
+            self.phase = 'settled' # Nothing was transferred yet (long listing), restarting would only repeat it
+        elif rate_limited and self.best is None:
+            # Even the starting point is too aggressive for the provider
+            transfers = max(1, self.settings['transfers'] * 2 // 3)
+            if transfers == self.settings['transfers']:
+                self.phase = 'settled'
+            self.settings = dict(self.settings, transfers=transfers, checkers=max(transfers, self.settings['checkers'] * 2 // 3))
+            return
+        elif not improved:
+            self.phase = 'buffer_size' if self.phase == 'transfers' else 'settled'
+        candidate = self._step(self.best[1] if self.best else self.settings) if self.phase != 'settled' else None
+        if candidate is None:
+            self.phase = 'settled'
+            candidate = self.best[1] if self.best else self.settings
+        self.settings = dict(candidate)
 
+    def _step(self, base):
+        """Returns the next candidate around base for the current phase, or None if there is none."""
+        if self.phase == 'transfers':
+            transfers = min(AUTOTUNE_MAX_TRANSFERS, self.ceiling - 1, base['transfers'] + max(1, base['transfers'] // 2))
+            candidate = dict(base, transfers=transfers, checkers=max(base['checkers'], transfers * 2))
+        else:
+            sizes = AUTOTUNE_BUFFER_SIZES
+            index = sizes.index(base['buffer_size']) + 1 if base['buffer_size'] in sizes else len(sizes)
+            if index >= len(sizes):
+                return None
+            candidate = dict(base, buffer_size=sizes[index])
+        if candidate == base or candidate['transfers'] * buffer_bytes(candidate['buffer_size']) > AUTOTUNE_MEMORY_BUDGET:
+            return None
+        if any(trial['settings'] == candidate for trial in self.trials):
+            return None # Already measured
+        return candidate
+
+# --- Incremental Sync Planner ---
+INCREMENTAL_MODES = {"copy", "sync"}
+LISTING_UNSAFE_FLAGS = ('--progress', '-P', '--stats') # Would mix progress output into the lsjson output
+
+def listing_stamp(entry):
+    """64-bit fingerprint of what tells whether an lsjson entry changed besides its size (ModTime, hashes)."""
+    key = entry.get('ModTime', '')
+    if entry.get('Hashes'):
+        key += json.dumps(entry['Hashes'], sort_keys=True)
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def parse_lsjson(lines):
+    """Reads `rclone lsjson` output lines (bytes) into parallel columns (paths, sizes, stamps).
+
+    Paths are UTF-8 bytes. Lines other than entries (the enclosing brackets) are skipped.
+    """
+    paths, sizes, stamps = [], array('q'), array('Q')
+    for line in lines:
+        line = line.strip().rstrip(b',')
+        if line.startswith(b'{'):
+            entry = json.loads(line)
+            paths.append(entry['Path'].encode('utf-8'))
+            sizes.append(entry.get('Size', -1)) # -1: size unknown (Google Docs)
+            stamps.append(listing_stamp(entry))
+    return paths, sizes, stamps
+
+class ListingSnapshot:
+    """A remote listing stored column by column in one file and read through mmap.
+
+    Layout: a header (magic, entry count, total path bytes), the end offset of
+    every path (count x uint64), sizes (count x int64), change stamps (count x
+    uint64) and finally all paths as UTF-8, sorted bytewise. Opening a snapshot
+    reads nothing; iterating it pages the columns in sequentially.
+    """
+
+    MAGIC = b'RCSNAP01'
+    HEADER = struct.Struct('=8sQQ')
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, _ = self.HEADER.unpack_from(self._map)
+        if magic != self.MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a listing snapshot.")
+        column = self.count * 8
+        start = self.HEADER.size
+        self._view = memoryview(self._map)
+        self._ends = self._view[start:start + column].cast('Q')
+        self._sizes = self._view[start + column:start + 2 * column].cast('q')
+        self._stamps = self._view[start + 2 * column:start + 3 * column].cast('Q')
+        self._paths_start = start + 3 * column
+
+    @classmethod
+    def write(cls, path, paths, sizes, stamps):
+        """Sorts the columns by path and writes them as a snapshot, replacing path atomically."""
+        order = sorted(range(len(paths)), key=paths.__getitem__)
+        ends = array('Q')
+        total = 0
+        for index in order:
+            total += len(paths[index])
+            ends.append(total)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, len(order), total))
+            f.write(ends)
+            f.write(array('q', (sizes[index] for index in order)))
+            f.write(array('Q', (stamps[index] for index in order)))
+            f.writelines(paths[index] for index in order)
+        os.replace(temp_path, path)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        """Yields (path bytes, size, stamp) in path order."""
+        data, base, start = self._map, self._paths_start, 0
+        for end, size, stamp in zip(self._ends, self._sizes, self._stamps):
+            yield data[base + start:base + end], size, stamp
+            start = end
+
+    def close(self):
+        if getattr(self, '_view', None) is not None:
+            for view in (self._ends, self._sizes, self._stamps, self._view):
+                view.release() # The map cannot be closed while views of it exist
+            self._view = None
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def diff_listings(old, new):
+    """Merges two path-sorted listings, yielding (path, 'new' | 'modified' | 'deleted').
+
+    Both inputs are iterables of (path, size, stamp); neither is held in memory.
+    """
+    old_entries, new_entries = iter(old), iter(new)
+    old_entry, new_entry = next(old_entries, None), next(new_entries, None)
+    while old_entry is not None or new_entry is not None:
+        if old_entry is None or (new_entry is not None and new_entry[0] < old_entry[0]):
+            yield new_entry[0], 'new'
+            new_entry = next(new_entries, None)
+        elif new_entry is None or old_entry[0] < new_entry[0]:
+            yield old_entry[0], 'deleted'
+            old_entry = next(old_entries, None)
+        else:
+            if old_entry[1] != new_entry[1] or old_entry[2] != new_entry[2]:
+                yield new_entry[0], 'modified'
+            old_entry, new_entry = next(old_entries, None), next(new_entries, None)
+
+class IncrementalSync:
+    """Runs a copy/sync on only the files that changed since the last successful run.
+
+    The source is listed with lsjson and stored as a ListingSnapshot. Merging
+    it with the snapshot of the last successful run between the same source and
+    destination gives the new, modified and (for sync) deleted paths, and only
+    those are handed to Rclone with --files-from-raw, so the destination is not
+    listed in full. Without an earlier snapshot the job runs as a full
+    transfer. The new snapshot replaces the old one only when the transfer
+    succeeded, so failed files are retried next time. Changes made to the
+    destination outside this app are not noticed.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.mode = job.params['mode']
+        self.source = job.params['source'].strip()
+        key = f"{self.mode}\0{self.source}\0{job.params['destination'].strip()}"
+        self.snapshot_path = os.path.join(SNAPSHOT_DIR, hashlib.sha1(key.encode('utf-8')).hexdigest()[:20] + '.snap')
+        # The job's flags (filters, service accounts...) apply to the listing as well
+        self.flags = [arg for arg in job.cmd[5:] if not arg.startswith(LISTING_UNSAFE_FLAGS)]
+
+    def run(self):
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        new_snapshot = f"{self.snapshot_path}.{self.job.id}"
+        try:
+            if not self._list_source(new_snapshot):
+                return 1
+            if os.path.exists(self.snapshot_path):
+                return_code = self._run_changes(new_snapshot)
+            else:
+                self.job.write_output("Incremental: no snapshot of an earlier run, transferring everything.")
+                return_code = self._run_rclone(self.job.cmd)
+            if return_code == 0 and not self.job.stop_event.is_set() and not self.job.params.get('dry_run'):
+                os.replace(new_snapshot, self.snapshot_path)
+            return return_code
+        finally:
+            if os.path.exists(new_snapshot):
+                os.remove(new_snapshot)
+
+    def _list_source(self, snapshot_path):
+        """Lists the source into a snapshot file. Returns False on failure."""
+        cmd = [RCLONE_BINARY, "lsjson", f"--config={RCLONE_CONFIG_PATH}", "-R", "--files-only", "--no-mimetype",
+               self.source] + self.flags
+        self.job.write_output(f"Incremental: listing {self.source}...")
+        started = time.monotonic()
+        with tempfile.TemporaryFile() as errors: # Not a pipe, lsjson must never block on its log output
+            self.job.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errors, env=self.job.env)
+            columns = parse_lsjson(self.job.process.stdout)
+            return_code = self.job.process.wait()
+            errors.seek(0)
+            for line in errors.read().decode('utf-8', 'replace').splitlines():
+                if line.strip():
+                    self.job.write_output(line.strip())
+        if self.job.stop_event.is_set():
+            return False
+        if return_code != 0:
+            self.job.write_output(f"ERROR : Listing the source failed with exit code {return_code}.")
+            return False
+        ListingSnapshot.write(snapshot_path, *columns)
+        self.job.write_output(f"Incremental: listed {len(columns[0])} files in {time.monotonic() - started:.1f}s.")
+        return True
+
+    def _run_changes(self, snapshot_path):
+        """Transfers the paths that differ between the last snapshot and the new one."""
+        files_from = os.path.join(JOBS_LOG_DIR, f"{self.job.id}.incremental.files")
+        counts = {'new': 0, 'modified': 0, 'deleted': 0}
+        try:
+            with ListingSnapshot(self.snapshot_path) as old, ListingSnapshot(snapshot_path) as new, \
+                    open(files_from, 'wb') as f:
+                for path, change in diff_listings(old, new):
+                    counts[change] += 1
+                    if change != 'deleted' or self.mode == 'sync': # sync deletes listed paths missing at the source
+                        f.write(path + b'\n')
+            self.job.write_output(f"Incremental: {counts['new']} new, {counts['modified']} modified and "
+                                  f"{counts['deleted']} deleted files since the last run.")
+            if not counts['new'] and not counts['modified'] and not (counts['deleted'] and self.mode == 'sync'):
+                self.job.write_output("Incremental: nothing to transfer.")
+                return 0
+            return self._run_rclone(self.job.cmd + [f"--files-from-raw={files_from}"])
+        finally:
+            os.remove(files_from)
+
+    def _run_rclone(self, cmd):
+        """Runs the transfer as one Rclone process. Returns its exit code."""
+        self.job.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                            bufsize=0, env=self.job.env)
+        if self.job.stop_event.is_set():
+            self.job.process.terminate()
+        for line, complete in PipeLineReader(self.job.process.stdout, job=self.job):
+            line = line.strip()
+            if not complete:
+                self.job.output.set_partial(line)
+            elif line:
+                self.job.write_output(line)
+            if self.job.stop_event.is_set():
+                self.job.process.terminate()
+                break
+        return self.job.process.wait()
+
+# --- Persistent Job History ---
+HISTORY_COLUMNS = (
+    'id', 'kind', 'mode', 'command', 'params', 'source', 'destination', 'source_remote', 'destination_remote',
+    'backend', 'status', 'message', 'exit_code', 'created_at', 'started_at', 'finished_at', 'duration',
+    'bytes', 'files', 'errors', 'throughput', 'line_count', 'log_file', 'rerun_of',
+)
+HISTORY_SORT_COLUMNS = {"created": "created_at", "duration": "duration", "bytes": "bytes", "throughput": "throughput"}
+
+class JobHistory:
+    """SQLite record of every Rclone job and terminal command, kept across restarts.
+
+    A row is inserted when a job is submitted and completed with its outcome
+    and final stats when it finishes. Each thread uses its own connection; the
+    database runs in WAL mode so history queries never wait for a finishing
+    job's write. Rows a previous server process left queued or running are
+    marked 'interrupted' when the database is first opened.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,          -- 'rclone' or 'terminal'
+            mode TEXT,
+            command TEXT NOT NULL,
+            params TEXT,                 -- JSON request payload, used to re-run the job
+            source TEXT,
+            destination TEXT,
+            source_remote TEXT,
+            destination_remote TEXT,
+            backend TEXT,
+            status TEXT NOT NULL,
+            message TEXT,
+            exit_code INTEGER,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            duration REAL,               -- Seconds from start to finish
+            bytes INTEGER,               -- Bytes transferred, from the last --stats block
+            files INTEGER,
+            errors INTEGER,
+            throughput REAL,             -- Average bytes per second over the whole run
+            line_count INTEGER,
+            log_file TEXT,
+            rerun_of TEXT                -- History entry this job was re-run from
+        );
+        CREATE INDEX IF NOT EXISTS jobs_kind_created ON jobs (kind, created_at);
+        CREATE INDEX IF NOT EXISTS jobs_destination ON jobs (destination_remote, mode, created_at);
+        CREATE INDEX IF NOT EXISTS jobs_source ON jobs (source_remote, mode, created_at);
+        CREATE INDEX IF NOT EXISTS jobs_mode_throughput ON jobs (mode, throughput);
+    """
+
+    def __init__(self, path=JOB_HISTORY_DB, retention_days=JOB_HISTORY_DAYS):
+        self.path = path
+        self.retention_days = retention_days
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL") # Durable enough for history, no fsync per job
+            self._local.conn = conn
+        with self._init_lock:
+            if not self._initialized:
+                with conn:
+                    conn.executescript(self.SCHEMA)
+                    conn.execute("UPDATE jobs SET status = 'interrupted', message = 'Server restarted while the job was running.' "
+                                 "WHERE status IN ('queued', 'running')")
+                    conn.execute("DELETE FROM jobs WHERE created_at < ?", (time.time() - self.retention_days * 86400,))
+                self._initialized = True
+        return conn
+
+    def _write(self, sql, args):
+        """Runs one write statement. Errors are logged, history must never fail a job."""
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute(sql, args)
+        except sqlite3.Error as e:
+            print(f"Error writing job history: {e}")
+
+    def add(self, **fields):
+        columns = [column for column in HISTORY_COLUMNS if column in fields]
+        self._write(f"INSERT OR REPLACE INTO jobs ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    [fields[column] for column in columns])
+
+    def update(self, entry_id, **fields):
+        columns = [column for column in HISTORY_COLUMNS if column in fields and column != 'id']
+        self._write(f"UPDATE jobs SET {', '.join(f'{column} = ?' for column in columns)} WHERE id = ?",
+                    [fields[column] for column in columns] + [entry_id])
+
+    def get(self, entry_id):
+        """Returns one history entry as a dict, or None."""
+        row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (entry_id,)).fetchone()
+        return history_entry(row) if row else None
+
+    def query(self, filters, since=None, sort='created', descending=True, limit=HISTORY_PAGE_SIZE, offset=0):
+        """Returns (total, entries) for one page of history, newest first by default.
+
+        filters maps column names (kind, mode, status, source_remote,
+        destination_remote) to required values; the 'remote' key matches either
+        end of a transfer. Entries without a value for the sort column come last.
+        """
+        clauses, args = [], []
+        for column, value in filters.items():
+            if column == 'remote':
+                clauses.append("(source_remote = ? OR destination_remote = ?)")
+                args += [value, value]
+            else:
+                clauses.append(f"{column} = ?")
+                args.append(value)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            args.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        order = f"{HISTORY_SORT_COLUMNS[sort]} {'DESC' if descending else 'ASC'} NULLS LAST, created_at DESC"
+        conn = self._connection()
+        total = conn.execute(f"SELECT COUNT(*) FROM jobs {where}", args).fetchone()[0]
+        rows = conn.execute(f"SELECT * FROM jobs {where} ORDER BY {order} LIMIT ? OFFSET ?", args + [limit, offset])
+        return total, [history_entry(row) for row in rows]
+
+    def clear(self):
+        """Deletes all finished entries; running jobs keep their rows."""
+        self._write("DELETE FROM jobs WHERE status NOT IN ('queued', 'running')", ())
+
+def history_entry(row):
+    entry = dict(row)
+    entry['params'] = json.loads(entry['params']) if entry['params'] else None
+    return entry
+
+def history_row(job):
+    """Columns recorded for an Rclone job when it is submitted."""
+    return {
+        "id": job.id,
+        "kind": 'rclone',
+        "mode": job.mode,
+        "command": " ".join(job.cmd),
+        "params": json.dumps(job.params),
+        "source": job.params.get('source', ''),
+        "destination": job.params.get('destination', ''),
+        "source_remote": remote_name(job.params.get('source')) if job.params.get('source') else None,
+        "destination_remote": remote_name(job.params.get('destination')) if job.params.get('destination') else None,
+        "backend": job.backend,
+        "status": job.status,
+        "message": job.message,
+        "created_at": job.created_at,
+        "log_file": job.log_file,
+    }
+
+def history_result(job):
+    """Columns recorded for an Rclone job when it finishes, stats taken from its last --stats block."""
+    stats = job.metrics.latest() or {}
+    duration = job.finished_at - job.started_at if job.started_at else None
+    transferred = stats.get('bytes')
+    return {
+        "status": job.status,
+        "message": job.message,
+        "exit_code": job.return_code,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "duration": duration,
+        "bytes": transferred,
+        "files": stats.get('transfers'),
+        "errors": stats.get('errors'),
+        "throughput": transferred / duration if transferred is not None and duration else None,
+        "line_count": job.line_count,
+    }
+
+job_history = JobHistory()
+
+# --- Rclone Job Manager ---
+class OutputRing:
+    """Fixed-capacity ring buffer of output lines with increasing sequence numbers.
+
+    The first line appended gets sequence number 1. Readers keep their own cursor
+    (the last sequence they saw) and only copy the lines after it, so any number
+    of subscribers share one buffer. Lines older than `capacity` are dropped.
+    Besides complete lines the ring holds one partial line, the unfinished line
+    the process is currently writing (e.g. a progress bar); appending a line
+    clears it.
+    """
+
+    def __init__(self, capacity=JOB_OUTPUT_RING_LINES):
+        self.capacity = capacity
+        self._lines = [None] * capacity
+        self._ends = [0] * capacity # Cumulative byte count up to and including each line
+        self._total_bytes = 0
+        self._next_seq = 1
+        self._closed = False
+        self._partial = ''
+        self._partial_version = 0 # Bumped whenever the partial line changes
+        self._cond = threading.Condition()
+
+    @property
+    def first_seq(self):
+        """Oldest sequence number still held in memory."""
+        return max(1, self._next_seq - self.capacity)
+
+    @property
+    def last_seq(self):
+        """Sequence number of the newest line (0 if nothing was appended yet)."""
+        return self._next_seq - 1
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def append(self, line):
+        with self._cond:
+            index = self._next_seq % self.capacity
+            self._total_bytes += len(line) + 1
+            self._lines[index] = line
+            self._ends[index] = self._total_bytes
+            self._next_seq += 1
+            if self._partial:
+                self._partial = ''
+                self._partial_version += 1
+            self._cond.notify_all()
+
+    def set_partial(self, text):
+        """Replaces the partial line and wakes up waiting readers."""
+        with self._cond:
+            if text != self._partial:
+                self._partial = text
+                self._partial_version += 1
+                self._cond.notify_all()
+
+    def partial(self):
+        """Returns (version, text) of the current partial line."""
+        with self._cond:
+            return self._partial_version, self._partial
+
+    def close(self):
+        """Marks the ring as complete and wakes up all waiting readers."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _bytes_after(self, seq):
+        if seq < self.first_seq:
+            return self._total_bytes # Everything held is newer than seq
+        return self._total_bytes - self._ends[seq % self.capacity]
+
+    def wait_for_output(self, seq, min_bytes=1, timeout=None, partial_version=None):
+        """Waits until at least min_bytes were appended after seq or the ring is closed.
+
+        With partial_version, a change of the partial line away from that
+        version also ends the wait. Returns True if the condition was met before
+        the timeout.
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self._closed or (seq < self.last_seq and self._bytes_after(seq) >= min_bytes)
+                or (partial_version is not None and partial_version != self._partial_version),
+                timeout
+            )
+
+    def read_after(self, seq, max_bytes=None):
+        """Returns (first_seq, lines, at_end) for lines with a sequence above seq.
+
+        Never blocks. first_seq is the sequence of lines[0]; it is greater than
+        seq + 1 when the reader fell behind and lines were dropped. At least one
+        line is returned when available, then lines stop once max_bytes is
+        reached. at_end is True once the ring is closed and the reader has
+        consumed everything.
+        """
+        with self._cond:
+            start = max(seq + 1, self.first_seq)
+            end = self._next_seq
+            if max_bytes is not None and start < end:
+                first_index = start % self.capacity
+                base = self._ends[first_index] - len(self._lines[first_index]) - 1 # Bytes before line `start`
+                stop = start + 1
+                while stop < end and self._ends[stop % self.capacity] - base <= max_bytes:
+                    stop += 1
+                end = stop
+            lines = [self._lines[i % self.capacity] for i in range(start, end)]
+            return start, lines, self._closed and end >= self._next_seq
+
+def iter_output_batches(ring, seq=0, interval=OUTPUT_FRAME_INTERVAL, max_bytes=OUTPUT_FRAME_BYTES):
+    """Yields (first_seq, lines, at_end, partial) batches of ring output after seq.
+
+    Lines are coalesced for up to `interval` seconds after the first one arrives
+    or until `max_bytes` are pending, so subscribers send one frame per batch
+    rather than one per line. partial is the ring's partial line when it changed
+    since the previous batch ('' once it was cleared), otherwise None. An empty
+    batch is yielded after SSE_KEEPALIVE_SECONDS without output so callers can
+    send keepalives.
+    """
+    partial_version = 0
+    while True:
+        if ring.wait_for_output(seq, timeout=SSE_KEEPALIVE_SECONDS, partial_version=partial_version) and interval:
+            ring.wait_for_output(seq, min_bytes=max_bytes, timeout=interval) # Let the frame fill up
+        first_seq, lines, at_end = ring.read_after(seq, max_bytes=max_bytes)
+        if lines:
+            seq = first_seq + len(lines) - 1
+        version, partial = ring.partial()
+        if version == partial_version or at_end:
+            partial = None
+        partial_version = version
+        yield first_seq, lines, at_end, partial
+        if at_end:
+            return
+
+class Job:
+    """A single Rclone command submitted to the JobManager."""
+
+    def __init__(self, cmd, env, params, rc_call=None, cache_key=None, cached_lines=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.cmd = cmd
+        self.env = env
+        self.params = params # Original request payload, kept for inspection
+        self.rc_call = rc_call # (method, params) when the job runs on the rcd backend
+        self.cached_lines = cached_lines # Listing output replayed from the cache instead of running Rclone
+        self.cache_key = cache_key # Set for cacheable listings, their output is stored on success
+        self.captured_lines = [] if cache_key and cached_lines is None else None
+        self.cache_generation = listing_cache.generation # Output is not cached if an invalidation came later
+        if cached_lines is not None:
+            self.backend = 'cache'
+        else:
+            self.backend = 'rcd' if rc_call else 'subprocess'
+        self.rc_job_id = None
+        self.mode = params.get('mode')
+        self.status = 'queued' # queued -> running -> completed | error | stopped
+        self.message = "Waiting for a free job slot."
+        self.return_code = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.line_count = 0
+        self.pipe_bytes = 0 # Read from the Rclone process output
+        self.log_bytes = 0 # Written to the job log
+        self.log_file = os.path.join(JOBS_LOG_DIR, f"{self.id}.log")
+        self.process = None
+        self.log_sink = None # Open while the job is running
+        self.child_processes = [] # Extra Rclone processes of a sharded job
+        self.shards = [] # Per-shard progress of a sharded job
+        self.tuning = None # Trials and chosen settings of an auto-tuned job
+        self._write_lock = TimedLock('job_output')
+        self.stop_event = threading.Event() # Set when the user asks the job to stop
+        self.done_event = threading.Event() # Set once the job reached a final status
+        self.output = OutputRing() # Recent output lines for live subscribers
+        self.stats_parser = StatsParser()
+        self.metrics = MetricsSeries() # Parsed --stats samples
+        self.log_index = LogIndex() # Line offsets and level counts of log_file
+
+    @property
+    def is_finished(self):
+        return self.done_event.is_set()
+
+    def write_output(self, line, parse_stats=True):
+        """Records one output line in the log, the live output ring and the stats series.
+
+        Safe to call from several threads (sharded jobs). parse_stats=False keeps
+        lines that only describe part of the job out of the job's stats. Returns
+        the stats sample the line completed, if any.
+        """
+        with self._write_lock:
+            size = self.log_sink.write_line(line)
+            self.log_index.add(line, size)
+            self.output.append(line)
+            self.line_count += 1
+            self.log_bytes += size
+            if self.captured_lines is not None:
+                self.captured_lines.append(line)
+                if len(self.captured_lines) > LISTING_CACHE_MAX_LINES:
+                    self.captured_lines = None # Too large to cache
+            sample = self.stats_parser.feed(line) if parse_stats else None
+            if sample:
+                self.metrics.append(sample)
+            return sample
+
+    def count_pipe_bytes(self, size):
+        """Adds bytes read from an Rclone process; sharded jobs read several pipes at once."""
+        with self._write_lock:
+            self.pipe_bytes += size
+
+    def log_index_snapshot(self):
+        """Returns a consistent copy of the log index, safe to search while the job writes."""
+        with self._write_lock:
+            return self.log_index.snapshot()
+
+    def to_dict(self):
+        """Returns a JSON-serializable summary of the job."""
+        return {
+            "job_id": self.id,
+            "mode": self.mode,
+            "backend": self.backend,
+            "cached": self.cached_lines is not None,
+            "command": " ".join(self.cmd),
+            "source": self.params.get('source', ''),
+            "destination": self.params.get('destination', ''),
+            "status": self.status,
+            "message": self.message,
+            "return_code": self.return_code,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "line_count": self.line_count,
+            "shards": self.shards,
+            "tuning": self.tuning,
+        }
+
+class JobManager:
+    """Runs Rclone jobs on a bounded background executor, independent of HTTP requests."""
+
+    def __init__(self, max_workers=MAX_CONCURRENT_JOBS, max_finished=MAX_FINISHED_JOBS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='rclone-job')
+        self._jobs = OrderedDict() # job_id -> Job, in submission order
+        self._lock = TimedLock('job_manager') # Protects _jobs
+        self.max_finished = max_finished
+
+    def submit(self, cmd, env, params, rc_call=None, cache_key=None, cached_lines=None):
+        """Queues a new job and returns it immediately.
+
+        Jobs replaying cached output run inline instead of waiting for a slot.
+        """
+        job = Job(cmd, env, params, rc_call, cache_key, cached_lines)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune_locked()
+        job_history.add(**history_row(job))
+        if cached_lines is not None:
+            self._run(job)
+        else:
+            self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def running(self):
+        """Returns jobs that are queued or running."""
+        return [job for job in self.list() if not job.is_finished]
+
+    def stop(self, job_id):
+        """Stops a queued or running job. Returns False if there was nothing to stop."""
+        job = self.get(job_id)
+        if job is None or job.is_finished:
+            return False
+        job.stop_event.set() # A queued job will exit as soon as it is picked up
+        if job.rc_job_id is not None:
+            try:
+                rcd_manager.client().call('job/stop', {'jobid': job.rc_job_id})
+            except RcloneRcError as e:
+                print(f"Error stopping rc job {job.rc_job_id}: {e}")
+        for process in [job.process] + list(job.child_processes):
+            terminate_process(process)
+        return True
+
+    def _prune_locked(self):
+        """Drops the oldest finished jobs beyond max_finished. Their logs are left to enforce_log_retention."""
+        finished = [job for job in self._jobs.values() if job.is_finished]
+        for job in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job.id]
+
+    def _finish(self, job, status, message, return_code=None):
+        job.status = status
+        job.message = message
+        job.return_code = return_code
+        job.finished_at = time.time()
+        timings.observe('job.pipe_bytes', job.pipe_bytes)
+        timings.observe('job.log_bytes', job.log_bytes)
+        job_history.update(job.id, **history_result(job))
+        if job.cache_key and status == 'completed' and job.captured_lines is not None:
+            listing_cache.put(job.cache_key, job.captured_lines, job.cache_generation)
+        if job.mode in MUTATING_MODES:
+            listing_cache.invalidate(mutated_paths(job.params)) # Drop listings taken while the job ran
+        job.done_event.set()
+        job.output.close()
+        log_compressor.submit(enforce_log_retention) # The finished log may now be removed to make room
+
+    def _run(self, job):
+        """Executes the job through its backend, writing its output to the job log."""
+        if job.stop_event.is_set():
+            self._finish(job, 'stopped', "Rclone job stopped by user before it started.")
+            return
+
+        job.status = 'running'
+        job.message = "Rclone command is running."
+        job.started_at = time.time()
+        job_history.update(job.id, status='running', message=job.message, started_at=job.started_at)
+        print(f"Executing Rclone command (job {job.id}, {job.backend}): {' '.join(job.cmd)}")
+        try:
+            with LogSink(job.log_file, segment_bytes=LOG_SEGMENT_BYTES) as job.log_sink:
+                if job.cached_lines is not None:
+                    for line in job.cached_lines:
+                        job.write_output(line)
+                    return_code = 0
+                elif job.rc_call:
+                    return_code = self._run_rc(job)
+                elif job.params.get('shards'):
+                    return_code = ShardedTransfer(job).run()
+                elif job.params.get('auto_tune'):
+                    return_code = AutoTuner(job).run()
+                elif job.params.get('incremental'):
+                    return_code = IncrementalSync(job).run()
+                else:
+                    return_code = self._run_subprocess(job)
+
+            if job.stop_event.is_set():
+                self._finish(job, 'stopped', "Rclone process stopped by user.", return_code)
+            elif return_code == 0:
+                self._finish(job, 'completed', "Rclone command completed successfully.", return_code)
+            else:
+                self._finish(job, 'error', f"Rclone command failed with exit code {return_code}.", return_code)
+        except FileNotFoundError:
+            self._finish(job, 'error', "Rclone executable not found. Ensure it's installed and in PATH.")
+        except RcloneRcError as e:
+            self._finish(job, 'error', f"Rclone remote control error: {e}")
+        except Exception as e:
+            self._finish(job, 'error', f"An unexpected error occurred: {e}")
+        finally:
+            if job.process and job.process.poll() is None:
+                # If process is still running after an error, ensure it's terminated
+                job.process.terminate()
+
+    def _run_subprocess(self, job):
+        """Runs the job as its own Rclone process. Returns the exit code."""
+        job.process = subprocess.Popen(
+            job.cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT, # Merge stdout and stderr
+            bufsize=0, # Read in chunks by PipeLineReader
+            env=job.env
+        )
+        if job.stop_event.is_set():
+            job.process.terminate() # Stop arrived while the process was starting
+        for line, complete in PipeLineReader(job.process.stdout, job=job):
+            line_stripped = line.strip()
+            if not complete:
+                job.output.set_partial(line_stripped) # Shown live, only finished lines reach the log
+            elif line_stripped:
+                job.write_output(line_stripped)
+            if job.stop_event.is_set():
+                break
+        if job.stop_event.is_set() and job.process.poll() is None:
+            job.process.terminate()
+        return job.process.wait()
+
+    def _run_rc(self, job):
+        """Runs the job on the shared rclone rcd instance. Returns 0 on success, 1 on failure."""
+        client = rcd_manager.client()
+        method, params = job.rc_call
+        if method not in RC_ASYNC_METHODS:
+            result = client.call(method, params)
+            for line in format_rc_result(job.mode, result):
+                job.write_output(line)
+            return 0
+
+        job.rc_job_id = client.call(method, dict(params, _async=True))['jobid']
+        if job.stop_event.is_set():
+            client.call('job/stop', {'jobid': job.rc_job_id}) # Stop arrived while the job was starting
+        last_stats_at = 0
+        while True:
+            status = client.call('job/status', {'jobid': job.rc_job_id})
+            if status.get('finished') or time.monotonic() - last_stats_at >= RC_STATS_INTERVAL:
+                stats = client.call('core/stats', {'group': f"job/{job.rc_job_id}"})
+                for line in format_rc_stats(stats):
+                    job.write_output(line)
+                last_stats_at = time.monotonic()
+            if status.get('finished'):
+                break
+            job.stop_event.wait(RC_POLL_INTERVAL)
+        if status.get('success'):
+            return 0
+        job.write_output(f"ERROR : {status.get('error') or 'Remote control job failed.'}")
+        return 1
+
+job_manager = JobManager()
+
+# --- Global Variables for Terminal Processes ---
 # Terminal process management
 terminal_process = None
 # terminal_output_buffer is no longer used for live polling from client,
 # output is written directly to TERMINAL_LOG_FILE and read from there.
-terminal_lock = threading.Lock() # Protects terminal_process
-stop_terminal_flag = threading.Event() # Flag to signal terminal process to stop
+terminal_lock = TimedLock('terminal') # Protects terminal_process, terminal_stop_event, terminal_log_sink and the log generation
+terminal_log_generation = 0 # Bumped for every new command so clients can detect a cleared log
+terminal_partial_line = (0, '') # (generation, unfinished line not yet in the log)
+terminal_stop_event = threading.Event() # Set to stop the current command; every command gets its own
+terminal_log_sink = None # LogSink of the current command; a superseded one is discarded
 
 # --- Authentication Decorator ---
 def login_required(f):
@@ -98,6 +2727,15 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def metrics_auth_required(f):
+    """Like login_required, but also accepts 'Authorization: Bearer <METRICS_TOKEN>' for scrapers."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if METRICS_TOKEN and request.headers.get('Authorization') == f"Bearer {METRICS_TOKEN}":
+            return f(*args, **kwargs)
+        return login_required(f)(*args, **kwargs)
+    return decorated_function
+
 # --- Routes ---
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -138,6 +2776,7 @@ def upload_rclone_conf():
     if file:
         try:
             file.save(RCLONE_CONFIG_PATH)
+            listing_cache.clear() # Remotes may point somewhere else now
             return jsonify({"status": "success", "message": f"rclone.conf uploaded successfully to {RCLONE_CONFIG_PATH}"})
         except Exception as e:
             return jsonify({"status": "error", "message": f"Failed to save rclone.conf: {e}"}), 500
@@ -175,16 +2814,30 @@ def upload_sa_zip():
             return jsonify({"status": "error", "message": f"Failed to process service account ZIP: {e}"}), 500
     return jsonify({"status": "error", "message": "Invalid file type. Please upload a .zip file."}), 400
 
-@app.route('/execute-rclone', methods=['POST'])
-@login_required
-def execute_rclone():
-    """Executes an Rclone command as a subprocess and streams output."""
-    global rclone_process
-    with rclone_lock:
-        if rclone_process and rclone_process.poll() is None:
-            return jsonify({"status": "error", "message": "Rclone process already running. Please stop it first."}), 409
+def rclone_environment():
+    """Returns the environment Rclone runs with (Drive pacing and listing defaults)."""
+    rclone_env = os.environ.copy()
+    # Environment variables for rclone (as specified by user)
+    # RCLONE_CONFIG is handled by --config flag, so these are mostly redundant for config
+    # rclone_env['RCLONE_CONFIG'] = RCLONE_CONFIG_PATH
+    rclone_env['RCLONE_FAST_LIST'] = 'true'
+    rclone_env['RCLONE_DRIVE_TPSLIMIT'] = '3'
+    rclone_env['RCLONE_DRIVE_ACKNOWLEDGE_ABUSE'] = 'true'
+    # RCLONE_LOG_FILE is handled by --log-file, so this is mostly redundant
+    # rclone_env['RCLONE_LOG_FILE'] = job.log_file
+    rclone_env['RCLONE_DRIVE_PACER_MIN_SLEEP'] = '50ms'
+    rclone_env['RCLONE_DRIVE_PACER_BURST'] = '2'
+    rclone_env['RCLONE_SERVER_SIDE_ACROSS_CONFIGS'] = 'true'
+    return rclone_env
 
-    data = request.get_json()
+class RcloneCommandError(ValueError):
+    """Raised when a request does not describe a valid Rclone command."""
+
+def build_rclone_command(data):
+    """Builds the Rclone argument list and environment from a request payload.
+
+    Raises RcloneCommandError if required fields are missing or invalid.
+    """
     mode = data.get('mode')
     source = data.get('source', '').strip()
     destination = data.get('destination', '').strip()
@@ -199,7 +2852,7 @@ def execute_rclone():
     dry_run = data.get('dry_run')
     serve_protocol = data.get('serve_protocol')
 
-    cmd = ["rclone", mode]
+    cmd = [RCLONE_BINARY, mode]
 
     # Always include --config
     cmd.append(f"--config={RCLONE_CONFIG_PATH}")
@@ -214,25 +2867,27 @@ def execute_rclone():
     # Handle command arguments based on mode
     if mode in two_remote_modes:
         if not source or not destination:
-            return jsonify({"status": "error", "message": "Source and Destination are required for this mode."}), 400
+            raise RcloneCommandError("Source and Destination are required for this mode.")
         cmd.extend([source, destination])
     elif mode == copyurl_mode:
         if not source or not destination: # 'source' here is the URL
-            return jsonify({"status": "error", "message": "URL and Destination are required for copyurl mode."}), 400
+            raise RcloneCommandError("URL and Destination are required for copyurl mode.")
         cmd.extend([source, destination])
     elif mode in one_remote_modes:
         if not source: # 'source' here is the path/remote
-            return jsonify({"status": "error", "message": "Source (path/remote) is required for this mode."}), 400
+            raise RcloneCommandError("Source (path/remote) is required for this mode.")
         cmd.append(source)
     elif mode == serve_mode:
         if not source or not serve_protocol: # 'source' here is the path to serve
-            return jsonify({"status": "error", "message": "Serve protocol and Path to serve are required for serve mode."}), 400
+            raise RcloneCommandError("Serve protocol and Path to serve are required for serve mode.")
         cmd.extend([serve_protocol, source])
     elif mode in no_args_modes:
         # No additional arguments needed for these modes
         pass
     else:
-        return jsonify({"status": "error", "message": f"Unknown or unsupported Rclone mode: {mode}"}), 400
+        raise RcloneCommandError(f"Unknown or unsupported Rclone mode: {mode}")
+
+    rclone_env = os.environ.copy()
 
     # Add optional flags, apply only if mode isn't 'version' or 'listremotes'
     if mode not in ["version", "listremotes"]:
@@ -257,7 +2912,7 @@ def execute_rclone():
             if sa_files_exist:
                 cmd.append(f"--drive-service-account-directory={SERVICE_ACCOUNT_DIR}")
             else:
-                return jsonify({"status": "error", "message": "Service account directory does not exist or is empty. Please upload service accounts."}), 400
+                raise RcloneCommandError("Service account directory does not exist or is empty. Please upload service accounts.")
 
         # Drive trash
         if use_drive_trash:
@@ -275,126 +2930,720 @@ def execute_rclone():
             flags_split = re.findall(r'(?:[^\s"]|"[^"]*")+', additional_flags_str)
             cmd.extend([flag.strip('"') for flag in flags_split]) # Remove quotes if present
 
-        # Environment variables for rclone (as specified by user)
-        rclone_env = os.environ.copy()
-        # RCLONE_CONFIG is handled by --config flag, so these are mostly redundant for config
-        # rclone_env['RCLONE_CONFIG'] = RCLONE_CONFIG_PATH
-        rclone_env['RCLONE_FAST_LIST'] = 'true'
-        rclone_env['RCLONE_DRIVE_TPSLIMIT'] = '3'
-        rclone_env['RCLONE_DRIVE_ACKNOWLEDGE_ABUSE'] = 'true'
-        # RCLONE_LOG_FILE is handled by --log-file, so this is mostly redundant
-        # rclone_env['RCLONE_LOG_FILE'] = LOG_FILE
-        rclone_env['RCLONE_DRIVE_PACER_MIN_SLEEP'] = '50ms'
-        rclone_env['RCLONE_DRIVE_PACER_BURST'] = '2'
-        rclone_env['RCLONE_SERVER_SIDE_ACROSS_CONFIGS'] = 'true'
+        rclone_env = rclone_environment()
 
         # Always include --progress for live updates, unless it's a no-args mode
         cmd.append("--progress")
         cmd.append("--stats=3s") # Provide stats every 3 seconds
         cmd.append("--stats-one-line-date") # Single line stats with date
 
-    print(f"Executing Rclone command: {' '.join(cmd)}")
-    clear_log(LOG_FILE) # Clear log before new execution
+    return cmd, rclone_env
 
-    # Generator function to stream output
-    def generate_rclone_output():
-        global rclone_process
-        stop_rclone_flag.clear() # Clear the stop flag for a new run
+def job_summary(job):
+    """Final frame sent at the end of a live stream (no log content, see /download-rclone-log)."""
+    finished_at = job.finished_at or time.time()
+    return {
+        "status": 'complete' if job.status == 'completed' else job.status,
+        "job_id": job.id,
+        "message": job.message,
+        "return_code": job.return_code,
+        "line_count": job.line_count,
+        "duration": round(finished_at - job.started_at, 3) if job.started_at else 0,
+    }
 
-        try:
-            with rclone_lock:
-                rclone_process = subprocess.Popen(
-                    cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT, # Merge stdout and stderr
-                    universal_newlines=True,
-                    bufsize=1, # Line-buffered
-                    env=rclone_env if 'rclone_env' in locals() else os.environ.copy() # Pass environment variables if created
-                )
-
-            for line in iter(rclone_process.stdout.readline, ''):
-                if stop_rclone_flag.is_set():
-                    # If flag is set, terminate and break loop
-                    rclone_process.terminate()
-                    yield json.dumps({"status": "stopped", "message": "Rclone process stopped by user."}) + '\n'
-                    break
+def stream_job_output(job):
+    """Generator yielding a job's output as JSON lines until the job finishes.
 
-                line_stripped = line.strip()
-                if line_stripped:
-                    write_to_log(LOG_FILE, line_stripped)
-                    # Send each line as a JSON object
-                    yield json.dumps({"status": "progress", "output": line_stripped}) + '\n'
-
-            rclone_process.wait()
-            return_code = rclone_process.returncode
-            final_status = "complete" if return_code == 0 else "error"
-            final_message = "Rclone command completed successfully." if return_code == 0 else f"Rclone command failed with exit code {return_code}."
-            
-            # Read full log for final output, as client will truncate for display
-            full_log_content = read_full_log(LOG_FILE)
-
-            yield json.dumps({
-                "status": final_status,
-                "message": final_message,
-                "output": full_log_content # Send full log for final display (client can choose to truncate)
-            }) + '\n'
+    Reads from the job's output ring, so it can be attached at any time and
+    disconnecting the client does not affect the job itself. Each progress frame
+    carries a batch of lines joined by newlines.
+    """
+    yield json.dumps({"status": "started", "job_id": job.id, "message": f"Rclone job {job.id} started."}) + '\n'
+    seq = 0
+    for first_seq, lines, at_end, partial in iter_output_batches(job.output):
+        if first_seq > seq + 1:
+            yield json.dumps({"status": "progress", "output": f"... {first_seq - seq - 1} lines skipped, download the log for full output ..."}) + '\n'
+        if lines:
+            seq = first_seq + len(lines) - 1
+            with timings.time('stream.encode'):
+                frame = json.dumps({"status": "progress", "output": '\n'.join(lines), "seq": seq}) + '\n'
+            yield frame
+        if partial is not None:
+            yield json.dumps({"status": "progress", "partial": partial}) + '\n'
+    yield json.dumps(job_summary(job)) + '\n'
 
-        except FileNotFoundError:
-            yield json.dumps({"status": "error", "message": "Rclone executable not found. Ensure it's installed and in PATH."}) + '\n'
-        except Exception as e:
-            yield json.dumps({"status": "error", "message": f"An unexpected error occurred: {e}"}) + '\n'
-        finally:
-            with rclone_lock:
-                if rclone_process and rclone_process.poll() is None:
-                    # If process is still running after loop, ensure it's terminated
-                    rclone_process.terminate()
-                rclone_process = None # Clear the global process variable
+def format_sse(data, event=None, event_id=None):
+    """Formats a single Server-Sent Events frame."""
+    frame = ''
+    if event_id is not None:
+        frame += f"id: {event_id}\n"
+    if event:
+        frame += f"event: {event}\n"
+    for data_line in data.replace('\r', '').split('\n'):
+        frame += f"data: {data_line}\n"
+    return frame + '\n'
+
+def stream_job_events(job, last_event_id=0):
+    """Generator yielding a job's output as Server-Sent Events.
+
+    Each event carries a batch of lines (one data field per line) and the
+    sequence number of its last line as the event ID, so a client reconnecting
+    with Last-Event-ID resumes right after the last line it received. A 'gap'
+    event reports lines that already left the in-memory ring, and a final 'end'
+    event carries the job summary. 'partial' events carry the unfinished line
+    (progress bar) the process is writing, or an empty string once it is done.
+    A Last-Event-ID beyond the newest line (e.g. a job ID reused after a restart)
+    is clamped to it and announced with a 'reset' event, so the client can drop
+    the lines it holds instead of waiting for sequence numbers that never come.
+    """
+    yield "retry: 2000\n\n" # Reconnect quickly after network blips
+    seq = last_event_id
+    if seq > job.output.last_seq:
+        seq = job.output.last_seq
+        yield format_sse(json.dumps({"last_seq": seq}), event='reset', event_id=seq)
+    for first_seq, lines, at_end, partial in iter_output_batches(job.output, seq):
+        if first_seq > seq + 1:
+            yield format_sse(json.dumps({"from": seq + 1, "to": first_seq - 1}), event='gap')
+        if lines:
+            seq = first_seq + len(lines) - 1
+            with timings.time('stream.encode'):
+                frame = format_sse('\n'.join(lines), event_id=seq)
+            yield frame
+        if partial is not None:
+            yield format_sse(partial, event='partial')
+        elif not lines and not at_end:
+            yield ": keepalive\n\n"
+    yield format_sse(json.dumps(job.to_dict()), event='end', event_id=seq)
+
+def gzip_stream(chunks):
+    """Gzip-compresses a generator of text chunks, flushing after every chunk."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) # wbits=31 selects the gzip container
+    for chunk in chunks:
+        with timings.time('stream.gzip'):
+            data = compressor.compress(chunk.encode('utf-8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield data
+    yield compressor.flush()
+
+def streaming_response(chunks, mimetype, headers=None):
+    """Builds a streaming Response, gzip-compressed when the client accepts it."""
+    headers = dict(headers or {}, Vary='Accept-Encoding')
+    if STREAM_GZIP and 'gzip' in request.accept_encodings:
+        headers['Content-Encoding'] = 'gzip'
+        chunks = gzip_stream(chunks)
+    return Response(chunks, mimetype=mimetype, headers=headers)
+
+def validate_sharded_request(data):
+    """Checks that a request asking for 'shards' can be run as a sharded transfer."""
+    try:
+        shard_count = int(data['shards'])
+    except (TypeError, ValueError):
+        raise RcloneCommandError("Shards must be a number.")
+    if shard_count < 2:
+        raise RcloneCommandError("Sharded transfers need at least 2 shards.")
+    if data.get('mode') not in SHARDABLE_MODES:
+        raise RcloneCommandError("Sharded transfers are only supported for copy and sync.")
+    if not data.get('service_account'):
+        raise RcloneCommandError("Sharded transfers require service accounts.")
+    if len(list_service_accounts()) < shard_count:
+        raise RcloneCommandError(f"Sharded transfers need at least {shard_count} service accounts, one per shard.")
+
+def validate_incremental_request(data):
+    """Checks that a request asking for 'incremental' can be planned from listing snapshots."""
+    if data.get('mode') not in INCREMENTAL_MODES:
+        raise RcloneCommandError("Incremental transfers are only supported for copy and sync.")
+    if data.get('shards') or data.get('auto_tune'):
+        raise RcloneCommandError("Incremental transfers cannot be combined with sharding or auto-tuning.")
+    if '--files-from' in data.get('additional_flags', ''):
+        raise RcloneCommandError("Incremental transfers choose the files themselves, remove --files-from.")
+
+def validate_tuned_request(data):
+    """Checks that a request asking for 'auto_tune' can be run by the AutoTuner."""
+    if data.get('mode') not in TUNABLE_MODES:
+        raise RcloneCommandError("Auto-tuning is only supported for copy, sync and move.")
+    if data.get('shards'):
+        raise RcloneCommandError("Auto-tuning cannot be combined with sharded transfers.")
+
+def submit_rclone_job(data):
+    """Validates a request payload and queues it. Returns (job, error_response).
 
-    return Response(generate_rclone_output(), mimetype='application/json-lines')
+    Listings are answered from the listing cache when possible (unless the
+    payload sets 'no_cache'). Otherwise the job runs on the rcd backend when
+    requested (payload 'backend' or RCLONE_BACKEND) and the mode has a remote
+    control equivalent, or as a separate Rclone process.
+    """
+    data = data or {}
+    try:
+        cmd, rclone_env = build_rclone_command(data)
+    except RcloneCommandError as e:
+        return None, (jsonify({"status": "error", "message": str(e)}), 400)
+    mode = data.get('mode')
+    try:
+        if data.get('shards'):
+            validate_sharded_request(data)
+        if data.get('auto_tune'):
+            validate_tuned_request(data)
+        if data.get('incremental'):
+            validate_incremental_request(data)
+    except RcloneCommandError as e:
+        return None, (jsonify({"status": "error", "message": str(e)}), 400)
+    if mode in MUTATING_MODES:
+        listing_cache.invalidate(mutated_paths(data))
+    rc_call = build_rc_call(data) if data.get('backend', RCLONE_BACKEND) == 'rcd' else None
+    cache_key = listing_cache_key(data, cmd, rc_call) if mode in CACHEABLE_MODES and not data.get('no_cache') else None
+    if cache_key:
+        cached_lines = listing_cache.get(cache_key)
+        if cached_lines is not None:
+            return job_manager.submit(cmd, rclone_env, data, cache_key=cache_key, cached_lines=cached_lines), None
+    return job_manager.submit(cmd, rclone_env, data, rc_call, cache_key), None
+
+@app.route('/execute-rclone', methods=['POST'])
+@login_required
+def execute_rclone():
+    """Submits an Rclone command as a background job and streams its output."""
+    job, error_response = submit_rclone_job(request.get_json())
+    if error_response:
+        return error_response
+    return streaming_response(stream_job_output(job), 'application/json-lines')
 
 @app.route('/stop-rclone-process', methods=['POST'])
 @login_required
 def stop_rclone_process():
-    """Terminates the active Rclone process."""
-    global rclone_process
-    with rclone_lock:
-        if rclone_process and rclone_process.poll() is None:
-            stop_rclone_flag.set() # Set the flag to signal termination
-            rclone_process.terminate() # Send SIGTERM
-            rclone_process.wait(timeout=5) # Wait for process to terminate
-            if rclone_process.poll() is None: # If still running after timeout, kill it
-                rclone_process.kill()
-            rclone_process = None
-            return jsonify({"status": "success", "message": "Rclone process stopped."})
-        return jsonify({"status": "info", "message": "No Rclone process is currently running."})
+    """Stops the given Rclone job, or every active job if no job_id is sent."""
+    job_id = (request.get_json(silent=True) or {}).get('job_id')
+    job_ids = [job_id] if job_id else [job.id for job in job_manager.running()]
+    stopped = [jid for jid in job_ids if job_manager.stop(jid)]
+    if stopped:
+        return jsonify({"status": "success", "message": "Rclone process stopped.", "job_ids": stopped})
+    return jsonify({"status": "info", "message": "No Rclone process is currently running."})
+
+def log_download_response(filename, download_name):
+    """Streams a (possibly rotated and compressed) log as an attachment, honouring Range requests.
+
+    The log is read in chunks, never loaded into memory. Offsets refer to the
+    uncompressed log as a whole.
+    """
+    parts = open_log(filename)
+    total = sum(size for _, size in parts)
+    headers = {
+        "Content-Disposition": f"attachment;filename={download_name}",
+        "Accept-Ranges": "bytes",
+    }
+    status = 200
+    start, end = 0, total
+    if request.range:
+        byte_range = request.range.range_for_length(total)
+        if byte_range is None:
+            for f, _ in parts:
+                f.close()
+            return Response(status=416, headers={"Content-Range": f"bytes */{total}"})
+        start, end = byte_range
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{total}"
+    headers["Content-Length"] = str(end - start)
+    return Response(iter_log_bytes(parts, start, end), status=status, mimetype='text/plain', headers=headers,
+                    direct_passthrough=True)
 
 @app.route('/download-rclone-log', methods=['GET'])
 @login_required
 def download_rclone_log():
-    """Allows downloading the full Rclone LOG_FILE as an attachment."""
-    if os.path.exists(LOG_FILE):
-        return Response(
-            open(LOG_FILE, 'rb').read(),
-            mimetype='text/plain',
-            headers={"Content-Disposition": f"attachment;filename=rclone_webgui_log_{time.strftime('%Y%m%d-%H%M%S')}.txt"}
-        )
+    """Allows downloading a job's Rclone log (latest job by default) as an attachment.
+
+    Logs of jobs no longer held in memory can still be downloaded by job_id
+    until log retention removes them.
+    """
+    job_id = request.args.get('job_id')
+    if job_id:
+        if not re.fullmatch(r'[0-9a-f]{12}', job_id):
+            return jsonify({"status": "error", "message": "Invalid job ID."}), 400
+        log_file = os.path.join(JOBS_LOG_DIR, f"{job_id}.log")
+    else:
+        jobs = job_manager.list()
+        log_file = jobs[-1].log_file if jobs else None
+    if log_file and (os.path.exists(log_file) or log_segments(log_file)):
+        return log_download_response(log_file, f"rclone_webgui_log_{time.strftime('%Y%m%d-%H%M%S')}.txt")
     return jsonify({"status": "error", "message": "Rclone log file not found."}), 404
 
+# --- Rclone Job API ---
+@app.route('/jobs', methods=['POST'])
+@login_required
+def create_job():
+    """Queues an Rclone command and returns its job ID without waiting for output."""
+    job, error_response = submit_rclone_job(request.get_json())
+    if error_response:
+        return error_response
+    return jsonify({"status": "success", "job": job.to_dict()}), 202
+
+@app.route('/jobs', methods=['GET'])
+@login_required
+def list_jobs():
+    """Lists queued, running and recently finished jobs, newest first."""
+    return jsonify({"status": "success", "jobs": [job.to_dict() for job in reversed(job_manager.list())]})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    """Returns the state of a single job."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found."}), 404
+    return jsonify({"status": "success", "job": job.to_dict()})
+
+@app.route('/jobs/<job_id>/stream', methods=['GET'])
+@login_required
+def stream_job(job_id):
+    """Streams a job's output from the beginning as JSON lines."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found."}), 404
+    return streaming_response(stream_job_output(job), 'application/json-lines')
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+@login_required
+def job_events(job_id):
+    """Server-Sent Events stream of a job's output, resumable via Last-Event-ID."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found."}), 404
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0)
+    except ValueError:
+        last_event_id = 0
+    return streaming_response(
+        stream_job_events(job, max(0, last_event_id)),
+        'text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"} # Disable proxy buffering
+    )
+
+@app.route('/jobs/<job_id>/metrics', methods=['GET'])
+@login_required
+def job_metrics(job_id):
+    """Returns a job's parsed stats time series in columnar form for graphs.
+
+    Query parameters:
+        since: only return samples newer than this UNIX timestamp.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found."}), 404
+    try:
+        since = float(request.args['since']) if 'since' in request.args else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid 'since' timestamp."}), 400
+    return jsonify({
+        "status": "success",
+        "job_id": job.id,
+        "fields": list(MetricsSeries.FIELDS),
+        "points": job.metrics.points(since),
+        "latest": job.metrics.latest(),
+    })
+
+scanned_log_indexes = OrderedDict() # job_id -> LogIndex of logs whose job is no longer in memory
+scanned_log_indexes_lock = threading.Lock()
+
+def job_log_index(job_id):
+    """Returns (LogIndex, log file) for a job's log, or (None, None) if there is no such log.
+
+    The index of a live job is a snapshot. Logs of jobs that left the job list
+    are indexed on first use by scanning at most LOG_SCAN_MAX_BYTES of them; the
+    last few of those indexes are kept.
+    """
+    job = job_manager.get(job_id)
+    if job is not None:
+        index = job.log_index_snapshot()
+        log_sink = job.log_sink
+        if log_sink:
+            log_sink.flush() # Indexed lines may still be buffered
+        return index, job.log_file
+    if not re.fullmatch(r'[0-9a-f]{12}', job_id):
+        return None, None
+    log_file = os.path.join(JOBS_LOG_DIR, f"{job_id}.log")
+    with scanned_log_indexes_lock:
+        if job_id in scanned_log_indexes:
+            scanned_log_indexes.move_to_end(job_id)
+            return scanned_log_indexes[job_id], log_file
+    if not os.path.exists(log_file) and not log_segments(log_file):
+        return None, None
+    index = LogIndex.scan(log_file)
+    with scanned_log_indexes_lock:
+        scanned_log_indexes[job_id] = index
+        while len(scanned_log_indexes) > 4:
+            scanned_log_indexes.popitem(last=False)
+    return index, log_file
+
+@app.route('/jobs/<job_id>/log', methods=['GET'])
+@login_required
+def job_log(job_id):
+    """Returns lines of a job's log, addressed through the log index.
+
+    Query parameters:
+        tail: return the last N lines (of the range, or of the matches).
+        start, end: line range, 1-based and inclusive (default: whole log).
+        level: only lines of this Rclone log level (DEBUG, INFO, NOTICE, ERROR...).
+        q: only lines matching this regular expression.
+        limit: max lines returned (capped at LOG_QUERY_MAX_LINES).
+
+    Filtered queries report the range they covered in scanned_from/scanned_to;
+    continue a forward search with start=scanned_to + 1.
+    """
+    index, log_file = job_log_index(job_id)
+    if index is None:
+        return jsonify({"status": "error", "message": "Job log not found."}), 404
+    try:
+        tail = int(request.args['tail']) if 'tail' in request.args else None
+        first = int(request.args.get('start', 1))
+        last = int(request.args['end']) if 'end' in request.args else None
+        limit = min(int(request.args.get('limit', LOG_QUERY_MAX_LINES)), LOG_QUERY_MAX_LINES)
+    except ValueError:
+        return jsonify({"status": "error", "message": "tail, start, end and limit must be integers."}), 400
+    if (tail is not None and tail < 1) or limit < 1:
+        return jsonify({"status": "error", "message": "tail and limit must be positive."}), 400
+    level = request.args.get('level', '').upper() or None
+    pattern = request.args.get('q') or None
+    if pattern:
+        if len(pattern) > 200:
+            return jsonify({"status": "error", "message": "Search pattern is too long."}), 400
+        try:
+            pattern = re.compile(pattern)
+        except re.error as e:
+            return jsonify({"status": "error", "message": f"Invalid search pattern: {e}"}), 400
+    with timings.time('log.search'):
+        lines, scanned_from, scanned_to = search_log(index, log_file, first, last, tail, level, pattern, limit)
+    return jsonify({
+        "status": "success",
+        "job_id": job_id,
+        "line_count": index.line_count,
+        "complete": index.complete, # False if only the start of a large finished log was indexed
+        "lines": [{"n": number, "text": text} for number, text in lines],
+        "scanned_from": scanned_from,
+        "scanned_to": scanned_to,
+    })
+
+@app.route('/jobs/<job_id>/log/index', methods=['GET'])
+@login_required
+def job_log_summary(job_id):
+    """Returns a job log's line count, per-level counts and the paths that failed most often."""
+    index, _ = job_log_index(job_id)
+    if index is None:
+        return jsonify({"status": "error", "message": "Job log not found."}), 404
+    return jsonify({"status": "success", "job_id": job_id, **index.summary()})
+
+@app.route('/jobs/<job_id>/stop', methods=['POST'])
+@login_required
+def stop_job(job_id):
+    """Stops a single queued or running job."""
+    if job_manager.get(job_id) is None:
+        return jsonify({"status": "error", "message": "Job not found."}), 404
+    if job_manager.stop(job_id):
+        return jsonify({"status": "success", "message": f"Rclone job {job_id} stopped."})
+    return jsonify({"status": "info", "message": f"Rclone job {job_id} is not running."})
+
+# --- Job History API ---
+def history_log_available(entry):
+    log_file = entry.get('log_file')
+    return bool(log_file) and (os.path.exists(log_file) or bool(log_segments(log_file)))
+
+@app.route('/history', methods=['GET'])
+@login_required
+def list_history():
+    """Returns one page of the persistent job history.
+
+    Query parameters:
+        kind, mode, status: only entries with this value ('rclone' or 'terminal' for kind).
+        source_remote, destination_remote: only transfers from/to this remote ('local' for local paths).
+        remote: only transfers with this remote at either end.
+        days: only entries created in the last N days.
+        sort: created (default), duration, bytes or throughput.
+        order: desc (default) or asc.
+        limit, offset: page size (default HISTORY_PAGE_SIZE) and start.
+
+    For example the slowest syncs to remote X in the last 30 days are
+    ?mode=sync&destination_remote=X&days=30&sort=throughput&order=asc.
+    """
+    filters = {key: request.args[key] for key in ('kind', 'mode', 'status', 'source_remote', 'destination_remote', 'remote')
+               if request.args.get(key)}
+    sort = request.args.get('sort', 'created')
+    order = request.args.get('order', 'desc')
+    if sort not in HISTORY_SORT_COLUMNS or order not in ('asc', 'desc'):
+        return jsonify({"status": "error", "message": "sort must be created, duration, bytes or throughput and order asc or desc."}), 400
+    try:
+        days = float(request.args['days']) if 'days' in request.args else None
+        limit = min(int(request.args.get('limit', HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE)
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({"status": "error", "message": "days, limit and offset must be numbers."}), 400
+    if limit < 1 or offset < 0:
+        return jsonify({"status": "error", "message": "limit must be positive and offset not negative."}), 400
+    since = time.time() - days * 86400 if days is not None else None
+    total, entries = job_history.query(filters, since, sort, order == 'desc', limit, offset)
+    for entry in entries:
+        entry['log_available'] = history_log_available(entry)
+    return jsonify({"status": "success", "total": total, "offset": offset, "entries": entries})
+
+@app.route('/history/<entry_id>', methods=['GET'])
+@login_required
+def get_history_entry(entry_id):
+    """Returns a single history entry."""
+    entry = job_history.get(entry_id)
+    if entry is None:
+        return jsonify({"status": "error", "message": "History entry not found."}), 404
+    entry['log_available'] = history_log_available(entry)
+    return jsonify({"status": "success", "entry": entry})
+
+@app.route('/history/<entry_id>/rerun', methods=['POST'])
+@login_required
+def rerun_history_entry(entry_id):
+    """Queues a new job with the request payload of a past Rclone job."""
+    entry = job_history.get(entry_id)
+    if entry is None:
+        return jsonify({"status": "error", "message": "History entry not found."}), 404
+    if entry['kind'] != 'rclone' or not entry['params']:
+        return jsonify({"status": "error", "message": "Only Rclone jobs can be re-run from history."}), 400
+    job, error_response = submit_rclone_job(entry['params'])
+    if error_response:
+        return error_response
+    job_history.update(job.id, rerun_of=entry_id)
+    return jsonify({"status": "success", "job": job.to_dict()}), 202
+
+@app.route('/history', methods=['DELETE'])
+@login_required
+def clear_history():
+    """Deletes all history entries of finished jobs."""
+    job_history.clear()
+    return jsonify({"status": "success", "message": "Job history cleared."})
+
+# --- Prometheus Metrics ---
+JOB_GAUGES = (
+    # (metric name, sample field, help text)
+    ('rclone_webgui_job_transferred_bytes', 'bytes', "Bytes transferred so far by the job."),
+    ('rclone_webgui_job_total_bytes', 'total_bytes', "Total bytes the job expects to transfer."),
+    ('rclone_webgui_job_speed_bytes_per_second', 'speed', "Current transfer speed reported by Rclone."),
+    ('rclone_webgui_job_eta_seconds', 'eta', "Estimated seconds until the job completes."),
+    ('rclone_webgui_job_errors', 'errors', "Errors reported by Rclone for the job."),
+    ('rclone_webgui_job_checks', 'checks', "Files checked so far by the job."),
+    ('rclone_webgui_job_transfers', 'transfers', "Files transferred so far by the job."),
+)
+
+def prometheus_label_value(value):
+    """Escapes a label value for the Prometheus text exposition format."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def render_prometheus_metrics():
+    """Renders job counts and the latest stats sample of every known job."""
+    jobs = job_manager.list()
+    lines = [
+        "# HELP rclone_webgui_jobs Number of known Rclone jobs by status.",
+        "# TYPE rclone_webgui_jobs gauge",
+    ]
+    for status in ('queued', 'running', 'completed', 'error', 'stopped'):
+        count = sum(1 for job in jobs if job.status == status)
+        lines.append(f'rclone_webgui_jobs{{status="{status}"}} {count}')
+
+    cache_stats = listing_cache.stats()
+    for counter in ('hits', 'misses', 'evictions', 'expirations', 'invalidations'):
+        lines.append(f"# HELP rclone_webgui_listing_cache_{counter}_total Listing cache {counter}.")
+        lines.append(f"# TYPE rclone_webgui_listing_cache_{counter}_total counter")
+        lines.append(f"rclone_webgui_listing_cache_{counter}_total {cache_stats[counter]}")
+
+    # Labels that change during a job's life (status) are kept off the transfer gauges, so a job is
+    # one series per gauge; join on job_id with rclone_webgui_job_info/_status for the rest.
+    lines.append("# HELP rclone_webgui_job_info Constant details of a known Rclone job.")
+    lines.append("# TYPE rclone_webgui_job_info gauge")
+    for job in jobs:
+        labels = ','.join(f'{key}="{prometheus_label_value(value)}"' for key, value in (
+            ('job_id', job.id), ('mode', job.mode),
+            ('source', job.params.get('source', '')), ('destination', job.params.get('destination', '')),
+        ))
+        lines.append(f"rclone_webgui_job_info{{{labels}}} 1")
+    lines.append("# HELP rclone_webgui_job_status Current status of a known Rclone job (always 1).")
+    lines.append("# TYPE rclone_webgui_job_status gauge")
+    for job in jobs:
+        lines.append(f'rclone_webgui_job_status{{job_id="{job.id}",status="{job.status}"}} 1')
+
+    latest = [(job, job.metrics.latest()) for job in jobs]
+    latest = [(job, sample) for job, sample in latest if sample]
+    for name, field, help_text in JOB_GAUGES:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for job, sample in latest:
+            if sample.get(field) is not None:
+                lines.append(f'{name}{{job_id="{job.id}"}} {sample[field]}')
+    return '\n'.join(lines) + '\n'
+
+@app.route('/listing-cache', methods=['GET'])
+@login_required
+def listing_cache_stats():
+    """Returns listing cache hit/miss counters and size."""
+    return jsonify({"status": "success", "cache": listing_cache.stats()})
+
+@app.route('/listing-cache', methods=['DELETE'])
+@login_required
+def clear_listing_cache():
+    """Drops all cached listings."""
+    listing_cache.clear()
+    return jsonify({"status": "success", "message": "Listing cache cleared."})
+
+@app.route('/autotune', methods=['GET'])
+@login_required
+def autotune_settings():
+    """Returns the best auto-tuned settings recorded per remote pair."""
+    return jsonify({"status": "success", "settings": tuning_store.all()})
+
+@app.route('/autotune', methods=['DELETE'])
+@login_required
+def clear_autotune_settings():
+    """Forgets all recorded auto-tuned settings."""
+    tuning_store.clear()
+    return jsonify({"status": "success", "message": "Auto-tune history cleared."})
+
+@app.route('/metrics', methods=['GET'])
+@metrics_auth_required
+def metrics():
+    """Prometheus exposition endpoint for job status and transfer stats."""
+    return Response(render_prometheus_metrics(), mimetype='text/plain; version=0.0.4')
+
+# --- Debug Timings and Profiler API ---
+profile_lock = threading.Lock() # One sampling run at a time
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_timing(response):
+    """Records handler latency per route, and for streamed responses the time until the stream closed."""
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.endpoint or 'unmatched'
+        timings.observe(f"request.{endpoint}", time.perf_counter() - started)
+        if response.is_streamed:
+            response.call_on_close(lambda: timings.observe(f"stream.{endpoint}", time.perf_counter() - started))
+    return response
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def sample_stacks(seconds, interval, thread_filter=None):
+    """Samples the stacks of all other threads every interval for the given seconds.
+
+    Returns (Counter of collapsed stacks, number of samples). A collapsed stack is
+    the thread name followed by its frames from the outermost call inwards,
+    separated by semicolons.
+    """
+    own = threading.get_ident()
+    stacks = Counter()
+    samples = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            name = names.get(ident, f"thread-{ident}")
+            if ident == own or (thread_filter and thread_filter not in name):
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(frame_label(frame))
+                frame = frame.f_back
+            labels.append(name)
+            stacks[';'.join(reversed(labels))] += 1
+        samples += 1
+        time.sleep(interval)
+    return stacks, samples
+
+@app.route('/debug/timings', methods=['GET'])
+@login_required
+def debug_timings():
+    """Returns latency histograms per route, pipeline stage and lock, and bytes read and written per job.
+
+    Histograms are request.<endpoint> (until the handler returned),
+    stream.<endpoint> (until a streamed response closed), lock_wait.<lock>
+    (contended acquisitions only; 'locks' counts all of them), pipe.*, log.*,
+    stream.encode/gzip and job.*_bytes of finished jobs.
+    """
+    jobs = [{"job_id": job.id, "status": job.status, "line_count": job.line_count,
+             "pipe_bytes": job.pipe_bytes, "log_bytes": job.log_bytes} for job in job_manager.list()]
+    return jsonify({"status": "success", "enabled": timings.enabled, "since": timings.started_at,
+                    "timings": timings.snapshot(), "locks": timings.lock_counts(), "jobs": jobs})
+
+@app.route('/debug/timings', methods=['DELETE'])
+@login_required
+def reset_debug_timings():
+    """Clears all recorded histograms."""
+    timings.reset()
+    return jsonify({"status": "success", "message": "Timings reset."})
+
+@app.route('/debug/profile', methods=['GET'])
+@login_required
+def debug_profile():
+    """Samples the stacks of all threads and returns them as collapsed stacks.
+
+    Query parameters:
+        seconds: how long to sample (default 5, at most PROFILE_MAX_SECONDS).
+        interval: seconds between samples (default PROFILE_INTERVAL).
+        thread: only sample threads whose name contains this text.
+        format: 'json' for a JSON list instead of text.
+
+    The text output has one 'frame;frame;... count' line per distinct stack, the
+    input format of flamegraph.pl and speedscope.
+    """
+    try:
+        seconds = float(request.args.get('seconds', 5))
+        interval = float(request.args.get('interval', PROFILE_INTERVAL))
+    except ValueError:
+        return jsonify({"status": "error", "message": "seconds and interval must be numbers."}), 400
+    if not 0 < seconds <= PROFILE_MAX_SECONDS or not 0.001 <= interval <= 1:
+        return jsonify({"status": "error", "message": f"seconds must be in (0, {PROFILE_MAX_SECONDS}] and interval in [0.001, 1]."}), 400
+    if not profile_lock.acquire(blocking=False):
+        return jsonify({"status": "error", "message": "A profile is already being recorded."}), 409
+    try:
+        stacks, samples = sample_stacks(seconds, interval, request.args.get('thread'))
+    finally:
+        profile_lock.release()
+    if request.args.get('format') == 'json':
+        return jsonify({"status": "success", "samples": samples, "interval": interval,
+                        "stacks": [{"stack": stack, "count": count} for stack, count in stacks.most_common()]})
+    return Response(''.join(f"{stack} {count}\n" for stack, count in stacks.most_common()), mimetype='text/plain')
+
 # --- Web Terminal Functions ---
-def _stream_terminal_output_to_file(process, filename, stop_flag):
-    """Internal function to stream subprocess output to a file in a separate thread."""
-    clear_log(filename) # Clear log before starting new stream
-    for line in iter(process.stdout.readline, ''):
-        write_to_log(filename, line.strip())
-        if stop_flag.is_set():
-            break
-    process.wait() # Wait for the process to truly finish
+def _stream_terminal_output_to_file(process, log_sink, stop_flag, generation, history_id, started_at):
+    """Internal function to stream subprocess output to a file in a separate thread.
+
+    Unfinished lines (progress bars, prompts) are kept in terminal_partial_line
+    instead of the file until they are complete. Once the next command starts,
+    log_sink is discarded and whatever this command still prints is dropped.
+    The outcome is recorded in the job history entry history_id once the
+    process exits.
+    """
+    global terminal_partial_line
+    line_count = 0
+    with log_sink:
+        for line, complete in PipeLineReader(process.stdout, stop_flag=stop_flag):
+            if complete:
+                log_sink.write_line(line.strip())
+                line_count += 1
+                line = ''
+            if generation == terminal_log_generation:
+                terminal_partial_line = (generation, line)
+            if stop_flag.is_set():
+                break
+    if generation == terminal_log_generation:
+        terminal_partial_line = (generation, '')
+    return_code = process.wait() # Wait for the process to truly finish
+    if stop_flag.is_set():
+        status, message = 'stopped', "Terminal process stopped by user."
+    elif return_code == 0:
+        status, message = 'completed', "Command completed successfully."
+    else:
+        status, message = 'error', f"Command failed with exit code {return_code}."
+    finished_at = time.time()
+    job_history.update(history_id, status=status, message=message, exit_code=return_code, finished_at=finished_at,
+                       duration=finished_at - started_at, line_count=line_count)
 
 @app.route('/execute_terminal_command', methods=['POST'])
 @login_required
 def execute_terminal_command():
     """Executes a terminal command."""
-    global terminal_process
+    global terminal_process, terminal_log_generation, terminal_stop_event, terminal_log_sink
     command = request.get_json().get('command')
 
     if not command:
@@ -415,40 +3664,88 @@ def execute_terminal_command():
             terminal_process = None
 
         try:
-            stop_terminal_flag.clear() # Clear the stop flag for a new run
+            terminal_stop_event = threading.Event() # The previous command's reader keeps its own, set event
+            if terminal_log_sink is not None:
+                terminal_log_sink.discard() # Late output of the previous command must not land in the new log
+            clear_log(TERMINAL_LOG_FILE) # Cleared together with the generation bump, so polls never mix the two
+            terminal_log_sink = LogSink(TERMINAL_LOG_FILE)
+            terminal_log_generation += 1 # Clients holding an old offset will start over
             terminal_process = subprocess.Popen(
                 command,
                 shell=True, # Allows executing shell commands directly
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT, # Merge stdout and stderr
-                universal_newlines=True,
-                bufsize=1 # Line-buffered
+                bufsize=0, # Read in chunks by PipeLineReader
+                start_new_session=True # Own process group, so stopping reaches the shell's children too
             )
+            history_id = uuid.uuid4().hex[:12]
+            started_at = time.time()
+            job_history.add(id=history_id, kind='terminal', command=command, status='running',
+                            message="Command is running.", created_at=started_at, started_at=started_at)
             # Start a separate thread to consume output and write to log file
             threading.Thread(
                 target=_stream_terminal_output_to_file,
-                args=(terminal_process, TERMINAL_LOG_FILE, stop_terminal_flag),
+                args=(terminal_process, terminal_log_sink, terminal_stop_event, terminal_log_generation, history_id,
+                      started_at),
                 daemon=True # Daemon threads are terminated when the main program exits
             ).start()
 
             return jsonify({"status": "success", "message": f"Command '{command}' started."})
         except Exception as e:
             # Ensure process is cleaned up if an error occurs during Popen
-            if terminal_process and terminal_process.poll() is None:
-                terminal_process.terminate()
+            terminal_stop_event.set()
+            terminate_process(terminal_process, group=True)
             terminal_process = None
             return jsonify({"status": "error", "message": f"Failed to execute command: {e}"}), 500
 
 @app.route('/get_terminal_output', methods=['GET'])
 @login_required
 def get_terminal_output():
-    """Returns the full terminal output from the log file and process status."""
+    """Returns terminal output written since the given byte offset and process status.
+
+    Query parameters:
+        offset: byte offset the client has already received (default 0).
+        generation: log generation the offset belongs to; a mismatch restarts from 0.
+
+    'partial' is the line the command is still writing (e.g. a progress bar); it
+    is not part of the log yet and replaces the previous poll's partial line.
+    """
+    try:
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        offset = 0
+    client_generation = request.args.get('generation')
+
     with terminal_lock:
         # Check if the process is still running
         is_running = terminal_process and terminal_process.poll() is None
-        # Read the full content of the log file
-        output_content = read_full_log(TERMINAL_LOG_FILE)
-        return jsonify({"status": "success", "output": output_content, "is_running": is_running})
+        generation = terminal_log_generation
+
+    reset = client_generation is None or client_generation != str(generation)
+    if reset:
+        offset = 0
+    with timings.time('log.read_chunk'):
+        output_content, next_offset, file_size = read_log_chunk(TERMINAL_LOG_FILE, offset)
+    if next_offset < offset:
+        reset = True # Log was truncated underneath the client
+    more = next_offset < file_size
+    with terminal_lock:
+        if terminal_log_generation != generation:
+            # A new command cleared the log while it was read; what we have may be either command's output
+            generation = terminal_log_generation
+            is_running = terminal_process and terminal_process.poll() is None
+            output_content, next_offset, reset, more = '', 0, True, True
+    partial_generation, partial = terminal_partial_line
+    return jsonify({
+        "status": "success",
+        "output": output_content,
+        "offset": next_offset,
+        "generation": generation,
+        "reset": reset,
+        "more": more, # More data is pending, poll again right away
+        "partial": partial if partial_generation == generation and not more else '', # Unfinished last line
+        "is_running": bool(is_running)
+    })
 
 @app.route('/stop_terminal_process', methods=['POST'])
 @login_required
@@ -456,26 +3753,20 @@ def stop_terminal_process():
     """Terminates any active terminal process."""
     global terminal_process
     with terminal_lock:
-        if terminal_process and terminal_process.poll() is None:
-            stop_terminal_flag.set() # Set the flag to signal termination
-            terminal_process.terminate() # Send SIGTERM
-            terminal_process.wait(timeout=5) # Wait for process to terminate
-            if terminal_process.poll() is None: # If still running after timeout, kill it
-                terminal_process.kill()
-            terminal_process = None
-            return jsonify({"status": "success", "message": "Terminal process stopped."})
-        return jsonify({"status": "info", "message": "No terminal process is currently running."})
+        process = terminal_process
+        if not process or process.poll() is not None:
+            return jsonify({"status": "info", "message": "No terminal process is currently running."})
+        terminal_stop_event.set() # Signal this command's reader to stop
+        terminal_process = None
+    terminate_process(process, group=True) # Outside the lock, output polling must not wait for the process to exit
+    return jsonify({"status": "success", "message": "Terminal process stopped."})
 
 @app.route('/download-terminal-log', methods=['GET'])
 @login_required
 def download_terminal_log():
-    """Allows downloading the full Terminal LOG_FILE as an attachment."""
+    """Allows downloading the full Terminal LOG_FILE as an attachment (streamed, Range-capable)."""
     if os.path.exists(TERMINAL_LOG_FILE):
-        return Response(
-            open(TERMINAL_LOG_FILE, 'rb').read(),
-            mimetype='text/plain',
-            headers={"Content-Disposition": f"attachment;filename=terminal_log_{time.strftime('%Y%m%d-%H%M%S')}.txt"}
-        )
+        return log_download_response(TERMINAL_LOG_FILE, f"terminal_log_{time.strftime('%Y%m%d-%H%M%S')}.txt")
     return jsonify({"status": "error", "message": "Terminal log file not found."}), 404
 
 if __name__ == '__main__':
@@ -0,0 +1,109 @@
+"""Measures the incremental sync planner on synthetic million-entry lsjson listings.
+
+Builds an lsjson listing of --entries files and a second one in which --changed
+percent of the files were modified, half as many deleted and half as many
+added. Times parsing both into ListingSnapshot files, the streaming
+diff_listings merge over the two memory-mapped snapshots, and for comparison a
+diff of the same listings loaded into dicts. Resident memory is read from
+/proc/self/statm (Linux).
+
+Usage: python bench/bench_incremental_plan.py [--entries 1000000] [--changed 1]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from app import ListingSnapshot, diff_listings, parse_lsjson  # noqa: E402
+
+def rss_mib():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1048576
+    except (OSError, ValueError):
+        return float('nan')
+
+def entry_line(index, mod_time):
+    # Directory order, not sorted by path, like lsjson -R output
+    path = f"dir{index % 1000:04d}/sub{index % 37:02d}/file_{index:07d}.bin"
+    return json.dumps({"Path": path, "Name": path.rsplit('/', 1)[1], "Size": index * 7919 % 50000000,
+                       "ModTime": mod_time, "IsDir": False}).encode('utf-8') + b',\n'
+
+def make_listings(entries, changed_percent):
+    """Returns (old lines, new lines, expected change counts)."""
+    step = max(1, int(100 / changed_percent))
+    old = [entry_line(index, "2024-01-01T12:00:00.000000000Z") for index in range(entries)]
+    new = []
+    counts = {'new': 0, 'modified': 0, 'deleted': 0}
+    for index in range(entries):
+        if index % step == 0:
+            new.append(entry_line(index, "2024-06-01T08:30:00.000000000Z"))
+            counts['modified'] += 1
+        elif index % (step * 2) == 1:
+            counts['deleted'] += 1
+        else:
+            new.append(old[index])
+    for index in range(entries, entries + counts['deleted']):
+        new.append(entry_line(index, "2024-06-01T08:30:00.000000000Z"))
+        counts['new'] += 1
+    return [b'[\n'] + old + [b']\n'], [b'[\n'] + new + [b']\n'], counts
+
+def timed(label, func, *args):
+    """Runs func, printing its duration and resident memory. Returns (result, seconds)."""
+    rss_before = rss_mib()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:>34}: {elapsed:7.2f}s  (RSS {rss_before:,.0f} -> {rss_mib():,.0f} MiB)")
+    return result, elapsed
+
+def build_snapshot(lines, path):
+    ListingSnapshot.write(path, *parse_lsjson(lines))
+
+def diff_snapshots(old_path, new_path):
+    counts = {'new': 0, 'modified': 0, 'deleted': 0}
+    with ListingSnapshot(old_path) as old, ListingSnapshot(new_path) as new:
+        for _, change in diff_listings(old, new):
+            counts[change] += 1
+    return counts
+
+def diff_dicts(old_lines, new_lines):
+    """Baseline: both listings as {path: (size, modtime)} dicts."""
+    def load(lines):
+        entries = (json.loads(line.strip().rstrip(b',')) for line in lines if line.startswith(b'{'))
+        return {entry['Path']: (entry['Size'], entry['ModTime']) for entry in entries}
+    old, new = load(old_lines), load(new_lines)
+    counts = {'new': 0, 'modified': 0, 'deleted': 0}
+    for path, value in new.items():
+        if path not in old:
+            counts['new'] += 1
+        elif old[path] != value:
+            counts['modified'] += 1
+    counts['deleted'] = sum(1 for path in old if path not in new)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=1000000, help="Files in the synthetic listing")
+    parser.add_argument('--changed', type=float, default=1.0, help="Percent of files modified between the listings")
+    args = parser.parse_args()
+
+    (old_lines, new_lines, expected), _ = timed("generate listings", make_listings, args.entries, args.changed)
+    json_mib = sum(len(line) for line in old_lines) / 1048576
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        old_path, new_path = os.path.join(tmp_dir, 'old.snap'), os.path.join(tmp_dir, 'new.snap')
+        timed("parse + write old snapshot", build_snapshot, old_lines, old_path)
+        _, build_seconds = timed("parse + write new snapshot", build_snapshot, new_lines, new_path)
+        print(f"{'snapshot size':>34}: {os.path.getsize(old_path) / 1048576:7.1f} MiB (lsjson {json_mib:.1f} MiB)")
+        counts, diff_seconds = timed("streaming diff of mmap'd snapshots", diff_snapshots, old_path, new_path)
+        print(f"{'changes':>34}: {counts} {'ok' if counts == expected else f'expected {expected}'}")
+        # A planner run parses only the new listing, the old one is already a snapshot
+        print(f"{'planner run (new snapshot + diff)':>34}: {build_seconds + diff_seconds:7.2f}s")
+        baseline, _ = timed("baseline: diff of two dicts", diff_dicts, old_lines, new_lines)
+        print(f"{'baseline changes':>34}: {baseline}")
+
+if __name__ == '__main__':
+    main()
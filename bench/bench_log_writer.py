@@ -0,0 +1,47 @@
+"""Compares per-line open/append/close logging with the buffered LogSink.
+
+Usage: python bench/bench_log_writer.py [--lines 200000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from app import LogSink  # noqa: E402
+
+SAMPLE_LINE = "2024/01/01 12:00:00 DEBUG : folder/sub/file_000123.bin: Need to transfer - File not found at Destination"
+
+def write_to_log(filename, content):
+    """The app's former write path: open, append one line, close."""
+    with open(filename, 'a', encoding='utf-8') as f:
+        f.write(content + '\n')
+
+def bench_write_to_log(path, lines):
+    start = time.perf_counter()
+    for _ in range(lines):
+        write_to_log(path, SAMPLE_LINE)
+    return time.perf_counter() - start
+
+def bench_log_sink(path, lines):
+    start = time.perf_counter()
+    with LogSink(path) as sink:
+        for _ in range(lines):
+            sink.write_line(SAMPLE_LINE)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=200000, help="Number of log lines to write")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, func in (("write_to_log", bench_write_to_log), ("LogSink", bench_log_sink)):
+            path = os.path.join(tmp_dir, f"{name}.log")
+            elapsed = func(path, args.lines)
+            size = os.path.getsize(path)
+            print(f"{name:>12}: {args.lines / elapsed:>12,.0f} lines/sec ({elapsed:.2f}s, {size / 1048576:.1f} MiB)")
+
+if __name__ == '__main__':
+    main()
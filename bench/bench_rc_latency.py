@@ -0,0 +1,53 @@
+"""Compares job latency of the subprocess backend with the rcd backend.
+
+Runs quick commands (listremotes, lsd, size) through the JobManager both ways
+and reports per-command latency from submission to completion. The rcd side
+talks to RCLONE_RCD_URL if set, otherwise to the bundled stub rc server; the
+subprocess side runs RCLONE_BINARY (set it to a real rclone for a fair
+comparison, both sides then need a working rclone.conf).
+
+Usage: python bench/bench_rc_latency.py [--runs 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, BENCH_DIR)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20, help="Runs per command and backend")
+    parser.add_argument('--remote', default='gdrive:', help="Remote used for lsd and size")
+    args = parser.parse_args()
+
+    if not os.environ.get('RCLONE_RCD_URL'):
+        import stub_rc_server
+        server = stub_rc_server.serve(port=0)
+        os.environ['RCLONE_RCD_URL'] = f"http://127.0.0.1:{server.server_address[1]}"
+    import app
+
+    commands = [{'mode': 'listremotes'}, {'mode': 'lsd', 'source': args.remote}, {'mode': 'size', 'source': args.remote}]
+    for payload in commands:
+        for backend in ('subprocess', 'rcd'):
+            latencies = []
+            failures = 0
+            for _ in range(args.runs):
+                data = dict(payload, backend=backend)
+                cmd, env = app.build_rclone_command(data)
+                rc_call = app.build_rc_call(data) if backend == 'rcd' else None
+                start = time.perf_counter()
+                job = app.job_manager.submit(cmd, env, data, rc_call)
+                job.done_event.wait()
+                latencies.append((time.perf_counter() - start) * 1000)
+                failures += job.status != 'completed'
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            print(f"{payload['mode']:>12} {backend:>10}: mean {statistics.mean(latencies):8.1f} ms, "
+                  f"p50 {statistics.median(latencies):8.1f} ms, p95 {p95:8.1f} ms, failures {failures}")
+
+if __name__ == '__main__':
+    main()
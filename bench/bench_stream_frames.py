@@ -0,0 +1,58 @@
+"""Measures CPU time and bytes on the wire for the live output stream framing.
+
+Compares the old one-JSON-object-per-line stream (plus the full log re-sent in
+the final frame) with the batched frames, with and without gzip.
+
+Usage: python bench/bench_stream_frames.py [--lines 200000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from app import Job, OutputRing, gzip_stream, stream_job_output  # noqa: E402
+
+def debug_line(i):
+    return f"2024/01/01 12:00:{i % 60:02d} DEBUG : folder{i % 97}/sub/file_{i:07d}.bin: Size and modification time the same (differ by 0s, within tolerance 1ms)"
+
+def legacy_stream(lines):
+    """The per-line framing used before batching."""
+    for line in lines:
+        yield json.dumps({"status": "progress", "output": line}) + '\n'
+    yield json.dumps({"status": "complete", "message": "Rclone command completed successfully.", "output": '\n'.join(lines) + '\n'}) + '\n'
+
+def finished_job(lines):
+    job = Job(["rclone", "sync"], {}, {"mode": "sync"})
+    job.output = OutputRing(capacity=len(lines) + 1)
+    for line in lines:
+        job.output.append(line)
+    job.status, job.message, job.return_code = 'completed', "Rclone command completed successfully.", 0
+    job.started_at = job.finished_at = time.time()
+    job.done_event.set()
+    job.output.close()
+    return job
+
+def measure(name, chunks):
+    start_cpu = time.process_time()
+    frames = 0
+    wire_bytes = 0
+    for chunk in chunks:
+        frames += 1
+        wire_bytes += len(chunk) if isinstance(chunk, bytes) else len(chunk.encode('utf-8'))
+    cpu = time.process_time() - start_cpu
+    print(f"{name:>16}: {cpu:6.2f}s CPU, {frames:>8,} frames, {wire_bytes / 1048576:8.2f} MiB on the wire")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=200000, help="Number of DEBUG lines in the run")
+    args = parser.parse_args()
+
+    lines = [debug_line(i) for i in range(args.lines)]
+    measure("per-line (old)", legacy_stream(lines))
+    measure("batched", stream_job_output(finished_job(lines)))
+    measure("batched + gzip", gzip_stream(stream_job_output(finished_job(lines))))
+
+if __name__ == '__main__':
+    main()
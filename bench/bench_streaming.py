@@ -0,0 +1,281 @@
+"""Measures the app's own overhead on the streaming path, with a fake rclone binary.
+
+Starts the app under gunicorn (gunicorn.conf.py) with RCLONE_BINARY pointing at
+bench/fake_rclone.py, which writes --lines lines of INFO, DEBUG, stats and
+carriage-return progress output at --rate lines per second. Then runs each
+scenario against it:
+
+    execute-rclone  POST /execute-rclone, reading the JSON-lines stream
+    events          POST /jobs, then following /jobs/<id>/events (SSE) like the browser does
+    terminal        the fake binary as a terminal command, polled through /get_terminal_output
+    download        /download-rclone-log of the execute-rclone job (full and a Range request)
+                    and /download-terminal-log
+
+For each it reports lines received per second, end-to-end line latency (from
+the moment the fake binary wrote a line, embedded as t=..., until the client
+parsed it), CPU time of the gunicorn worker and its peak RSS (read from /proc,
+Linux only). --save writes the results as JSON; --compare checks a run against
+saved results and exits with status 1 when a metric got worse by more than
+--tolerance, so regressions in the streaming path are caught.
+
+Usage: python bench/bench_streaming.py [--lines 200000] [--rate 0] [--scenarios execute-rclone,events,terminal,download]
+                                       [--save results.json] [--compare results.json]
+"""
+import argparse
+import json
+import os
+import re
+import shlex
+import subprocess
+import sys
+import time
+from urllib.parse import urlencode
+
+from load_control_latency import BENCH_DIR, REPO_DIR, Client, free_port, percentile, wait_for_server
+
+FAKE_RCLONE = os.path.join(BENCH_DIR, 'fake_rclone.py')
+TIMESTAMP_RE = re.compile(r' t=(\d+\.\d+)')
+SCENARIOS = ('execute-rclone', 'events', 'terminal', 'download')
+HIGHER_IS_BETTER = {'lines_per_sec', 'download_mib_per_sec'}
+
+# --- Server process statistics (/proc) ---
+def child_pids(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+            except OSError:
+                continue
+            if int(fields[1]) == pid:
+                children.append(int(entry))
+    return children
+
+def cpu_seconds(pid):
+    """User + system CPU time of a process."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+def peak_rss_mib(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+def reset_peak_rss(pid):
+    """Starts a new peak RSS measurement, where the kernel allows it."""
+    try:
+        with open(f"/proc/{pid}/clear_refs", 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+# --- Scenarios ---
+def count_output(output, now, latencies):
+    """Returns the number of lines in output and records the latency of their t= stamps."""
+    latencies.extend((now - float(stamp)) * 1000 for stamp in TIMESTAMP_RE.findall(output))
+    return output.count('\n') + 1
+
+def run_execute_rclone(port, cookie, payload, results):
+    client = Client(port, cookie, timeout=600)
+    latencies = []
+    lines = 0
+    start = time.perf_counter()
+    response = client.request('POST', '/execute-rclone', json.dumps(payload),
+                              {'Content-Type': 'application/json', 'Accept-Encoding': 'identity'})
+    for frame in response:
+        message = json.loads(frame)
+        if message.get('status') == 'started':
+            results['job_id'] = message['job_id']
+        elif message.get('output'):
+            lines += count_output(message['output'], time.time(), latencies)
+    return lines, time.perf_counter() - start, latencies
+
+def run_events(port, cookie, payload, results):
+    client = Client(port, cookie, timeout=600)
+    response = client.request('POST', '/jobs', json.dumps(payload), {'Content-Type': 'application/json'})
+    job_id = json.loads(response.read())['job']['job_id']
+    latencies = []
+    lines = 0
+    start = time.perf_counter()
+    response = client.request('GET', f"/jobs/{job_id}/events", headers={'Accept-Encoding': 'identity'})
+    event, data = None, []
+    for raw in response:
+        line = raw.decode('utf-8').rstrip('\n')
+        if line.startswith('event: '):
+            event = line[7:]
+        elif line.startswith('data: '):
+            data.append(line[6:])
+        elif not line: # End of one event
+            if event == 'end':
+                break
+            if event is None and data:
+                lines += count_output('\n'.join(data), time.time(), latencies)
+            event, data = None, []
+    client.connection.close()
+    return lines, time.perf_counter() - start, latencies
+
+def run_terminal(port, cookie, poll_interval):
+    client = Client(port, cookie, timeout=600)
+    command = f"{shlex.quote(sys.executable)} {shlex.quote(FAKE_RCLONE)}"
+    client.request('POST', '/execute_terminal_command', json.dumps({'command': command}),
+                   {'Content-Type': 'application/json'}).read()
+    latencies = []
+    lines = 0
+    offset, generation, idle_polls = 0, None, 0
+    start = time.perf_counter()
+    while idle_polls < 2: # The log may still be flushed right after the process exited
+        params = {'offset': offset}
+        if generation is not None:
+            params['generation'] = generation
+        result = json.loads(client.request('GET', f"/get_terminal_output?{urlencode(params)}").read())
+        if result['output']:
+            lines += count_output(result['output'], time.time(), latencies) - 1 # Output ends with a newline
+        offset, generation = result['offset'], result['generation']
+        if result['more']:
+            continue
+        if not result['is_running']:
+            idle_polls = 0 if result['output'] else idle_polls + 1
+        time.sleep(poll_interval)
+    return lines, time.perf_counter() - start, latencies
+
+def download(client, path, headers=None):
+    """Downloads path, returning (status, bytes, seconds)."""
+    start = time.perf_counter()
+    response = client.request('GET', path, headers=dict(headers or {}, **{'Accept-Encoding': 'identity'}))
+    size = 0
+    while True:
+        chunk = response.read(1024 * 1024)
+        if not chunk:
+            break
+        size += len(chunk)
+    return response.status, size, time.perf_counter() - start
+
+def run_download(port, cookie, job_id):
+    client = Client(port, cookie, timeout=600)
+    metrics = {}
+    if job_id:
+        status, size, seconds = download(client, f"/download-rclone-log?job_id={job_id}")
+        metrics['download_mib'] = size / 1048576
+        metrics['download_mib_per_sec'] = size / 1048576 / seconds if seconds else float('nan')
+        status, _, seconds = download(client, f"/download-rclone-log?job_id={job_id}", {'Range': 'bytes=-65536'})
+        metrics['range_tail_ms'] = seconds * 1000
+        metrics['range_status'] = status
+    status, size, seconds = download(client, '/download-terminal-log')
+    metrics['terminal_log_mib'] = size / 1048576
+    metrics['terminal_log_ms'] = seconds * 1000
+    return metrics
+
+def line_metrics(lines, seconds, latencies, cpu):
+    latencies.sort()
+    metrics = {'lines': lines, 'seconds': seconds, 'lines_per_sec': lines / seconds if seconds else float('nan'),
+               'cpu_ms_per_1k_lines': cpu * 1e6 / lines if lines else float('nan')}
+    if latencies:
+        metrics.update(latency_p50_ms=percentile(latencies, 0.5), latency_p95_ms=percentile(latencies, 0.95),
+                       latency_p99_ms=percentile(latencies, 0.99), latency_max_ms=latencies[-1])
+    return metrics
+
+# --- Reporting ---
+def print_results(results):
+    for scenario, metrics in results.items():
+        print(f"{scenario}:")
+        for name, value in metrics.items():
+            print(f"  {name:>24} {value:>14,.2f}" if isinstance(value, float) else f"  {name:>24} {value:>14,}")
+
+def compare(results, baseline, tolerance):
+    """Returns the metrics that got worse than baseline by more than tolerance."""
+    regressions = []
+    for scenario, metrics in baseline.items():
+        for name, old in metrics.items():
+            new = results.get(scenario, {}).get(name)
+            if not isinstance(old, (int, float)) or not isinstance(new, (int, float)) or name in ('lines', 'seconds') \
+                    or name.endswith(('_mib', '_status')) or not old:
+                continue
+            change = (new - old) / old
+            worse = -change if name in HIGHER_IS_BETTER else change
+            if worse > tolerance:
+                regressions.append(f"{scenario} {name}: {old:,.2f} -> {new:,.2f} ({change:+.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=200000, help="Lines the fake rclone writes per run")
+    parser.add_argument('--rate', type=int, default=0, help="Lines per second (0 = as fast as possible)")
+    parser.add_argument('--debug-ratio', type=float, default=0.3, help="Fraction of DEBUG lines")
+    parser.add_argument('--stats-every', type=int, default=500, help="Lines between stats blocks")
+    parser.add_argument('--redraws', type=int, default=20, help="Carriage-return redraws before each stats block")
+    parser.add_argument('--poll-interval', type=float, default=1.0, help="Terminal poll interval (the browser uses 1s)")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help="Comma-separated scenarios to run")
+    parser.add_argument('--threads', type=int, default=None, help="Gunicorn threads (default from gunicorn.conf.py)")
+    parser.add_argument('--save', help="Write the results to this JSON file")
+    parser.add_argument('--compare', help="Compare with results saved by --save, exit 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed relative regression for --compare")
+    args = parser.parse_args()
+    scenarios = [name for name in args.scenarios.split(',') if name]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    port = free_port()
+    env = dict(os.environ,
+               RCLONE_BINARY=FAKE_RCLONE,
+               FAKE_RCLONE_LINES=str(args.lines),
+               FAKE_RCLONE_LINES_PER_SEC=str(args.rate),
+               FAKE_RCLONE_DURATION='3600',
+               FAKE_RCLONE_DEBUG_RATIO=str(args.debug_ratio),
+               FAKE_RCLONE_STATS_EVERY=str(args.stats_every),
+               FAKE_RCLONE_STATS_FORMAT='block',
+               FAKE_RCLONE_REDRAWS=str(args.redraws),
+               FAKE_RCLONE_TIMESTAMPS='1')
+    cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f"127.0.0.1:{port}", 'app:app']
+    if args.threads:
+        cmd[-1:-1] = ['--threads', str(args.threads)]
+    server = subprocess.Popen(cmd, cwd=REPO_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    results = {}
+    try:
+        wait_for_server(port, server)
+        cookie = Client(port).login()
+        workers = child_pids(server.pid)
+        if len(workers) != 1:
+            raise SystemExit(f"Expected one gunicorn worker, found {len(workers)}.")
+        worker = workers[0]
+        payload = {'mode': 'copy', 'source': 'fake:src', 'destination': 'fake:dst', 'loglevel': 'DEBUG'}
+        shared = {'job_id': None}
+        for scenario in scenarios:
+            reset_peak_rss(worker)
+            cpu_before = cpu_seconds(worker)
+            if scenario == 'execute-rclone':
+                outcome = run_execute_rclone(port, cookie, payload, shared)
+            elif scenario == 'events':
+                outcome = run_events(port, cookie, payload, shared)
+            elif scenario == 'terminal':
+                outcome = run_terminal(port, cookie, args.poll_interval)
+            else:
+                outcome = run_download(port, cookie, shared['job_id'])
+            cpu = cpu_seconds(worker) - cpu_before
+            metrics = line_metrics(*outcome, cpu) if isinstance(outcome, tuple) else outcome
+            metrics.update(server_cpu_seconds=cpu, server_peak_rss_mib=peak_rss_mib(worker))
+            results[scenario] = metrics
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"fake rclone: {args.lines:,} lines at {args.rate or 'max'} lines/s, gunicorn threads: {args.threads or 'gunicorn.conf.py'}")
+    print_results(results)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%}.")
+
+if __name__ == '__main__':
+    main()
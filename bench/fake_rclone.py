@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Stand-in for the rclone binary that produces a configurable amount of output.
+
+Point RCLONE_BINARY at this script to drive the app without real remotes.
+It accepts (and ignores) any rclone arguments and is configured through the
+environment:
+
+    FAKE_RCLONE_LINES_PER_SEC  output lines per second (default 1000, 0 = as fast as possible)
+    FAKE_RCLONE_DURATION       seconds to run (default 10)
+    FAKE_RCLONE_LINES          stop after this many lines instead (default 0 = run for the duration)
+    FAKE_RCLONE_DEBUG_RATIO    fraction of lines logged as DEBUG checks rather than INFO copies (default 0)
+    FAKE_RCLONE_STATS_EVERY    write a stats block every N lines (default 0 = never)
+    FAKE_RCLONE_STATS_FORMAT   'oneline' (--stats-one-line-date, default) or 'block' (--progress)
+    FAKE_RCLONE_REDRAWS        carriage-return redraws of a progress line before each stats block (default 0)
+    FAKE_RCLONE_TIMESTAMPS     1 to end every INFO/DEBUG line with " t=<unix time>" for latency measurements
+    FAKE_RCLONE_EXIT           exit code (default 0); a non-zero code is preceded by ERROR lines like rclone's
+
+Every line counts towards the rate and FAKE_RCLONE_LINES, stats blocks
+included, except the line a series of redraws ends in.
+"""
+import os
+import sys
+import time
+
+def stats_lines(i, total, started, stats_format):
+    """Returns the lines of one stats report after i files, as rclone prints them."""
+    done = i * 1.5
+    elapsed = time.monotonic() - started
+    speed = done / elapsed if elapsed > 0 else 0
+    eta = f"{int((total * 1.5 - done) / speed)}s" if speed else "-"
+    percent = min(100, i * 100 // max(1, total))
+    if stats_format == 'block':
+        return [
+            f"Transferred:   \t  {done:.3f} MiB / {total * 1.5:.3f} MiB, {percent}%, {speed:.3f} MiB/s, ETA {eta}",
+            "Errors:                 0",
+            f"Checks:             {i} / {total}, {percent}%",
+            f"Transferred:         {i} / {total}, {percent}%",
+            f"Elapsed time:      {elapsed:.1f}s",
+        ]
+    return [f"{time.strftime('%Y/%m/%d %H:%M:%S')} - {done:.3f} MiB / {total * 1.5:.3f} MiB, {percent}%, "
+            f"{speed:.3f} MiB/s, ETA {eta} (xfr#{i}/{total})"]
+
+def main():
+    rate = float(os.environ.get('FAKE_RCLONE_LINES_PER_SEC', '1000'))
+    duration = float(os.environ.get('FAKE_RCLONE_DURATION', '10'))
+    max_lines = int(os.environ.get('FAKE_RCLONE_LINES', '0'))
+    debug_ratio = float(os.environ.get('FAKE_RCLONE_DEBUG_RATIO', '0'))
+    stats_every = int(os.environ.get('FAKE_RCLONE_STATS_EVERY', '0'))
+    stats_format = os.environ.get('FAKE_RCLONE_STATS_FORMAT', 'oneline')
+    redraws = int(os.environ.get('FAKE_RCLONE_REDRAWS', '0'))
+    timestamps = os.environ.get('FAKE_RCLONE_TIMESTAMPS') == '1'
+    exit_code = int(os.environ.get('FAKE_RCLONE_EXIT', '0'))
+
+    debug_every = round(1 / debug_ratio) if debug_ratio > 0 else 0
+    expected_files = max_lines or int(rate * duration) or 100000 # For percentages and ETA only
+    start = time.monotonic()
+    out = sys.stdout
+    i = 0 # Lines written
+    files = 0
+    next_stats = stats_every # Line index the next stats block is due at
+    while (i < max_lines) if max_lines else (time.monotonic() - start < duration):
+        now = time.strftime('%Y/%m/%d %H:%M:%S')
+        suffix = f" t={time.time():.6f}" if timestamps else ""
+        if stats_every and i >= next_stats:
+            for redraw in range(redraws):
+                out.write(f"\rTransferring: folder{files % 97}/file_{files:08d}.bin: {(redraw + 1) * 100 // redraws}% /1.5Mi, 12Mi/s, 0s")
+            if redraws:
+                out.write('\n')
+            lines = stats_lines(files, expected_files, start, stats_format)
+            next_stats = i + len(lines) + stats_every
+        elif debug_every and i % debug_every == 0:
+            lines = [f"{now} DEBUG : folder{files % 97}/file_{files:08d}.bin: Size and modification time the same (differ by 0s, within tolerance 1ms){suffix}"]
+        else:
+            files += 1
+            lines = [f"{now} INFO  : folder{files % 97}/file_{files:08d}.bin: Copied (new){suffix}"]
+        for line in lines:
+            out.write(line + '\n')
+            i += 1
+            if rate:
+                # Sleep in 10 ms slices so output arrives in small bursts like a real transfer
+                if i % max(1, int(rate / 100)) == 0:
+                    out.flush()
+                    delay = start + i / rate - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+    if exit_code:
+        out.write(f"{time.strftime('%Y/%m/%d %H:%M:%S')} ERROR : Attempt 3/3 failed with 1 errors and: fake failure\n")
+        out.write(f"{time.strftime('%Y/%m/%d %H:%M:%S')} Failed to copy: fake failure\n")
+    out.flush()
+    sys.exit(exit_code)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""Measures control endpoint latency while high-volume Rclone streams are open.
+
+Starts the app under gunicorn (gunicorn.conf.py) with RCLONE_BINARY pointing at
+bench/fake_rclone.py, opens --streams concurrent /execute-rclone streams that
+each emit --rate lines per second, and meanwhile probes the control endpoints
+(index page, terminal polling, job list and status) until --probes rounds are
+done or the streams have run for --duration seconds. Then every job that is still
+running is stopped through /stop-rclone-process. Reports p50/p95/p99/max
+latency per endpoint and the throughput the streams received.
+
+Run with --threads 1 to reproduce the old single sync worker, where control
+requests queue behind the streams.
+
+Usage: python bench/load_control_latency.py [--streams 2] [--rate 20000] [--duration 20] [--threads 32]
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.join(BENCH_DIR, '..')
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+class Client:
+    """Minimal HTTP client holding the session cookie on one keep-alive connection."""
+
+    def __init__(self, port, cookie=None, timeout=30):
+        self.port = port
+        self.cookie = cookie
+        self.timeout = timeout
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            return self.connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            self.connection.close() # Server closed the kept-alive connection, retry on a new one
+            self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=self.timeout)
+            self.connection.request(method, path, body=body, headers=headers)
+            return self.connection.getresponse()
+
+    def login(self):
+        body = urlencode({'username': os.environ.get('LOGIN_USERNAME', 'admin'),
+                          'password': os.environ.get('LOGIN_PASSWORD', 'password')})
+        response = self.request('POST', '/login', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+        response.read()
+        self.cookie = response.getheader('Set-Cookie').split(';', 1)[0]
+        return self.cookie
+
+def wait_for_server(port, process, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("gunicorn exited during startup.")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit("gunicorn did not start listening.")
+
+def run_stream(port, cookie, results, index):
+    """Runs one /execute-rclone stream to completion, counting bytes and lines received."""
+    client = Client(port, cookie, timeout=300)
+    payload = json.dumps({'mode': 'copy', 'source': 'fake:src', 'destination': 'fake:dst', 'loglevel': 'Info'})
+    start = time.perf_counter()
+    response = client.request('POST', '/execute-rclone', payload,
+                              {'Content-Type': 'application/json', 'Accept-Encoding': 'identity'})
+    received = lines = 0
+    job_id = None
+    for frame in response:
+        received += len(frame)
+        message = json.loads(frame)
+        if message.get('status') == 'started':
+            job_id = message['job_id']
+            results['job_ids'].append(job_id)
+        elif message.get('output'):
+            lines += message['output'].count('\n') + 1
+    results['streams'][index] = (received, lines, time.perf_counter() - start)
+
+def probe(client, path, method='GET', body=None):
+    headers = {'X-Requested-With': 'XMLHttpRequest'}
+    if body is not None:
+        headers['Content-Type'] = 'application/json'
+    start = time.perf_counter()
+    response = client.request(method, path, body, headers)
+    response.read()
+    return (time.perf_counter() - start) * 1000, response.status
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--streams', type=int, default=2, help="Concurrent /execute-rclone streams")
+    parser.add_argument('--rate', type=int, default=20000, help="Output lines per second of each stream")
+    parser.add_argument('--duration', type=float, default=20, help="Seconds each stream runs at most")
+    parser.add_argument('--probes', type=int, default=400, help="Requests per control endpoint")
+    parser.add_argument('--interval', type=float, default=0.01, help="Pause between probes in seconds")
+    parser.add_argument('--threads', type=int, default=None, help="Gunicorn threads (default from gunicorn.conf.py)")
+    args = parser.parse_args()
+
+    port = free_port()
+    env = dict(os.environ,
+               RCLONE_BINARY=os.path.join(BENCH_DIR, 'fake_rclone.py'),
+               RCLONE_MAX_CONCURRENT_JOBS=str(args.streams),
+               FAKE_RCLONE_LINES_PER_SEC=str(args.rate),
+               FAKE_RCLONE_DURATION=str(args.duration))
+    cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f"127.0.0.1:{port}", 'app:app']
+    if args.threads:
+        cmd[-1:-1] = ['--threads', str(args.threads)]
+    server = subprocess.Popen(cmd, cwd=REPO_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_server(port, server)
+        cookie = Client(port).login()
+
+        results = {'job_ids': [], 'streams': [None] * args.streams}
+        streams = [threading.Thread(target=run_stream, args=(port, cookie, results, i), daemon=True)
+                   for i in range(args.streams)]
+        for thread in streams:
+            thread.start()
+        deadline = time.monotonic() + 10
+        while len(results['job_ids']) < args.streams and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(1) # Let the streams reach full volume
+
+        control = Client(port, cookie, timeout=args.duration + 30)
+        probes_until = time.monotonic() + args.duration - 2
+        job_id = results['job_ids'][0] if results['job_ids'] else 'none'
+        endpoints = {
+            'GET /': '/',
+            'GET /get_terminal_output': '/get_terminal_output?offset=0&generation=0',
+            'GET /jobs': '/jobs',
+            'GET /jobs/<id>': f"/jobs/{job_id}",
+        }
+        latencies = {name: [] for name in endpoints}
+        errors = 0
+        for _ in range(args.probes):
+            if time.monotonic() > probes_until:
+                break
+            for name, path in endpoints.items():
+                try:
+                    elapsed, status = probe(control, path)
+                except (socket.timeout, OSError):
+                    errors += 1
+                    continue
+                latencies[name].append(elapsed)
+                errors += status >= 400
+            time.sleep(args.interval)
+
+        stop_latencies = []
+        for stop_job_id in list(results['job_ids']):
+            elapsed, status = probe(control, '/stop-rclone-process', 'POST', json.dumps({'job_id': stop_job_id}))
+            stop_latencies.append(elapsed)
+        latencies['POST /stop-rclone-process'] = stop_latencies
+        for thread in streams:
+            thread.join(timeout=30)
+
+        threads = args.threads or 'gunicorn.conf.py'
+        print(f"{args.streams} streams x {args.rate:,} lines/s, gunicorn threads: {threads}, probe errors: {errors}")
+        print(f"{'endpoint':>28} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for name, values in latencies.items():
+            if not values:
+                print(f"{name:>28} {0:>6}")
+                continue
+            values.sort()
+            print(f"{name:>28} {len(values):>6} {percentile(values, 0.5):8.1f} {percentile(values, 0.95):8.1f} "
+                  f"{percentile(values, 0.99):8.1f} {values[-1]:8.1f}")
+        for index, stream in enumerate(results['streams']):
+            if stream:
+                received, lines, seconds = stream
+                print(f"stream {index}: {lines:,} lines, {received / 1048576:.1f} MiB in {seconds:.1f}s "
+                      f"({lines / seconds:,.0f} lines/s)")
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Local stand-in for `rclone rcd` implementing the rc calls the app uses.
+
+Serves canned listings and simulates async sync/copy/move jobs with
+progressing core/stats, so the rcd backend can be exercised without Rclone
+or any cloud remote. Point the app at it with RCLONE_RCD_URL.
+
+Usage: python bench/stub_rc_server.py [--port 5572] [--latency-ms 0] [--job-seconds 3]
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubRcState:
+    def __init__(self, job_seconds, listing_size):
+        self.job_seconds = job_seconds
+        self.listing = [
+            {"Path": f"dir{i // 100}/file{i}.bin", "Name": f"file{i}.bin", "Size": 1048576 + i,
+             "ModTime": "2024-01-01T12:00:00.000000000Z", "IsDir": False}
+            for i in range(listing_size)
+        ]
+        self.dirs = [
+            {"Path": f"dir{i}", "Name": f"dir{i}", "Size": -1, "ModTime": "2024-01-01T12:00:00.000000000Z", "IsDir": True}
+            for i in range(max(1, listing_size // 100))
+        ]
+        self.jobs = {}
+        self.job_ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def start_job(self):
+        with self.lock:
+            job_id = next(self.job_ids)
+            self.jobs[job_id] = {"started": time.time(), "stopped": False}
+        return job_id
+
+    def job_progress(self, job_id):
+        job = self.jobs[job_id]
+        elapsed = time.time() - job["started"]
+        return job, min(1.0, elapsed / self.job_seconds) if self.job_seconds else 1.0, elapsed
+
+    def handle(self, method, params):
+        if method == 'rc/noop':
+            return params
+        if method == 'core/version':
+            return {"version": "v1.66.0-stub", "os": "linux", "arch": "amd64", "goVersion": "go1.22"}
+        if method == 'config/listremotes':
+            return {"remotes": ["gdrive", "backup"]}
+        if method == 'operations/list':
+            opt = params.get('opt', {})
+            return {"list": self.dirs if opt.get('dirsOnly') else self.listing}
+        if method == 'operations/size':
+            return {"count": len(self.listing), "bytes": sum(item["Size"] for item in self.listing)}
+        if method in ('operations/mkdir', 'operations/purge', 'operations/cleanup'):
+            return {}
+        if method in ('sync/sync', 'sync/copy', 'sync/move', 'operations/check'):
+            return {"jobid": self.start_job()}
+        if method == 'job/status':
+            job, progress, elapsed = self.job_progress(params['jobid'])
+            finished = job["stopped"] or progress >= 1.0
+            return {"id": params['jobid'], "finished": finished, "success": finished and not job["stopped"],
+                    "error": "context canceled" if job["stopped"] else "", "duration": elapsed}
+        if method == 'job/stop':
+            self.jobs[params['jobid']]["stopped"] = True
+            return {}
+        if method == 'core/stats':
+            job_id = int(params.get('group', 'job/0').split('/')[-1] or 0)
+            if job_id not in self.jobs:
+                return {"bytes": 0, "totalBytes": 0, "speed": 0, "errors": 0, "checks": 0, "transfers": 0}
+            _, progress, elapsed = self.job_progress(job_id)
+            total = 100 * 1048576
+            return {"bytes": int(total * progress), "totalBytes": total, "speed": total / max(self.job_seconds, 1),
+                    "eta": max(0, self.job_seconds - elapsed), "errors": 0, "checks": int(100 * progress),
+                    "totalChecks": 100, "transfers": int(100 * progress), "totalTransfers": 100, "elapsedTime": elapsed}
+        raise KeyError(method)
+
+def make_handler(state, latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1" # Keep-alive, like rclone rcd
+        disable_nagle_algorithm = True # Headers and body are written separately
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            params = json.loads(self.rfile.read(length) or b'{}')
+            if latency:
+                time.sleep(latency)
+            try:
+                status, result = 200, state.handle(self.path.lstrip('/'), params)
+            except KeyError:
+                status, result = 404, {"error": f"couldn't find method {self.path!r}", "status": 404}
+            body = json.dumps(result).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+    return Handler
+
+def serve(port=5572, latency_ms=0, job_seconds=3, listing_size=1000):
+    """Starts the stub server in a background thread and returns it."""
+    state = StubRcState(job_seconds, listing_size)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(state, latency_ms / 1000))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=5572)
+    parser.add_argument('--latency-ms', type=float, default=0, help="Artificial delay added to every call")
+    parser.add_argument('--job-seconds', type=float, default=3, help="How long simulated transfer jobs run")
+    parser.add_argument('--listing-size', type=int, default=1000, help="Number of files operations/list returns")
+    args = parser.parse_args()
+    server = serve(args.port, args.latency_ms, args.job_seconds, args.listing_size)
+    print(f"Stub rc server listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,16 @@
+# Gunicorn settings, loaded automatically from the working directory.
+# PORT sets the listening port; GUNICORN_THREADS and GUNICORN_TIMEOUT override
+# those two settings. The other values are fixed (command-line flags still win).
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+# Must stay at 1: Rclone jobs, the terminal process and their state live in the app process
+workers = 1
+# Threaded worker: a live stream occupies one thread while it is open, so stop,
+# status and terminal polling requests are served by the other threads
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '32'))
+# Only applies to the worker heartbeat with threads, long Rclone jobs run in the background
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '300'))
+# Browsers poll the terminal and reconnect event streams, reuse their connections
+keepalive = 5
@@ -23,10 +23,13 @@ const checkersValueSpan = document.getElementById('checkers-value');
 const bufferSizeSelect = document.getElementById('buffer_size');
 const orderSelect = document.getElementById('order');
 const loglevelSelect = document.getElementById('loglevel');
+const shardsSelect = document.getElementById('shards');
 const additionalFlagsInput = document.getElementById('additional_flags');
 const useDriveTrashCheckbox = document.getElementById('use_drive_trash');
 const serviceAccountCheckbox = document.getElementById('service_account');
 const dryRunCheckbox = document.getElementById('dry_run');
+const autoTuneCheckbox = document.getElementById('auto_tune');
+const incrementalCheckbox = document.getElementById('incremental');
 
 const startRcloneBtn = document.getElementById('start-rclone-btn');
 const stopRcloneBtn = document.getElementById('stop-rclone-btn');
@@ -66,7 +69,11 @@ const notepadContent = document.getElementById('notepad-content');
 // --- Global State Variables ---
 let rclonePollingInterval = null; // No longer needed for Rclone, streaming now
 let terminalPollingInterval = null; // Still needed for terminal polling
+let terminalOutputOffset = 0; // Byte offset of terminal log already received
+let terminalOutputGeneration = null; // Log generation the offset belongs to
+let isTerminalPollInFlight = false; // Prevents overlapping polls on slow responses
 let isRcloneProcessRunning = false;
+let currentRcloneJobId = null; // Job ID of the transfer started from this page
 let isTerminalProcessRunning = false;
 let pendingTerminalCommand = null; // Stores command if user confirms stop & start
 
@@ -76,6 +83,223 @@ const header = document.querySelector('header');
 const headerHeight = header.offsetHeight;
 
 
+// --- Virtualized Log Viewer ---
+// Live output can run to millions of lines. A LogViewer keeps at most `capacity` lines in memory,
+// puts only the rows in view into the DOM and redraws at most once per animation frame.
+// Lines dropped from the ring are fetched back from the server when the user scrolls to them.
+const LOG_VIEWER_CAPACITY = 20000; // Lines kept in memory per viewer
+const LOG_VIEWER_ROW_HEIGHT = 21; // px, matches .log-viewer-row in style.css
+const LOG_VIEWER_OVERSCAN = 30; // Rows rendered above and below the visible ones
+const LOG_VIEWER_PAGE_LINES = 500; // Lines fetched per scroll-back request
+const logViewers = new Map(); // Output element -> LogViewer, used by appendOutput/logMessage/setPartialLine
+
+class LogViewer {
+    // fetchRange(first, last) resolves to [{n, text}] for log lines first..last (1-based), or is null
+    // when the output only exists in the browser (terminal).
+    constructor(element, { capacity = LOG_VIEWER_CAPACITY, fetchRange = null } = {}) {
+        this.element = element;
+        this.capacity = capacity;
+        this.fetchRange = fetchRange;
+        this.spacer = document.createElement('div'); // Sized to all lines so the scrollbar is right
+        this.spacer.className = 'log-viewer-spacer';
+        this.rows = document.createElement('div'); // Holds only the rendered rows
+        this.rows.className = 'log-viewer-rows';
+        this.spacer.appendChild(this.rows);
+        element.textContent = '';
+        element.classList.add('log-viewer');
+        element.appendChild(this.spacer);
+        element.addEventListener('scroll', () => this.onScroll());
+        if (window.ResizeObserver) new ResizeObserver(() => this.scheduleRender()).observe(element);
+        logViewers.set(element, this);
+        this.clear();
+    }
+
+    clear() {
+        this.lines = []; // Ring of {n, text, status}; n is the log line number, null for local messages
+        this.pending = []; // Lines received since the last frame
+        this.held = []; // Local messages received while detached
+        this.skipped = 0; // Unnumbered lines dropped from pending before they were shown
+        this.heldSkipped = 0;
+        this.carry = ''; // Text after the last newline of appendText()
+        this.partialText = '';
+        this.latestNumber = 0; // Newest log line number the live stream delivered
+        this.detached = false; // Newest lines were dropped to make room for older ones
+        this.followTail = true; // Keep scrolled to the bottom while new lines arrive
+        this.loading = false;
+        this.generation = (this.generation || 0) + 1; // Invalidates range requests still in flight
+        this.element.scrollTop = 0;
+        this.scheduleRender();
+    }
+
+    // Queues lines for the next frame. firstNumber is the log line number of lines[0], if known.
+    appendLines(lines, status = 'default', firstNumber = null) {
+        if (firstNumber !== null) {
+            this.latestNumber = firstNumber + lines.length - 1;
+            if (this.detached) return; // Fetched from the server once the user scrolls down again
+        } else if (this.detached) {
+            lines.forEach(text => this.held.push({ n: null, text, status }));
+            this.heldSkipped += this.dropExcess(this.held);
+            return;
+        }
+        lines.forEach((text, i) => this.pending.push({ n: firstNumber === null ? null : firstNumber + i, text, status }));
+        // Hidden tabs get no animation frames, so the queue is bounded here rather than in render()
+        this.skipped += this.dropExcess(this.pending);
+        this.scheduleRender();
+    }
+
+    // Drops the oldest entries of a queue beyond capacity and returns how many were dropped. Numbered
+    // lines need no marker: the jump in line numbers is treated as a gap when they reach the ring.
+    dropExcess(queue) {
+        const excess = queue.length - (this.capacity - 1); // Leaves room for the "lines skipped" marker
+        if (excess <= 0) return 0;
+        const dropped = queue.splice(0, excess);
+        return dropped.filter(line => line.n === null).length;
+    }
+
+    // Appends raw output that may end in the middle of a line.
+    appendText(text, status = 'default') {
+        const lines = (this.carry + text).split('\n');
+        this.carry = lines.pop();
+        if (lines.length) this.appendLines(lines, status);
+        else this.scheduleRender();
+    }
+
+    setPartial(text) {
+        if (text === this.partialText) return;
+        this.partialText = text;
+        this.scheduleRender();
+    }
+
+    scheduleRender() {
+        if (this.frame) return;
+        this.frame = requestAnimationFrame(() => {
+            this.frame = null;
+            this.render();
+        });
+    }
+
+    // Adds the queued lines to the ring, dropping the oldest ones beyond capacity.
+    flushPending() {
+        if (!this.pending.length) return;
+        const previous = this.lines.length ? this.lines[this.lines.length - 1].n : null;
+        const first = this.pending[0].n;
+        if (this.fetchRange && first !== null && previous !== null && first !== previous + 1) {
+            this.lines = []; // Lines were skipped, keep the ring contiguous so scroll-back can fill it
+        }
+        if (this.skipped) {
+            this.lines.push({ n: null, text: `... ${this.skipped} lines skipped ...`, status: 'warning' });
+            this.skipped = 0;
+        }
+        this.lines.push(...this.pending);
+        this.pending = [];
+        this.trimOldest();
+    }
+
+    trimOldest() {
+        const excess = this.lines.length - this.capacity;
+        if (excess <= 0) return;
+        this.lines.splice(0, excess);
+        if (!this.followTail) this.element.scrollTop -= excess * LOG_VIEWER_ROW_HEIGHT; // Keep the same lines in view
+    }
+
+    render() {
+        this.flushPending();
+        const tail = this.carry + this.partialText;
+        const count = this.lines.length + (tail ? 1 : 0);
+        this.spacer.style.height = `${count * LOG_VIEWER_ROW_HEIGHT}px`;
+        if (this.followTail) this.element.scrollTop = this.element.scrollHeight;
+
+        const top = this.element.scrollTop;
+        const first = Math.max(0, Math.floor(top / LOG_VIEWER_ROW_HEIGHT) - LOG_VIEWER_OVERSCAN);
+        const last = Math.min(count, Math.ceil((top + this.element.clientHeight) / LOG_VIEWER_ROW_HEIGHT) + LOG_VIEWER_OVERSCAN);
+        const fragment = document.createDocumentFragment();
+        for (let i = first; i < last; i++) {
+            const row = document.createElement('div');
+            const line = this.lines[i];
+            row.className = line ? `log-viewer-row ${line.status}` : 'log-viewer-row partial-line';
+            row.textContent = line ? line.text : tail;
+            fragment.appendChild(row);
+        }
+        this.rows.style.transform = `translateY(${first * LOG_VIEWER_ROW_HEIGHT}px)`;
+        this.rows.replaceChildren(fragment);
+    }
+
+    onScroll() {
+        const element = this.element;
+        this.followTail = !this.detached && element.scrollTop + element.clientHeight >= element.scrollHeight - LOG_VIEWER_ROW_HEIGHT;
+        this.scheduleRender();
+        if (element.scrollTop < LOG_VIEWER_OVERSCAN * LOG_VIEWER_ROW_HEIGHT) this.loadOlder();
+        else if (this.detached && element.scrollTop + element.clientHeight >= element.scrollHeight - LOG_VIEWER_OVERSCAN * LOG_VIEWER_ROW_HEIGHT) this.loadNewer();
+    }
+
+    // Fetches the page of log lines before the oldest one in the ring.
+    async loadOlder() {
+        this.flushPending();
+        const oldest = this.lines.find(line => line.n !== null);
+        if (!this.fetchRange || this.loading || !oldest || oldest.n <= 1) return;
+        const fetched = await this.fetchPage(Math.max(1, oldest.n - LOG_VIEWER_PAGE_LINES), oldest.n - 1);
+        if (!fetched || this.lines.indexOf(oldest) === -1) return;
+        this.lines.unshift(...fetched);
+        const excess = this.lines.length - this.capacity;
+        if (excess > 0) {
+            this.lines.splice(-excess);
+            this.detached = true;
+            this.followTail = false;
+        }
+        this.spacer.style.height = `${this.lines.length * LOG_VIEWER_ROW_HEIGHT}px`;
+        this.element.scrollTop += fetched.length * LOG_VIEWER_ROW_HEIGHT; // Keep the same lines in view
+        this.scheduleRender();
+    }
+
+    // Fetches the lines after the newest one in the ring until the viewer has caught up with the stream.
+    async loadNewer() {
+        const newest = [...this.lines].reverse().find(line => line.n !== null);
+        if (this.loading || !newest) return;
+        const last = Math.min(this.latestNumber, newest.n + LOG_VIEWER_PAGE_LINES);
+        const fetched = newest.n < last ? await this.fetchPage(newest.n + 1, last) : [];
+        if (!fetched || this.lines.indexOf(newest) === -1) return;
+        this.lines.push(...fetched);
+        this.trimOldest();
+        if (!fetched.length || fetched[fetched.length - 1].n >= this.latestNumber) {
+            this.detached = false; // Caught up, live lines go to the ring again
+            this.pending.push(...this.held);
+            this.skipped += this.heldSkipped + this.dropExcess(this.pending);
+            this.held = [];
+            this.heldSkipped = 0;
+        }
+        this.scheduleRender();
+    }
+
+    async fetchPage(first, last) {
+        const generation = this.generation;
+        this.loading = true;
+        try {
+            const lines = await this.fetchRange(first, last);
+            if (generation !== this.generation) return null; // Cleared while loading
+            return lines.map(line => ({ n: line.n, text: line.text, status: 'default' }));
+        } catch (error) {
+            console.error("Error fetching log lines:", error);
+            return null;
+        } finally {
+            if (generation === this.generation) this.loading = false;
+        }
+    }
+}
+
+// Loads log lines first..last of an Rclone job from the server's log index.
+async function fetchJobLogLines(jobId, first, last) {
+    if (!jobId) return [];
+    const response = await fetch(`/jobs/${jobId}/log?start=${first}&end=${last}`);
+    if (!response.ok) return [];
+    const result = await response.json();
+    return result.lines;
+}
+
+let rcloneLogJobId = null; // Job whose log rcloneLog scrolls back through
+const rcloneLog = new LogViewer(rcloneLiveOutput, { fetchRange: (first, last) => fetchJobLogLines(rcloneLogJobId, first, last) });
+const terminalLog = new LogViewer(terminalOutput);
+
+
 const RcloneModeDescriptions = {
     "sync": "Make source and destination identical.",
     "copy": "Copy files from source to destination.",
@@ -341,13 +565,8 @@ async function startRcloneTransfer() {
         return;
     }
 
-    rcloneLiveOutput.textContent = ''; // Clear previous output
-    logMessage(rcloneMajorStepsOutput, 'Initializing Rclone transfer...', 'info');
-    showRcloneSpinner();
-    isRcloneProcessRunning = true;
-    startRcloneBtn.classList.add('hidden');
-    stopRcloneBtn.classList.remove('hidden');
-
+    // Sharded transfers are only offered for copy/sync (validate_sharded_request rejects other modes)
+    const shards = shardsSelect.value && ['copy', 'sync'].includes(mode) ? parseInt(shardsSelect.value) : null;
     const payload = {
         mode: mode,
         source: source,
@@ -361,11 +580,25 @@ async function startRcloneTransfer() {
         use_drive_trash: useDriveTrashCheckbox.checked,
         service_account: serviceAccountCheckbox.checked,
         dry_run: dryRunCheckbox.checked,
-        serve_protocol: serveProtocol
+        serve_protocol: serveProtocol,
+        shards: shards,
+        auto_tune: autoTuneCheckbox.checked && !shards && ['copy', 'sync', 'move'].includes(mode),
+        incremental: incrementalCheckbox.checked && !shards && !autoTuneCheckbox.checked && ['copy', 'sync'].includes(mode)
     };
+    await runRcloneJob('/jobs', payload);
+}
+
+// Queues a job through `url` (POST /jobs, or a history re-run) and follows its output until it ends.
+async function runRcloneJob(url, payload = {}) {
+    rcloneLog.clear(); // Clear previous output
+    logMessage(rcloneMajorStepsOutput, 'Initializing Rclone transfer...', 'info');
+    showRcloneSpinner();
+    isRcloneProcessRunning = true;
+    startRcloneBtn.classList.add('hidden');
+    stopRcloneBtn.classList.remove('hidden');
 
     try {
-        const response = await fetch('/execute-rclone', {
+        const response = await fetch(url, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -373,98 +606,111 @@ async function startRcloneTransfer() {
             body: JSON.stringify(payload),
         });
 
+        const result = await response.json();
         if (!response.ok) {
-            const errorData = await response.json();
-            logMessage(rcloneMajorStepsOutput, `Error: ${errorData.message}`, 'error');
-            // Ensure buttons are reset on error immediately
-            hideRcloneSpinner();
-            isRcloneProcessRunning = false;
-            startRcloneBtn.classList.remove('hidden');
-            stopRcloneBtn.classList.add('hidden');
+            logMessage(rcloneMajorStepsOutput, `Error: ${result.message}`, 'error');
             return;
         }
-
-        const reader = response.body.getReader();
-        const decoder = new TextDecoder('utf-8');
-        let buffer = '';
-
-        while (true) {
-            const { value, done } = await reader.read();
-            if (done) break;
-
-            buffer += decoder.decode(value, { stream: true });
-
-            let newlineIndex;
-            while ((newlineIndex = buffer.indexOf('\n')) !== -1) {
-                const line = buffer.substring(0, newlineIndex);
-                buffer = buffer.substring(newlineIndex + 1);
-
-                try {
-                    const data = JSON.parse(line);
-                    if (data.status === 'progress') {
-                        appendOutput(rcloneLiveOutput, data.output);
-                    } else if (data.status === 'complete') {
-                        logMessage(rcloneMajorStepsOutput, data.message, 'success');
-                        appendOutput(rcloneLiveOutput, '\n--- Rclone Command Finished (Success) ---\n');
-                        rcloneLiveOutput.textContent = data.output; // Display full accumulated output
-                        appendOutput(rcloneLiveOutput, '', 'no-newline'); // Ensure scroll to bottom with last append
-                        saveRcloneTransferToHistory(mode, source, destination, 'Success');
-                    } else if (data.status === 'error') {
-                        logMessage(rcloneMajorStepsOutput, `Error: ${data.message}`, 'error');
-                        appendOutput(rcloneLiveOutput, '\n--- Rclone Command Finished (Error) ---\n');
-                        rcloneLiveOutput.textContent = data.output; // Display full accumulated output
-                        appendOutput(rcloneLiveOutput, '', 'no-newline'); // Ensure scroll to bottom with last append
-                        saveRcloneTransferToHistory(mode, source, destination, 'Failed');
-                    } else if (data.status === 'stopped') {
-                        logMessage(rcloneMajorStepsOutput, data.message, 'info');
-                        appendOutput(rcloneLiveOutput, '\n--- Rclone Command Stopped by User ---\n');
-                        appendOutput(rcloneLiveOutput, data.output, 'info'); // Display final accumulated output
-                        saveRcloneTransferToHistory(mode, source, destination, 'Stopped');
-                    }
-                } catch (parseError) {
-                    // console.warn('Could not parse JSON line:', line, parseError);
-                    // This might happen with partial lines or non-JSON data, just ignore and wait for more data
-                }
-            }
-        }
+        currentRcloneJobId = result.job.job_id; // Needed to stop this specific job
+        sessionStorage.setItem('rcloneJobId', currentRcloneJobId); // Re-attach after a page reload
+        logMessage(rcloneMajorStepsOutput, `Rclone job ${currentRcloneJobId} started.`, 'info');
+        await followRcloneJob(currentRcloneJobId);
     } catch (error) {
         logMessage(rcloneMajorStepsOutput, `Network or Rclone execution error: ${error.message}`, 'error');
         appendOutput(rcloneLiveOutput, `\nError during stream: ${error.message}`, 'error');
-        saveRcloneTransferToHistory(mode, source, destination, 'Failed');
     } finally {
-        hideRcloneSpinner();
-        isRcloneProcessRunning = false;
-        startRcloneBtn.classList.remove('hidden');
-        stopRcloneBtn.classList.add('hidden');
-        // Process any remaining buffer content as the final message
-        if (buffer.trim()) {
-             try {
-                const data = JSON.parse(buffer.trim());
-                if (data.status === 'complete') {
-                    logMessage(rcloneMajorStepsOutput, data.message, 'success');
-                    appendOutput(rcloneLiveOutput, '\n--- Rclone Command Finished (Success) ---\n');
-                    rcloneLiveOutput.textContent = data.output;
-                    appendOutput(rcloneLiveOutput, '', 'no-newline');
-                    saveRcloneTransferToHistory(mode, source, destination, 'Success');
-                } else if (data.status === 'error') {
-                    logMessage(rcloneMajorStepsOutput, `Error: ${data.message}`, 'error');
-                    appendOutput(rcloneLiveOutput, '\n--- Rclone Command Finished (Error) ---\n');
-                    rcloneLiveOutput.textContent = data.output;
-                    appendOutput(rcloneLiveOutput, '', 'no-newline');
-                    saveRcloneTransferToHistory(mode, source, destination, 'Failed');
-                } else if (data.status === 'stopped') {
-                    logMessage(rcloneMajorStepsOutput, data.message, 'info');
-                    appendOutput(rcloneLiveOutput, '\n--- Rclone Command Stopped by User ---\n');
-                    appendOutput(rcloneLiveOutput, data.output, 'info');
-                    saveRcloneTransferToHistory(mode, source, destination, 'Stopped');
-                }
-             } catch (e) {
-                 // Ignore if not a valid JSON object
-             }
+        resetRcloneControls();
+    }
+}
+
+// Subscribes to a job's Server-Sent Events stream until it ends.
+// EventSource reconnects on its own and resumes from the last line received (Last-Event-ID).
+function followRcloneJob(jobId) {
+    return new Promise((resolve, reject) => {
+        const events = new EventSource(`/jobs/${jobId}/events`);
+        rcloneLogJobId = jobId;
+        events.onmessage = (event) => {
+            rcloneLog.setPartial(''); // A finished line replaces the progress line
+            const lines = event.data.split('\n');
+            rcloneLog.appendLines(lines, 'default', Number(event.lastEventId) - lines.length + 1); // Event ID is the last line's number
+        };
+        events.addEventListener('partial', (event) => {
+            setPartialLine(rcloneLiveOutput, event.data);
+        });
+        events.addEventListener('reset', () => {
+            // The server has fewer lines than we resumed from (e.g. it restarted), start the view over
+            rcloneLog.clear();
+            logMessage(rcloneMajorStepsOutput, 'The job output was reset by the server, showing only new lines.', 'info');
+        });
+        events.addEventListener('gap', (event) => {
+            const gap = JSON.parse(event.data);
+            // The lines after the gap start a new ring, scrolling back fetches the skipped ones
+            logMessage(rcloneMajorStepsOutput, `Lines ${gap.from}-${gap.to} were skipped in the live view, scroll up to load them.`, 'info');
+        });
+        events.addEventListener('end', (event) => {
+            events.close();
+            setPartialLine(rcloneLiveOutput, '');
+            const job = JSON.parse(event.data);
+            if (job.status === 'completed') {
+                logMessage(rcloneMajorStepsOutput, job.message, 'success');
+                appendOutput(rcloneLiveOutput, '\n--- Rclone Command Finished (Success) ---\n');
+            } else if (job.status === 'stopped') {
+                logMessage(rcloneMajorStepsOutput, job.message, 'info');
+                appendOutput(rcloneLiveOutput, '\n--- Rclone Command Stopped by User ---\n', 'info');
+            } else {
+                logMessage(rcloneMajorStepsOutput, `Error: ${job.message}`, 'error');
+                appendOutput(rcloneLiveOutput, '\n--- Rclone Command Finished (Error) ---\n');
+            }
+            sessionStorage.removeItem('rcloneJobId');
+            resolve(job);
+        });
+        events.onerror = () => {
+            if (events.readyState === EventSource.CLOSED) {
+                // Browser gave up reconnecting (e.g. job no longer exists or session expired)
+                sessionStorage.removeItem('rcloneJobId');
+                reject(new Error('Lost connection to the Rclone job stream.'));
+            }
+        };
+    });
+}
+
+// Re-attaches to a job started before the page was reloaded, if it is still running.
+async function resumeRcloneJob() {
+    const jobId = sessionStorage.getItem('rcloneJobId');
+    if (!jobId) return;
+    try {
+        const response = await fetch(`/jobs/${jobId}`);
+        if (!response.ok) {
+            sessionStorage.removeItem('rcloneJobId');
+            return;
         }
+        const { job } = await response.json();
+        if (job.status !== 'queued' && job.status !== 'running') {
+            sessionStorage.removeItem('rcloneJobId');
+            return;
+        }
+        currentRcloneJobId = jobId;
+        isRcloneProcessRunning = true;
+        showRcloneSpinner();
+        startRcloneBtn.classList.add('hidden');
+        stopRcloneBtn.classList.remove('hidden');
+        logMessage(rcloneMajorStepsOutput, `Re-attached to running Rclone job ${jobId}.`, 'info');
+        await followRcloneJob(jobId);
+    } catch (error) {
+        logMessage(rcloneMajorStepsOutput, `Could not re-attach to Rclone job: ${error.message}`, 'error');
+    } finally {
+        if (currentRcloneJobId === jobId) resetRcloneControls();
     }
 }
 
+function resetRcloneControls() {
+    hideRcloneSpinner();
+    isRcloneProcessRunning = false;
+    currentRcloneJobId = null;
+    startRcloneBtn.classList.remove('hidden');
+    stopRcloneBtn.classList.add('hidden');
+}
+
 async function stopRcloneTransfer() {
     if (!isRcloneProcessRunning) {
         logMessage(rcloneMajorStepsOutput, "No Rclone process is currently running.", 'info');
@@ -475,7 +721,8 @@ async function stopRcloneTransfer() {
     try {
         const response = await fetch('/stop-rclone-process', {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' }
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ job_id: currentRcloneJobId })
         });
         const result = await response.json();
         if (result.status === 'success') {
@@ -489,16 +736,37 @@ async function stopRcloneTransfer() {
 }
 
 function appendOutput(element, text, status = 'default') {
-    // Append directly to textContent for performance, only add newline if needed
+    const viewer = logViewers.get(element);
+    if (viewer) {
+        viewer.appendLines(text.split('\n'), status);
+        return;
+    }
     if (status === 'no-newline') { // Special case for last line to ensure scroll
         element.scrollTop = element.scrollHeight;
         return;
     }
-    const coloredText = getColoredText(text, status);
-    element.innerHTML += coloredText + '\n';
+    element.insertAdjacentHTML('beforeend', getColoredText(text, status) + '\n'); // Does not re-parse the existing output
     element.scrollTop = element.scrollHeight; // Auto-scroll to bottom
 }
 
+// Shows the line a process is still writing (progress bar, prompt) below its output.
+// Each call replaces the previous partial line; an empty text removes it.
+function setPartialLine(element, text) {
+    const viewer = logViewers.get(element);
+    if (viewer) {
+        viewer.setPartial(text);
+        return;
+    }
+    const existing = element.querySelector('.partial-line');
+    if (existing) existing.remove();
+    if (!text) return;
+    const partial = document.createElement('span');
+    partial.className = 'partial-line';
+    partial.textContent = text;
+    element.appendChild(partial);
+    element.scrollTop = element.scrollHeight;
+}
+
 function getColoredText(text, status) {
     let color = '';
     if (status === 'success') color = 'var(--success-color)';
@@ -513,72 +781,54 @@ function getColoredText(text, status) {
 
 
 function logMessage(element, message, type = 'info') {
-    const msgElement = document.createElement('div');
     const timestamp = new Date().toLocaleTimeString();
+    const viewer = logViewers.get(element);
+    if (viewer) {
+        viewer.appendLines([`[${timestamp}] ${message}`], type);
+        return;
+    }
+    const msgElement = document.createElement('div');
     msgElement.innerHTML = `<span class="${type}">[${timestamp}] ${escapeHtml(message)}</span>`; // Use innerHTML to allow for styling via span
     element.appendChild(msgElement);
     element.scrollTop = element.scrollHeight;
 }
 
 function clearRcloneOutput() {
-    rcloneLiveOutput.textContent = '';
+    rcloneLog.clear();
     rcloneMajorStepsOutput.innerHTML = '';
     rcloneMajorStepsOutput.style.display = 'none';
     logMessage(rcloneMajorStepsOutput, "Rclone output cleared.", 'info'); // Log to major steps output
 }
 
 // --- Log Download ---
-async function downloadLogs() {
+// Starts a browser download of a log without buffering it in page memory: the browser
+// streams the file to disk (and can resume it with Range requests).
+async function downloadLogFile(url, outputElement, label) {
     try {
-        const response = await fetch('/download-rclone-log');
-        if (response.ok) {
-            const blob = await response.blob();
-            const url = window.URL.createObjectURL(blob);
-            const a = document.createElement('a');
-            a.style.display = 'none';
-            a.href = url;
-            // Get filename from Content-Disposition header if available, otherwise default
-            const contentDisposition = response.headers.get('Content-Disposition');
-            const filenameMatch = contentDisposition && contentDisposition.match(/filename="?([^"]+)"?/);
-            a.download = filenameMatch ? filenameMatch[1] : `rclone_webgui_log_${new Date().toISOString().slice(0,10)}.txt`;
-            document.body.appendChild(a);
-            a.click();
-            window.URL.revokeObjectURL(url);
-            a.remove();
-            logMessage(rcloneMajorStepsOutput, "Rclone log download initiated.", 'info');
-        } else {
-            const errorData = await response.json();
-            logMessage(rcloneMajorStepsOutput, `Failed to download log: ${errorData.message}`, 'error');
+        const check = await fetch(url, { method: 'HEAD' });
+        if (!check.ok) {
+            const errorData = await (await fetch(url)).json();
+            logMessage(outputElement, `Failed to download ${label}: ${errorData.message}`, 'error');
+            return;
         }
+        const a = document.createElement('a');
+        a.style.display = 'none';
+        a.href = url; // Content-Disposition on the response sets the file name
+        document.body.appendChild(a);
+        a.click();
+        a.remove();
+        logMessage(outputElement, `${label.charAt(0).toUpperCase() + label.slice(1)} download initiated.`, 'info');
     } catch (error) {
-        logMessage(rcloneMajorStepsOutput, `Network error during log download: ${error.message}`, 'error');
+        logMessage(outputElement, `Network error during ${label} download: ${error.message}`, 'error');
     }
 }
 
-async function downloadTerminalLogs() {
-    try {
-        const response = await fetch('/download-terminal-log');
-        if (response.ok) {
-            const blob = await response.blob();
-            const url = window.URL.createObjectURL(blob);
-            const a = document.createElement('a');
-            a.style.display = 'none';
-            a.href = url;
-            const contentDisposition = response.headers.get('Content-Disposition');
-            const filenameMatch = contentDisposition && contentDisposition.match(/filename="?([^"]+)"?/);
-            a.download = filenameMatch ? filenameMatch[1] : `terminal_log_${new Date().toISOString().slice(0,10)}.txt`;
-            document.body.appendChild(a);
-            a.click();
-            window.URL.revokeObjectURL(url);
-            a.remove();
-            logMessage(terminalOutput, "Terminal log download initiated.", 'info');
-        } else {
-            const errorData = await response.json();
-            logMessage(terminalOutput, `Failed to download terminal log: ${errorData.message}`, 'error');
-        }
-    } catch (error) {
-        logMessage(terminalOutput, `Network error during terminal log download: ${error.message}`, 'error');
-    }
+function downloadLogs() {
+    return downloadLogFile('/download-rclone-log', rcloneMajorStepsOutput, 'Rclone log');
+}
+
+function downloadTerminalLogs() {
+    return downloadLogFile('/download-terminal-log', terminalOutput, 'terminal log');
 }
 
 
@@ -592,7 +842,9 @@ async function executeTerminalCommand(command = null) {
 
     logMessage(terminalOutput, `Executing: ${cmdToExecute}`, 'info');
     showTerminalSpinner();
-    terminalOutput.textContent = ''; // Clear previous output
+    terminalLog.clear(); // Clear previous output
+    terminalOutputOffset = 0; // New command gets a fresh log, fetch it from the start
+    terminalOutputGeneration = null;
     isTerminalProcessRunning = true;
     executeTerminalBtn.classList.add('hidden');
     stopTerminalBtn.classList.remove('hidden');
@@ -607,7 +859,6 @@ async function executeTerminalCommand(command = null) {
 
         if (result.status === 'success') {
             logMessage(terminalOutput, result.message, 'success');
-            saveCommandToHistory(cmdToExecute); // Save command on successful execution start
             startTerminalPolling(); // Start polling immediately after command execution starts
             // terminalCommandInput.value = ''; // DO NOT CLEAR INPUT FIELD
         } else if (result.status === 'warning' && result.message.includes("already running")) {
@@ -632,11 +883,26 @@ async function executeTerminalCommand(command = null) {
 }
 
 async function getTerminalOutput() {
+    if (isTerminalPollInFlight) return; // Previous poll still running
+    isTerminalPollInFlight = true;
     try {
-        const response = await fetch('/get_terminal_output');
-        const result = await response.json();
-        terminalOutput.textContent = result.output; // Update with full content
-        terminalOutput.scrollTop = terminalOutput.scrollHeight; // Auto-scroll
+        let result;
+        do {
+            const params = new URLSearchParams({ offset: terminalOutputOffset });
+            if (terminalOutputGeneration !== null) params.set('generation', terminalOutputGeneration);
+            const response = await fetch(`/get_terminal_output?${params}`);
+            result = await response.json();
+            if (result.reset) {
+                terminalLog.clear(); // Server started over (new command or cleared log)
+            }
+            if (result.output) {
+                terminalLog.setPartial('');
+                terminalLog.appendText(result.output); // Append only the new bytes
+            }
+            if (!result.more) terminalLog.setPartial(result.partial || '');
+            terminalOutputOffset = result.offset;
+            terminalOutputGeneration = result.generation;
+        } while (result.more); // Server capped the response, fetch the rest right away
 
         if (!result.is_running && isTerminalProcessRunning) {
             // Process has finished on the backend
@@ -651,6 +917,8 @@ async function getTerminalOutput() {
         // Log error but don't stop polling immediately, might be a transient network issue
         console.error("Error fetching terminal output:", error);
         // If the backend is truly down, polling will naturally stop as requests fail
+    } finally {
+        isTerminalPollInFlight = false;
     }
 }
 
@@ -683,7 +951,7 @@ async function stopTerminalProcess() {
 }
 
 function clearTerminalOutput() {
-    terminalOutput.textContent = '';
+    terminalLog.clear();
     logMessage(terminalOutput, "Terminal output cleared.", 'info');
 }
 
@@ -703,96 +971,138 @@ function stopTerminalPolling() {
 
 
 // --- Recent Commands History ---
-function saveCommandToHistory(command) {
-    let commands = JSON.parse(localStorage.getItem('terminalCommands')) || [];
-    commands.unshift({ command: command, timestamp: new Date().toLocaleString() }); // Add to beginning
-    if (commands.length > 20) { // Keep last 20 commands
-        commands.pop();
+// Rclone jobs and terminal commands are recorded by the server (/history) and survive restarts.
+const HISTORY_PAGE_SIZE = 20;
+const historyOffsets = { rclone: 0, terminal: 0 }; // Entries already shown per kind
+
+function formatBytes(bytes) {
+    if (bytes === null || bytes === undefined) return '-';
+    const units = ['B', 'KiB', 'MiB', 'GiB', 'TiB'];
+    let value = bytes;
+    let unit = 0;
+    while (value >= 1024 && unit < units.length - 1) {
+        value /= 1024;
+        unit++;
     }
-    localStorage.setItem('terminalCommands', JSON.stringify(commands));
+    return `${value.toFixed(unit ? 1 : 0)} ${units[unit]}`;
 }
 
-function saveRcloneTransferToHistory(mode, source, destination, status) {
-    let transfers = JSON.parse(localStorage.getItem('rcloneTransfers')) || [];
-    transfers.unshift({
-        mode: mode,
-        source: source,
-        destination: destination,
-        status: status,
-        timestamp: new Date().toLocaleString()
-    });
-    if (transfers.length > 20) { // Keep last 20 transfers
-        transfers.pop();
-    }
-    localStorage.setItem('rcloneTransfers', JSON.stringify(transfers));
+function formatDuration(seconds) {
+    if (seconds === null || seconds === undefined) return '-';
+    if (seconds < 60) return `${seconds.toFixed(1)}s`;
+    const minutes = Math.floor(seconds / 60);
+    if (minutes < 60) return `${minutes}m ${Math.round(seconds % 60)}s`;
+    return `${Math.floor(minutes / 60)}h ${minutes % 60}m`;
 }
 
+function historyStatusClass(status) {
+    if (status === 'completed') return 'text-success-color';
+    if (status === 'error') return 'text-error-color';
+    return 'text-warning-color';
+}
 
-function loadRecentCommands() {
-    const terminalCommands = JSON.parse(localStorage.getItem('terminalCommands')) || [];
-    const rcloneTransfers = JSON.parse(localStorage.getItem('rcloneTransfers')) || [];
+function renderRcloneHistoryEntry(item) {
+    const div = document.createElement('div');
+    div.className = 'bg-input-bg-color p-3 rounded-md border border-border-color space-y-1';
+    const timestamp = new Date(item.created_at * 1000).toLocaleString();
+    const stats = item.bytes !== null ? ` | ${formatBytes(item.bytes)} at ${formatBytes(item.throughput)}/s` : '';
+    div.innerHTML = `
+        <p><span class="font-semibold text-accent-color">${escapeHtml(item.mode || '')}:</span> <code class="text-primary-color text-sm">${escapeHtml(item.source || '')}</code> ${item.destination ? `<i class="fas fa-arrow-right mx-1 text-gray-500"></i> <code class="text-primary-color text-sm">${escapeHtml(item.destination)}</code>` : ''}</p>
+        <p class="text-xs text-gray-400">Status: <span class="${historyStatusClass(item.status)}">${escapeHtml(item.status)}</span> | ${timestamp} | ${formatDuration(item.duration)}${stats}</p>
+        <div class="flex flex-wrap gap-2 mt-2">
+            <button class="btn-secondary btn-rerun-rclone px-3 py-1 text-xs" data-id="${item.id}"><i class="fas fa-redo"></i> Re-run</button>
+            ${item.log_available ? `<button class="btn-secondary btn-history-log px-3 py-1 text-xs" data-id="${item.id}"><i class="fas fa-download"></i> Log</button>` : ''}
+            <button class="btn-secondary btn-copy-rclone-source px-3 py-1 text-xs" data-source="${escapeHtml(item.source || '')}"><i class="fas fa-copy"></i> Copy Source</button>
+            ${item.destination ? `<button class="btn-secondary btn-copy-rclone-destination px-3 py-1 text-xs" data-destination="${escapeHtml(item.destination)}"><i class="fas fa-copy"></i> Copy Destination</button>` : ''}
+        </div>
+    `;
+    div.querySelector('.btn-rerun-rclone').onclick = () => rerunHistoryEntry(item.id);
+    const logButton = div.querySelector('.btn-history-log');
+    if (logButton) logButton.onclick = () => downloadLogFile(`/download-rclone-log?job_id=${item.id}`, majorStepsOutput, 'Rclone log');
+    div.querySelector('.btn-copy-rclone-source').onclick = () => copyToClipboard(item.source);
+    const destinationButton = div.querySelector('.btn-copy-rclone-destination');
+    if (destinationButton) destinationButton.onclick = () => copyToClipboard(item.destination);
+    return div;
+}
 
-    recentTerminalCommandsDiv.innerHTML = '';
-    if (terminalCommands.length === 0) {
-        recentTerminalCommandsDiv.innerHTML = '<p class="text-text-color">No recent terminal commands.</p>';
-    } else {
-        terminalCommands.forEach(item => {
-            const div = document.createElement('div');
-            div.className = 'bg-input-bg-color p-3 rounded-md border border-border-color flex justify-between items-center';
-            div.innerHTML = `
-                <div>
-                    <code class="text-primary-color text-sm">${escapeHtml(item.command)}</code>
-                    <p class="text-xs text-gray-400 mt-1">${item.timestamp}</p>
-                </div>
-                <button class="btn-secondary btn-copy-command px-3 py-1 text-xs" data-command="${escapeHtml(item.command)}">
-                    <i class="fas fa-copy"></i> Copy
-                </button>
-            `;
-            recentTerminalCommandsDiv.appendChild(div);
-        });
-    }
+function renderTerminalHistoryEntry(item) {
+    const div = document.createElement('div');
+    div.className = 'bg-input-bg-color p-3 rounded-md border border-border-color flex justify-between items-center';
+    const timestamp = new Date(item.created_at * 1000).toLocaleString();
+    const exitCode = item.exit_code !== null ? ` (exit ${item.exit_code})` : '';
+    div.innerHTML = `
+        <div>
+            <code class="text-primary-color text-sm">${escapeHtml(item.command)}</code>
+            <p class="text-xs text-gray-400 mt-1"><span class="${historyStatusClass(item.status)}">${escapeHtml(item.status)}${exitCode}</span> | ${timestamp} | ${formatDuration(item.duration)}</p>
+        </div>
+        <div class="flex gap-2">
+            <button class="btn-secondary btn-rerun-command px-3 py-1 text-xs"><i class="fas fa-redo"></i> Run</button>
+            <button class="btn-secondary btn-copy-command px-3 py-1 text-xs"><i class="fas fa-copy"></i> Copy</button>
+        </div>
+    `;
+    div.querySelector('.btn-rerun-command').onclick = () => {
+        showSection('web-terminal');
+        executeTerminalCommand(item.command);
+    };
+    div.querySelector('.btn-copy-command').onclick = () => copyToClipboard(item.command);
+    return div;
+}
 
-    recentRcloneTransfersDiv.innerHTML = '';
-    if (rcloneTransfers.length === 0) {
-        recentRcloneTransfersDiv.innerHTML = '<p class="text-text-color">No recent Rclone transfers.</p>';
-    } else {
-        rcloneTransfers.forEach(item => {
-            const statusClass = item.status === 'Success' ? 'text-success-color' : (item.status === 'Failed' ? 'text-error-color' : 'text-warning-color');
-            const div = document.createElement('div');
-            div.className = 'bg-input-bg-color p-3 rounded-md border border-border-color space-y-1';
-            div.innerHTML = `
-                <p><span class="font-semibold text-accent-color">${item.mode}:</span> <code class="text-primary-color text-sm">${escapeHtml(item.source)}</code> ${item.destination ? `<i class="fas fa-arrow-right mx-1 text-gray-500"></i> <code class="text-primary-color text-sm">${escapeHtml(item.destination)}</code>` : ''}</p>
-                <p class="text-xs text-gray-400">Status: <span class="${statusClass}">${item.status}</span> | ${item.timestamp}</p>
-                <div class="flex flex-wrap gap-2 mt-2">
-                    <button class="btn-secondary btn-copy-rclone-source px-3 py-1 text-xs" data-source="${escapeHtml(item.source)}"><i class="fas fa-copy"></i> Copy Source</button>
-                    ${item.destination ? `<button class="btn-secondary btn-copy-rclone-destination px-3 py-1 text-xs" data-destination="${escapeHtml(item.destination)}"><i class="fas fa-copy"></i> Copy Destination</button>` : ''}
-                </div>
-            `;
-            recentRcloneTransfersDiv.appendChild(div);
-        });
+// Appends the next page of `kind` history entries to container; reset starts from the newest again.
+async function loadHistoryPage(kind, container, render, emptyText, reset = false) {
+    if (reset) historyOffsets[kind] = 0;
+    try {
+        const params = new URLSearchParams({ kind, limit: HISTORY_PAGE_SIZE, offset: historyOffsets[kind] });
+        const response = await fetch(`/history?${params}`);
+        const result = await response.json();
+        if (!response.ok) throw new Error(result.message);
+        if (reset) container.innerHTML = '';
+        container.querySelector('.btn-history-more')?.remove();
+        if (result.total === 0) {
+            container.innerHTML = `<p class="text-text-color">${emptyText}</p>`;
+            return;
+        }
+        result.entries.forEach(item => container.appendChild(render(item)));
+        historyOffsets[kind] += result.entries.length;
+        if (historyOffsets[kind] < result.total) {
+            const more = document.createElement('button');
+            more.className = 'btn-secondary btn-history-more px-3 py-1 text-xs';
+            more.textContent = `Show more (${result.total - historyOffsets[kind]} older)`;
+            more.onclick = () => loadHistoryPage(kind, container, render, emptyText);
+            container.appendChild(more);
+        }
+    } catch (error) {
+        container.innerHTML = `<p class="text-error-color">Could not load history: ${escapeHtml(error.message)}</p>`;
     }
+}
 
-    // Add event listeners for copy buttons (must be done after content is loaded)
-    document.querySelectorAll('.btn-copy-command').forEach(button => {
-        button.onclick = (e) => copyToClipboard(e.target.dataset.command || e.target.closest('button').dataset.command);
-    });
-    document.querySelectorAll('.btn-copy-rclone-source').forEach(button => {
-        button.onclick = (e) => copyToClipboard(e.target.dataset.source || e.target.closest('button').dataset.source);
-    });
-    document.querySelectorAll('.btn-copy-rclone-destination').forEach(button => {
-        button.onclick = (e) => copyToClipboard(e.target.dataset.destination || e.target.closest('button').dataset.destination);
-    });
+function loadRecentCommands() {
+    loadHistoryPage('rclone', recentRcloneTransfersDiv, renderRcloneHistoryEntry, 'No recent Rclone transfers.', true);
+    loadHistoryPage('terminal', recentTerminalCommandsDiv, renderTerminalHistoryEntry, 'No recent terminal commands.', true);
+}
+
+// Runs a past Rclone job again with the same settings and follows it in the Rclone section.
+async function rerunHistoryEntry(entryId) {
+    showSection('rclone-transfer');
+    if (isRcloneProcessRunning) {
+        logMessage(rcloneMajorStepsOutput, "Rclone process is already running. Please stop it first.", 'warning');
+        return;
+    }
+    await runRcloneJob(`/history/${entryId}/rerun`);
 }
 
 
-function clearAllRecentCommands() {
+async function clearAllRecentCommands() {
     // Replaced confirm with a custom modal if needed, but for simplicity, keeping this as is for now.
     // In a full production app, this would be a custom modal/dialog.
     if (confirm("Are you sure you want to clear all recent commands and transfers history? This cannot be undone.")) {
-        localStorage.removeItem('terminalCommands');
-        localStorage.removeItem('rcloneTransfers');
-        loadRecentCommands(); // Reload to show empty state
-        logMessage(majorStepsOutput, "All recent commands and transfers history cleared.", 'info');
+        try {
+            await fetch('/history', { method: 'DELETE' });
+            loadRecentCommands(); // Reload to show empty state
+            logMessage(majorStepsOutput, "All recent commands and transfers history cleared.", 'info');
+        } catch (error) {
+            logMessage(majorStepsOutput, `Failed to clear history: ${error.message}`, 'error');
+        }
     }
 }
 
@@ -904,6 +1214,7 @@ document.addEventListener('DOMContentLoaded', () => {
     showSection('rclone-transfer'); // Show Rclone Transfer section by default
     updateModeDescription(); // Set initial mode description
     toggleRemoteField(); // Set initial destination field visibility
+    resumeRcloneJob(); // Pick up a transfer that was running before a reload
 
     // Header scroll behavior
     window.addEventListener('scroll', handleScroll);